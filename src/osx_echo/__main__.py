@@ -1,4 +1,28 @@
-from osx_echo.startup import start_app
+import argparse
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m osx_echo",
+                                     description="Run the dictation app, or transcribe WAV files with a subcommand.")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print the import and initialization time of every startup stage")
+    subparsers = parser.add_subparsers(dest="command")
+
+    from osx_echo import batch
+
+    transcribe_parser = subparsers.add_parser("transcribe", help="transcribe WAV files without the menu bar app")
+    batch.add_arguments(transcribe_parser)
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        # imported here so that the subcommands run without the macOS UI libraries
+        from osx_echo.startup import start_app
+
+        start_app(args.profile_startup)
+        return 0
+    return args.func(args)
+
 
 if __name__ == "__main__":
-    start_app()
\ No newline at end of file
+    sys.exit(main())
@@ -7,6 +7,7 @@ recording and transcription process.
 import rumps
 
 from .config import Config, LanguageConfig
+from .metrics import Metrics
 
 
 class App(rumps.App):
@@ -20,26 +21,73 @@ class App(rumps.App):
     Attributes:
         recording_in_progress (bool): Indicates whether recording is currently active.
         recorder: An object responsible for handling the actual recording functionality.
+        metrics (Metrics): Collects the latency trace of every dictation.
     """
 
-    def __init__(self, recorder, config: Config):
+    def __init__(self, recorder, config: Config, metrics: Metrics, config_watcher=None):
         """
         Initialize the DictationApp.
 
         Args:
             recorder: An object that handles the recording functionality.
+            config (Config): The application configuration.
+            metrics (Metrics): Collects the latency trace of every dictation.
+            config_watcher (ConfigWatcher): Checked every second to reload the config, may be None.
         """
         super().__init__("osx_echo", "S")
         self.recording_in_progress = False
         self.recorder = recorder
         self.config = config
-        menu_list = []
-        for ls in self.config.language_support:
-            menu_list.append(rumps.MenuItem(f"Start {
-                             ls.language_name}", callback=lambda _, ls=ls: self.start_recording(ls)))
+        self.metrics = metrics
+        self.trace = None
+        self.recorder.on_error = self.recording_failed
+        self.language_items = self._language_items(self.config.language_support)
+        menu_list = list(self.language_items)
 
         menu_list.append(rumps.MenuItem("Stop", callback=self.stop_recording))
+        menu_list.append(rumps.MenuItem("Cancel pending transcriptions", callback=self.cancel_transcriptions))
+        self.latency_menu = rumps.MenuItem("Latency p50 / p95")
+        menu_list.append(self.latency_menu)
         self.menu = menu_list
+        # metrics are updated on a job worker thread, the menu may only be changed on the main thread
+        self._latency_changed = False
+        self.metrics.on_update = self.latency_changed
+        self.latency_timer = rumps.Timer(self.check_latency, 1)
+        self.latency_timer.start()
+
+        self.config_watcher = config_watcher
+        if config_watcher is not None:
+            # rumps timers run on the main thread, so the menu can be rebuilt from the reload callback
+            self.config_timer = rumps.Timer(self.check_config, 1)
+            self.config_timer.start()
+
+    def set_language_support(self, config: Config):
+        """
+        Replace the "Start" menu items after the languages in the config changed.
+
+        Args:
+            config (Config): The reloaded configuration.
+        """
+        for item in self.language_items:
+            del self.menu[item.title]
+        self.language_items = self._language_items(config.language_support)
+        for item in self.language_items:
+            self.menu.insert_before("Stop", item)
+        self.config = config
+
+    def check_config(self, _):
+        """
+        Reload the config if the file changed, unless a recording is in progress.
+
+        Args:
+            _: Unused parameter (required by rumps.Timer).
+        """
+        if not self.recording_in_progress:
+            self.config_watcher.check()
+
+    def _language_items(self, language_support):
+        return [rumps.MenuItem(f"Start {ls.language_name}", callback=lambda _, ls=ls: self.start_recording(ls))
+                for ls in language_support]
 
     def start_recording(self, language_config: LanguageConfig):
         """
@@ -47,14 +95,21 @@ class App(rumps.App):
 
         This method is called when the user clicks the "Start" menu item.
         It updates the app's state and starts the recorder if not already recording.
+        If the recorder cannot start, e.g. because audio failed to initialize, the state is reset.
 
         Args:
             _: Unused parameter (required by rumps.clicked decorator).
         """
         if not self.recording_in_progress:
+            self.trace = self.metrics.start_trace()
+            self.trace.mark("start_recording")
             self.recording_in_progress = True
             self.title = "R"
-            self.recorder.start(language_config)
+            if not self.recorder.start(language_config, self.trace):
+                # audio is not available, so there is no recording to show or stop
+                self.recording_in_progress = False
+                self.title = "S"
+                self.trace = None
 
     def stop_recording(self, _):
         """
@@ -67,10 +122,66 @@ class App(rumps.App):
             _: Unused parameter (required by rumps.clicked decorator).
         """
         if self.recording_in_progress:
+            self.trace.mark("stop")
             self.title = "S"
             self.recording_in_progress = False
             self.recorder.stop()
 
+    def recording_failed(self, trace):
+        """
+        Reset the state after an audio error ended a recording, from the recording thread.
+
+        Args:
+            trace (Trace): latency trace of the recording that ended.
+        """
+        if self.recording_in_progress and self.trace is trace:
+            self.recording_in_progress = False
+            self.title = "S"
+            self.trace = None
+
+    def cancel_transcriptions(self, _):
+        """
+        Cancel all transcriptions that have not been typed yet.
+
+        Args:
+            _: Unused parameter (required by rumps.clicked decorator).
+        """
+        self.recorder.scheduler.cancel_pending()
+
+    def latency_changed(self, _):
+        """
+        Note that the latency menu is out of date, from any thread.
+
+        Args:
+            _: Unused parameter, the updated metrics.
+        """
+        self._latency_changed = True
+
+    def check_latency(self, _):
+        """
+        Refresh the latency menu if a dictation finished since the last check.
+
+        Args:
+            _: Unused parameter (required by rumps.Timer).
+        """
+        if self._latency_changed:
+            self._latency_changed = False
+            self.update_latency_menu(self.metrics)
+
+    def update_latency_menu(self, metrics: Metrics):
+        """
+        Show the p50/p95 latency of every dictation stage in the latency submenu.
+
+        Must run on the main thread, it is called from the latency timer.
+
+        Args:
+            metrics (Metrics): The metrics that were updated.
+        """
+        if len(self.latency_menu):
+            self.latency_menu.clear()
+        for name, p50, p95 in metrics.summary():
+            self.latency_menu.add(rumps.MenuItem(f"{name}: {p50 * 1000:.0f} / {p95 * 1000:.0f} ms"))
+
     def toggle_recording(self, language_config: LanguageConfig):
         """
         Toggle the recording state.
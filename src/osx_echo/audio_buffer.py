@@ -0,0 +1,98 @@
+"""
+This module provides the buffer recordings are captured into.
+
+Collecting chunks in a list and joining them at the end holds the audio twice at
+the moment the recording stops, plus the overhead of one bytes object per chunk.
+AudioBuffer instead writes the chunks into a preallocated bytearray, which beyond
+its initial capacity grows in place by the bytearray's own over-allocation, and once
+the recording exceeds a threshold moves it to an unlinked temporary file. The
+finished recording is handed on as a memoryview, of the bytearray or of a
+read-only memory map of the file, so it is never copied.
+
+Classes:
+    AudioBuffer: Growable capture buffer that spills to disk.
+"""
+
+import mmap
+import tempfile
+
+from .constants import SAMPLE_RATE, SAMPLE_WIDTH
+
+
+class AudioBuffer:
+    """
+    AudioBuffer accumulates PCM chunks in memory up to `spill_bytes` and on disk beyond.
+
+    Attributes:
+        spilled (bool): True once the audio has been moved to the temporary file.
+    """
+
+    def __init__(self, spill_bytes: int = 600 * SAMPLE_RATE * SAMPLE_WIDTH,
+                 initial_bytes: int = 30 * SAMPLE_RATE * SAMPLE_WIDTH, spill_dir: str | None = None):
+        """
+        Initialize the AudioBuffer.
+
+        Args:
+            spill_bytes (int): Size above which the audio is moved to a temporary file.
+            initial_bytes (int): Capacity preallocated in memory.
+            spill_dir (str): Directory of the temporary file, None for the system default.
+        """
+        self.spill_bytes = spill_bytes
+        self.spill_dir = spill_dir
+        self.spilled = False
+        self._buffer = bytearray(min(initial_bytes, spill_bytes))
+        self._length = 0
+        self._file = None
+
+    @staticmethod
+    def from_config(config: dict) -> "AudioBuffer":
+        return AudioBuffer(int(config.get("spill_after_s", 600) * SAMPLE_RATE * SAMPLE_WIDTH),
+                           spill_dir=config.get("spill_dir"))
+
+    def __len__(self):
+        return self._length
+
+    def write(self, data: bytes):
+        """
+        Append a chunk of audio.
+
+        Args:
+            data (bytes): PCM samples to append.
+        """
+        end = self._length + len(data)
+        if self._file is None and end > self.spill_bytes:
+            self._spill()
+        if self._file is not None:
+            self._file.write(data)
+        elif end <= len(self._buffer):
+            self._buffer[self._length:end] = data
+        else:
+            # appending lets realloc extend the allocation in place instead of copying into a new one
+            del self._buffer[self._length:]
+            self._buffer += data
+        self._length = end
+
+    def getbuffer(self) -> memoryview:
+        """
+        Finish the recording and return its audio without copying it.
+
+        No more chunks can be written afterwards.
+
+        Returns:
+            memoryview: The recorded bytes, backed by memory or by a read-only map of the spill file.
+        """
+        if self._file is None:
+            return memoryview(self._buffer)[:self._length]
+        self._file.flush()
+        if self._length == 0:
+            return memoryview(b"")
+        # the map keeps its own file descriptor, so the file is gone once the view is released
+        mapped = mmap.mmap(self._file.fileno(), self._length, access=mmap.ACCESS_READ)
+        self._file.close()
+        return memoryview(mapped)
+
+    def _spill(self):
+        self._file = tempfile.TemporaryFile(dir=self.spill_dir)
+        self._file.write(memoryview(self._buffer)[:self._length])
+        self._buffer = bytearray()
+        self.spilled = True
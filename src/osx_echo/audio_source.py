@@ -0,0 +1,311 @@
+"""
+This module provides the audio sources the Recorder reads from.
+
+An audio source delivers 16 kHz mono 16-bit PCM in chunks of `frames_per_buffer`
+frames through `open()`, `read()` and `close()`, and records the `time.perf_counter()`
+of its first live chunk in `first_frame_time`. After `close()`, `drain()` returns
+the audio the source still held back, e.g. the filter delay of its resampler. Besides the PyAudio input device
+there is a synthetic source for exercising the recorder without a microphone, and
+a continuous capture that keeps one source open on a background thread and serves
+recordings from a pre-roll ring buffer.
+
+The PyAudio source opens the device at its native rate and channel count by
+default and converts the audio with a Resampler.
+
+Classes:
+    CaptureError: Raised by a CaptureSubscription whose capture has ended.
+    PyAudioSource: Reads from a PyAudio input device.
+    SyntheticSource: Replays PCM bytes, optionally paced in real time.
+    ContinuousCapture: Keeps a source open and fans its chunks out to subscribers.
+    CaptureSubscription: The audio of one recording served by a ContinuousCapture.
+"""
+
+import collections
+import queue
+import threading
+import time
+
+from .constants import CHANNELS, FRAMES_PER_BUFFER, SAMPLE_RATE, SAMPLE_WIDTH
+
+
+class CaptureError(OSError):
+    """
+    Raised when a recording reads from a continuous capture that failed or was stopped.
+    """
+
+
+class PyAudioSource:
+    """
+    PyAudioSource reads audio from a PyAudio input device.
+
+    With `native_rate` the device is opened at its default sample rate and with all
+    its input channels, and every chunk is downmixed and resampled to 16 kHz mono.
+    A chunk then covers as much time as `frames_per_buffer` frames at 16 kHz.
+    Otherwise the device is opened at 16 kHz mono and the OS has to convert.
+    """
+
+    def __init__(self, input_device_index, frames_per_buffer: int = FRAMES_PER_BUFFER, native_rate: bool = True):
+        self.input_device_index = input_device_index
+        self.frames_per_buffer = frames_per_buffer
+        self.native_rate = native_rate
+        self._pyaudio = None
+        self._stream = None
+        self._resampler = None
+        self._device_frames = frames_per_buffer
+        self.first_frame_time = None
+
+    def open(self):
+        import pyaudio
+
+        from .resample import Resampler
+
+        self.first_frame_time = None
+        self._pyaudio = pyaudio.PyAudio()
+        try:
+            rate, channels = SAMPLE_RATE, CHANNELS
+            if self.native_rate:
+                device_info = (self._pyaudio.get_device_info_by_index(self.input_device_index)
+                               if self.input_device_index is not None
+                               else self._pyaudio.get_default_input_device_info())
+                rate, channels = int(device_info["defaultSampleRate"]), max(1, int(device_info["maxInputChannels"]))
+            self._resampler = Resampler(rate, channels)
+            self._device_frames = round(self.frames_per_buffer * rate / SAMPLE_RATE)
+            self._stream = self._pyaudio.open(
+                format=pyaudio.paInt16,
+                channels=channels,
+                rate=rate,
+                input=True,
+                frames_per_buffer=self._device_frames,
+                input_device_index=self.input_device_index
+            )
+        except Exception:
+            # a device that cannot be opened must not leave PortAudio initialized
+            self._pyaudio.terminate()
+            self._pyaudio = None
+            raise
+
+    def read(self) -> bytes:
+        data = self._resampler.process(self._stream.read(self._device_frames, exception_on_overflow=False))
+        if self.first_frame_time is None:
+            self.first_frame_time = time.perf_counter()
+        return data
+
+    def close(self):
+        self._stream.stop_stream()
+        self._stream.close()
+        self._pyaudio.terminate()
+        self._stream = None
+        self._pyaudio = None
+
+    def drain(self) -> bytes:
+        # the resampler holds back the input its filter has not reached yet, padding it converts the last of it
+        if self._resampler is None:
+            return b""
+        tail, self._resampler = self._resampler.flush(), None
+        return tail
+
+
+class SyntheticSource:
+    """
+    SyntheticSource replays PCM bytes and continues with silence once they run out.
+
+    With `realtime` set, every `read` waits until the chunk would have been captured
+    by a real device, so timing behaves like a microphone. `on_exhausted` is called
+    from the reading thread right after the last chunk of `audio_data` was read,
+    e.g. to stop the recording.
+    """
+
+    def __init__(self, audio_data: bytes = b"", frames_per_buffer: int = FRAMES_PER_BUFFER, realtime: bool = True,
+                 on_exhausted=None):
+        self.audio_data = audio_data
+        self.frames_per_buffer = frames_per_buffer
+        self.realtime = realtime
+        self.on_exhausted = on_exhausted
+        self._offset = 0
+        self._next_chunk_time = None
+        self.first_frame_time = None
+
+    @property
+    def exhausted(self) -> bool:
+        """
+        True once all of `audio_data` has been read.
+        """
+        return self._offset >= len(self.audio_data)
+
+    def open(self):
+        self._offset = 0
+        self._next_chunk_time = time.perf_counter()
+        self.first_frame_time = None
+
+    def read(self) -> bytes:
+        chunk_bytes = self.frames_per_buffer * SAMPLE_WIDTH
+        was_exhausted = self.exhausted
+        chunk = self.audio_data[self._offset:self._offset + chunk_bytes]
+        self._offset += chunk_bytes
+        chunk += bytes(chunk_bytes - len(chunk))
+
+        if self.realtime:
+            self._next_chunk_time += self.frames_per_buffer / SAMPLE_RATE
+            delay = self._next_chunk_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if self.first_frame_time is None:
+            self.first_frame_time = time.perf_counter()
+        if self.exhausted and not was_exhausted and self.on_exhausted is not None:
+            self.on_exhausted()
+        return chunk
+
+    def close(self):
+        pass
+
+    def drain(self) -> bytes:
+        return b""
+
+
+class ContinuousCapture:
+    """
+    ContinuousCapture keeps an audio source open on a persistent capture thread.
+
+    Every chunk goes into a fixed-size ring buffer and to all active subscriptions.
+    A new subscription starts with the most recent `pre_roll_s` seconds from the
+    ring buffer, so speech that began just before the trigger is not clipped and
+    no device has to be opened when a recording starts.
+
+    If reading fails, e.g. because the device was unplugged, the source is closed,
+    the error is kept in `error` and every subscription raises CaptureError, so
+    recordings end instead of waiting for audio. `start` reopens the source.
+
+    Attributes:
+        error (Exception): Why the capture thread ended, None while it runs or after `stop`.
+    """
+
+    def __init__(self, source, ring_buffer_s: float = 2.0):
+        """
+        Initialize the ContinuousCapture without opening the source.
+
+        Args:
+            source: The audio source to keep open.
+            ring_buffer_s (float): Seconds of audio kept in the ring buffer.
+        """
+        self.source = source
+        self.chunk_s = source.frames_per_buffer / SAMPLE_RATE
+        self._ring = collections.deque(maxlen=max(1, round(ring_buffer_s / self.chunk_s)))
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self.error = None
+
+    def start(self):
+        """
+        Open the source and start the capture thread, also to reopen it after a failure.
+        """
+        try:
+            self.source.open()
+        except Exception as e:
+            # keep the capture marked as failed, so the next recording tries to reopen it again
+            self.error = e
+            raise
+        self.error = None
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the capture thread and close the source.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.error is None:
+            self.source.close()
+
+    def subscribe(self, pre_roll_s: float = 0.0) -> "CaptureSubscription":
+        """
+        Start receiving audio, beginning with up to `pre_roll_s` seconds of buffered audio.
+
+        Args:
+            pre_roll_s (float): Seconds of audio from before the call to include.
+
+        Returns:
+            CaptureSubscription: The subscription to read chunks from.
+        """
+        subscription = CaptureSubscription(self)
+        with self._lock:
+            if not self._running:
+                subscription.chunks.put(None)
+                return subscription
+            pre_roll_chunks = min(len(self._ring), round(pre_roll_s / self.chunk_s))
+            for chunk in list(self._ring)[len(self._ring) - pre_roll_chunks:]:
+                subscription.chunks.put(chunk)
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: "CaptureSubscription"):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def _run(self):
+        try:
+            while self._running:
+                chunk = self.source.read()
+                now = time.perf_counter()
+                with self._lock:
+                    self._ring.append(chunk)
+                    for subscription in self._subscriptions:
+                        if subscription.first_frame_time is None:
+                            subscription.first_frame_time = now
+                        subscription.chunks.put(chunk)
+        except Exception as e:
+            print(f"Audio capture failed: {e}")
+            try:
+                self.source.close()
+            except Exception:
+                pass
+            self.error = e
+        finally:
+            # None wakes the recordings still reading, they end with the audio they have
+            with self._lock:
+                self._running = False
+                for subscription in self._subscriptions:
+                    subscription.chunks.put(None)
+                self._subscriptions.clear()
+
+
+class CaptureSubscription:
+    """
+    CaptureSubscription behaves like an audio source for a single recording.
+
+    Attributes:
+        created_time (float): `time.perf_counter()` when the subscription was created.
+        first_frame_time (float): `time.perf_counter()` when the first live chunk arrived.
+    """
+
+    def __init__(self, capture: ContinuousCapture):
+        self.capture = capture
+        self.frames_per_buffer = capture.source.frames_per_buffer
+        self.chunks = queue.Queue()
+        self.created_time = time.perf_counter()
+        self.first_frame_time = None
+
+    def open(self):
+        pass
+
+    def read(self) -> bytes:
+        chunk = self.chunks.get()
+        if chunk is None:
+            # keep failing on further reads
+            self.chunks.put(None)
+            error = self.capture.error
+            raise CaptureError(f"Audio capture ended: {error}" if error is not None else "Audio capture was stopped")
+        return chunk
+
+    def close(self):
+        self.capture.unsubscribe(self)
+
+    def drain(self) -> bytes:
+        # the capture keeps converting after the recording, so nothing is held back for it
+        return b""
@@ -0,0 +1,159 @@
+"""
+This module transcribes recorded WAV files without the menu bar app.
+
+Files are transcribed with the same whisper.cpp settings, silence trimming and
+transcript cleanup as dictations, by a pool of worker processes that each run one
+whisper invocation at a time, so `--jobs` bounds the number of concurrent whisper
+processes. Results are written to stdout as they complete, as JSON lines or as
+tab-separated text, and a throughput summary is printed to stderr. Nothing here
+needs macOS, a keyboard hook or a microphone.
+
+Usage:
+    python -m osx_echo transcribe [--config config.json] [--lang LANG] [--jobs N] [--format jsonl|text]
+                                  FILE_OR_DIR [FILE_OR_DIR ...]
+"""
+
+import concurrent.futures
+import json
+import os
+import sys
+import time
+import wave
+
+from .config import Config
+from .constants import DEFAULT_WHISPER_THREADS, SAMPLE_RATE, SAMPLE_WIDTH
+from .postprocess import PostProcessor
+from .transcriber import Transcriber
+from .whisper_output import SegmentFilter
+
+# set in every worker process by _init_worker
+_transcriber = None
+_language_config = None
+
+
+class _DiscardOutput:
+    """
+    Output engine for the workers, which return transcripts instead of typing them.
+    """
+
+    def type(self, text: str):
+        pass
+
+    def erase(self, count: int):
+        pass
+
+
+def transcribe_files(args):
+    """
+    Transcribe the given files and directories and stream the results to stdout.
+    """
+    config = Config.from_config_file(args.config)
+    language_config = _find_language(config, args.lang)
+    files = _collect_files(args.paths)
+    if not files:
+        raise ValueError("No WAV files to transcribe")
+
+    jobs = args.jobs if args.jobs is not None else max(1, (os.cpu_count() or 1) // DEFAULT_WHISPER_THREADS)
+    print(f"Transcribing {len(files)} files with {jobs} concurrent whisper processes", file=sys.stderr)
+
+    audio_s = 0.0
+    failures = 0
+    t_start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                                initargs=(config, language_config)) as executor:
+        futures = [executor.submit(_transcribe_file, path) for path in files]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            audio_s += result["duration_s"] or 0.0
+            if result["error"] is not None:
+                failures += 1
+            _write_result(result, args.format)
+    elapsed = time.perf_counter() - t_start
+
+    print(f"{len(files)} files, {audio_s:.1f} s audio in {elapsed:.1f} s: {len(files) / elapsed:.2f} files/s, "
+          f"{audio_s / elapsed:.1f}x realtime, {failures} failed", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def _init_worker(config, language_config):
+    global _transcriber, _language_config
+
+    # stdout carries the results, so progress output of the transcriber goes to stderr
+    sys.stdout = sys.stderr
+    voice_gate = None
+    if config.get_vad_config() is not None:
+        from .vad import VoiceGate
+
+        voice_gate = VoiceGate.from_config(config.get_vad_config())
+    _transcriber = Transcriber(config.get_whisper_path(), output_engine=_DiscardOutput(), voice_gate=voice_gate,
+                               postprocessor=PostProcessor.from_config(config.get_postprocess_config()),
+                               segment_filter=SegmentFilter.from_config(config.get_confidence_config()))
+    _language_config = language_config
+
+
+def _transcribe_file(path):
+    result = {"file": path, "text": None, "duration_s": None, "elapsed_s": None, "error": None}
+    t_start = time.perf_counter()
+    try:
+        audio_data = _read_audio(path)
+        result["duration_s"] = len(audio_data) / (SAMPLE_WIDTH * SAMPLE_RATE)
+        result["text"] = _transcriber.transcribe_clean(audio_data, _language_config)
+    except Exception as e:
+        result["error"] = str(e)
+    result["elapsed_s"] = time.perf_counter() - t_start
+    return result
+
+
+def _read_audio(path):
+    with wave.open(path, "rb") as w:
+        channels, sample_width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        frames = w.readframes(w.getnframes())
+    if sample_width != SAMPLE_WIDTH:
+        raise ValueError(f"{path} has {8 * sample_width}-bit samples, only 16-bit PCM is supported")
+    if (channels, rate) == (1, SAMPLE_RATE):
+        return frames
+
+    from .resample import Resampler
+
+    resampler = Resampler(rate, channels)
+    return resampler.process(frames) + resampler.flush()
+
+
+def _write_result(result, output_format):
+    if output_format == "jsonl":
+        print(json.dumps(result), flush=True)
+    elif result["error"] is not None:
+        print(f"{result['file']}\tERROR: {result['error']}", flush=True)
+    else:
+        print(f"{result['file']}\t{result['text']}", flush=True)
+
+
+def _find_language(config, language):
+    language_support = config.get_language_support()
+    if language is None:
+        return language_support[0]
+    for language_config in language_support:
+        if language_config.language == language:
+            return language_config
+    raise ValueError(f"Language {language} is not configured, "
+                     f"choose one of {', '.join(lc.language for lc in language_support)}")
+
+
+def _collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(".wav")))
+        else:
+            files.append(path)
+    return files
+
+
+def add_arguments(parser):
+    parser.add_argument("paths", nargs="+", metavar="FILE_OR_DIR", help="WAV files or directories of WAV files")
+    parser.add_argument("--config", default="config.json", help="path to config.json")
+    parser.add_argument("--lang", help="language code from language_support, defaults to the first language")
+    parser.add_argument("--jobs", type=int,
+                        help="concurrent whisper processes, defaults to the core count divided by the whisper threads")
+    parser.add_argument("--format", choices=["jsonl", "text"], default="jsonl", help="output format")
+    parser.set_defaults(func=transcribe_files)
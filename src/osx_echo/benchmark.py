@@ -0,0 +1,1043 @@
+"""
+Benchmarks for OSX Echo components that run without a microphone, a Mac or
+whisper.cpp.
+
+Usage:
+    python -m osx_echo.benchmark typing [--chars N] [--event-cost-us US]
+    python -m osx_echo.benchmark pipeline CORPUS_DIR (--whisper PATH --model PATH | --stub-rtf RTF)
+                                          [--language LANG] [--realtime] [--output RESULTS.json]
+    python -m osx_echo.benchmark diff BASELINE.json CANDIDATE.json
+    python -m osx_echo.benchmark keys [--events N] [--listeners N] [--trigger-rate P] [--action-cost-ms MS]
+    python -m osx_echo.benchmark capture [--minutes M] [--spill-after-s S]
+    python -m osx_echo.benchmark longform RECORDING.wav (--whisper PATH --model PATH | --stub-rtf RTF)
+                                          [--language LANG] [--segment-s S] [--overlap-s S] [--processes N]
+    python -m osx_echo.benchmark resample [--seconds S]
+    python -m osx_echo.benchmark postprocess [--words N] [--sizes N,N,...] [--naive-max N]
+    python -m osx_echo.benchmark backends CORPUS_DIR --whisper PATH --library PATH --model PATH
+                                          [--language LANG] [--repeat N] [--beam-size N] [--best-of N]
+                                          [--min-match R]
+    python -m osx_echo.benchmark server [--stub-rtf RTF] [--requests N] [--clip-s S]
+    python -m osx_echo.benchmark stress [--seconds S] [--load-threads N] [--nice N] [--reserved-cores N]
+    python -m osx_echo.benchmark replay [TRACE.jsonl] [--config config.json] [--seconds S] [--save TRACE.jsonl]
+    python -m osx_echo.benchmark record-keys TRACE.jsonl [--seconds S]
+"""
+
+import argparse
+import contextlib
+import difflib
+import io
+import json
+import os
+import random
+import queue
+import re
+import resource
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+from .audio_source import SyntheticSource
+from .config import Config, LanguageConfig
+from .constants import (CHANNELS, DEFAULT_BEAM_SIZE, DEFAULT_BEST_OF, DEFAULT_WHISPER_THREADS, FRAMES_PER_BUFFER,
+                        SAMPLE_RATE, SAMPLE_WIDTH)
+from .jobs import JobScheduler
+from .longform import LongForm
+from .metrics import Metrics, RollingHistogram
+from .output import AdaptiveTyper, BatchedTyper, CharTyper, ClipboardPaster
+from .postprocess import PhraseReplacer
+from .recorder import Recorder
+from .resample import Resampler
+from .transcriber import Transcriber, encode_wav, run_whisper
+
+
+class MockController:
+    """
+    MockController stands in for a pynput keyboard controller and counts the
+    keyboard events it would have posted.
+
+    Like pynput, `type` emits a press and a release for every character. Each
+    event busy-waits for `event_cost_s` to model the cost of posting it.
+    """
+
+    def __init__(self, event_cost_s: float = 0.0):
+        self.event_cost_s = event_cost_s
+        self.events = 0
+        self.calls = 0
+        self.typed = []
+
+    def press(self, key):
+        self._event()
+
+    def release(self, key):
+        self._event()
+
+    def type(self, text):
+        self.calls += 1
+        self.typed.append(text)
+        for _ in text:
+            self._event()
+            self._event()
+
+    @contextlib.contextmanager
+    def pressed(self, *keys):
+        for key in keys:
+            self.press(key)
+        try:
+            yield
+        finally:
+            for key in reversed(keys):
+                self.release(key)
+
+    def _event(self):
+        self.events += 1
+        if self.event_cost_s:
+            deadline = time.perf_counter() + self.event_cost_s
+            while time.perf_counter() < deadline:
+                pass
+
+
+class MockApp:
+    """
+    MockApp stands in for the menu bar app and sleeps for `action_cost_s` in every
+    action, modelling thread spawning and menu bar updates.
+    """
+
+    def __init__(self, action_cost_s: float = 0.0):
+        self.action_cost_s = action_cost_s
+        self.actions = 0
+        self.recording_in_progress = False
+
+    def toggle_recording(self, language_config):
+        self.recording_in_progress = not self.recording_in_progress
+        self._action()
+
+    def start_recording(self, language_config):
+        self.recording_in_progress = True
+        self._action()
+
+    def stop_recording(self, _):
+        self.recording_in_progress = False
+        self._action()
+
+    def _action(self):
+        self.actions += 1
+        time.sleep(self.action_cost_s)
+
+
+class CountingSource:
+    """
+    CountingSource produces `chunks` chunks of noise as fast as possible and then
+    calls `on_exhausted` from the reading thread, without holding the audio in memory.
+    """
+
+    def __init__(self, chunks: int, frames_per_buffer: int = FRAMES_PER_BUFFER, on_exhausted=None):
+        self.chunks = chunks
+        self.frames_per_buffer = frames_per_buffer
+        self.on_exhausted = on_exhausted
+        self.first_frame_time = None
+        self._read = 0
+        self._chunk = os.urandom(frames_per_buffer * SAMPLE_WIDTH)
+
+    def open(self):
+        self._read = 0
+
+    def read(self) -> bytes:
+        self._read += 1
+        if self.first_frame_time is None:
+            self.first_frame_time = time.perf_counter()
+        if self._read == self.chunks and self.on_exhausted is not None:
+            self.on_exhausted()
+        # a fresh object per chunk, like a real device
+        return bytes(memoryview(self._chunk))
+
+    def close(self):
+        pass
+
+    def drain(self) -> bytes:
+        return b""
+
+
+class CollectingScheduler:
+    """
+    CollectingScheduler stands in for the JobScheduler and keeps the submitted audio.
+    """
+
+    def __init__(self):
+        self.submitted = []
+        self.event = threading.Event()
+
+    def new_group(self) -> int:
+        return 0
+
+    def submit(self, audio_data, language_config, group=None, supersede=False, trace=None):
+        self.submitted.append(audio_data)
+        self.event.set()
+
+
+class MemoryClipboard:
+    """
+    MemoryClipboard stands in for the system clipboard.
+    """
+
+    def __init__(self, content: str = ""):
+        self.content = content
+
+    def get(self) -> str:
+        return self.content
+
+    def set(self, text: str):
+        self.content = text
+
+
+def bench_typing(args):
+    """
+    Measure characters per second and emitted keyboard events for every output strategy.
+    """
+    text = ("The quick brown fox jumps over the lazy dog. " * (args.chars // 45 + 1))[:args.chars]
+    strategies = {
+        "char": lambda c: CharTyper(c),
+        "batched": lambda c: BatchedTyper(c),
+        "adaptive": lambda c: AdaptiveTyper(c),
+        "paste": lambda c: ClipboardPaster(c, MemoryClipboard("previous"), modifier="cmd"),
+    }
+
+    print(f"{'strategy':<10} {'chars/s':>12} {'events':>8} {'calls':>6} {'time ms':>9}")
+    for name, build in strategies.items():
+        controller = MockController(args.event_cost_us / 1e6)
+        engine = build(controller)
+        t_start = time.perf_counter()
+        engine.type(text)
+        elapsed = time.perf_counter() - t_start
+        print(f"{name:<10} {len(text) / elapsed:>12.0f} {controller.events:>8} {controller.calls:>6} "
+              f"{elapsed * 1000:>9.1f}")
+
+
+def bench_pipeline(args):
+    """
+    Replay a directory of WAV files through the Recorder, JobScheduler and Transcriber.
+
+    Audio comes from a SyntheticSource, typing goes to a MockController, and whisper
+    is either the given binary or a generated stand-in that sleeps for `--stub-rtf`
+    times the clip duration. Reports real-time factor, per-stage latency, throughput
+    and peak RSS, and optionally writes them as JSON for `diff`.
+    """
+    files = sorted(os.path.join(args.corpus, f) for f in os.listdir(args.corpus) if f.lower().endswith(".wav"))
+    if not files:
+        raise ValueError(f"No WAV files in {args.corpus}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.stub_rtf is not None:
+            whisper_path = _write_stub_whisper(tmp_dir, args.stub_rtf)
+            model_path = "stub"
+        else:
+            if args.whisper is None or args.model is None:
+                raise ValueError("--whisper and --model are required unless --stub-rtf is given")
+            whisper_path, model_path = args.whisper, args.model
+
+        language_config = LanguageConfig(args.language, args.language, model_path, {})
+        controller = MockController()
+        transcriber = Transcriber(whisper_path, output_engine=BatchedTyper(controller))
+        scheduler = JobScheduler(transcriber, workers=1)
+        metrics = Metrics()
+        finished = threading.Event()
+        metrics.on_update = lambda _: finished.set()
+
+        utterances = []
+        t_start = time.perf_counter()
+        for path in files:
+            audio_data = _read_wav(path)
+            duration_s = len(audio_data) / (SAMPLE_WIDTH * SAMPLE_RATE)
+            trace = metrics.start_trace()
+            source = SyntheticSource(audio_data, realtime=args.realtime,
+                                     on_exhausted=lambda: (trace.mark("stop"), recorder.stop()))
+            recorder = Recorder(scheduler, None, audio_source=source)
+
+            finished.clear()
+            trace.mark("start_recording")
+            recorder.start(language_config, trace)
+            if not finished.wait(timeout=max(60.0, 10 * duration_s)):
+                raise TimeoutError(f"Transcription of {path} did not finish")
+
+            stages = {stage: duration for stage, _, duration in trace.intervals()}
+            whisper_s = trace.marks["whisper_end"] - trace.marks["whisper_start"]
+            utterances.append({
+                "file": os.path.basename(path),
+                "duration_s": duration_s,
+                "rtf": whisper_s / duration_s if duration_s else None,
+                "release_to_text_ms": (trace.marks["typed"] - trace.marks["stop"]) * 1000,
+                "stages_ms": {stage: duration * 1000 for stage, duration in stages.items()},
+            })
+            print(f"{os.path.basename(path)}: {duration_s:.2f} s audio, rtf {utterances[-1]['rtf']:.3f}, "
+                  f"release to text {utterances[-1]['release_to_text_ms']:.0f} ms")
+        elapsed = time.perf_counter() - t_start
+        scheduler.shutdown()
+
+    total_audio_s = sum(u["duration_s"] for u in utterances)
+    summary = {
+        "utterances": len(utterances),
+        "audio_s": total_audio_s,
+        "wall_s": elapsed,
+        "throughput_utt_per_s": len(utterances) / elapsed,
+        "rtf_mean": sum(u["rtf"] for u in utterances if u["rtf"] is not None) / len(utterances),
+        "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+        "children_peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "stages_ms": {name: {"p50": p50 * 1000, "p95": p95 * 1000} for name, p50, p95 in metrics.summary()},
+    }
+
+    print(f"{summary['utterances']} utterances, {total_audio_s:.1f} s audio in {elapsed:.1f} s, "
+          f"{summary['throughput_utt_per_s']:.2f} utt/s, mean rtf {summary['rtf_mean']:.3f}")
+    print(f"peak RSS {summary['peak_rss_mb']:.0f} MB, whisper peak RSS {summary['children_peak_rss_mb']:.0f} MB")
+    for name, p in summary["stages_ms"].items():
+        print(f"  {name:<16} p50 {p['p50']:>8.1f} ms  p95 {p['p95']:>8.1f} ms")
+
+    if args.output is not None:
+        results = {
+            "corpus": os.path.abspath(args.corpus),
+            "whisper": "stub" if args.stub_rtf is not None else os.path.abspath(args.whisper),
+            "realtime": args.realtime,
+            "summary": summary,
+            "utterances": utterances,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def bench_diff(args):
+    """
+    Compare the summaries of two `pipeline` result files.
+    """
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["summary"]
+    with open(args.candidate, "r", encoding="utf-8") as f:
+        candidate = json.load(f)["summary"]
+
+    rows = [(key, baseline[key], candidate[key]) for key in
+            ["wall_s", "throughput_utt_per_s", "rtf_mean", "peak_rss_mb", "children_peak_rss_mb"]]
+    for stage in baseline["stages_ms"]:
+        if stage in candidate["stages_ms"]:
+            for p in ["p50", "p95"]:
+                rows.append((f"{stage} {p} ms", baseline["stages_ms"][stage][p], candidate["stages_ms"][stage][p]))
+
+    print(f"{'metric':<32} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for name, old, new in rows:
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{name:<32} {old:>12.3f} {new:>12.3f} {change:>9}")
+
+
+def bench_keys(args):
+    """
+    Replay a synthetic key stream through the listeners and measure the time spent in the hook callback.
+
+    Compares the previous dispatch, which offers every key to every listener and runs
+    app actions inline, with the indexed multiplexer and the action dispatcher.
+    """
+    from pynput import keyboard
+
+    from .listeners import build_action_dispatcher, build_key_listener, build_listener_multiplexer
+
+    trigger_keys = ["f13", "f14", "f6", "f10", "cmd_r", "alt_r", "ctrl_r", "shift_r"]
+    if args.listeners > len(trigger_keys):
+        raise ValueError(f"At most {len(trigger_keys)} listeners are supported")
+    language_configs = [LanguageConfig(f"l{i}", f"Language {i}", "model", {"type": "double_tap", "key": key})
+                        for i, key in enumerate(trigger_keys[:args.listeners])]
+
+    rng = random.Random(0)
+    letters = [keyboard.KeyCode.from_char(c) for c in "abcdefghijklmnopqrstuvwxyz "]
+    triggers = [keyboard.Key[key] for key in trigger_keys[:args.listeners]]
+    stream = [rng.choice(triggers) if rng.random() < args.trigger_rate else rng.choice(letters)
+              for _ in range(args.events)]
+
+    def linear(app):
+        listeners = [build_key_listener(app, lc) for lc in language_configs]
+
+        def on_press(key):
+            for listener in listeners:
+                listener.on_key_press(key)
+
+        def on_release(key):
+            for listener in listeners:
+                listener.on_key_release(key)
+        return on_press, on_release, None
+
+    def indexed(app):
+        dispatcher = build_action_dispatcher(app)
+        multiplexer = build_listener_multiplexer([build_key_listener(dispatcher, lc) for lc in language_configs],
+                                                 dispatcher)
+        return multiplexer.on_key_press, multiplexer.on_key_release, dispatcher
+
+    print(f"{args.events} key events, {args.listeners} listeners, trigger rate {args.trigger_rate:.3f}, "
+          f"action cost {args.action_cost_ms:.1f} ms")
+    print(f"{'dispatch':<10} {'p50 us':>9} {'p99 us':>9} {'max us':>10} {'total ms':>10} {'actions':>8}")
+    for name, build in [("linear", linear), ("indexed", indexed)]:
+        app = MockApp(args.action_cost_ms / 1000)
+        on_press, on_release, dispatcher = build(app)
+        histogram = RollingHistogram(2 * len(stream))
+        total_s = 0.0
+        for key in stream:
+            for callback in (on_press, on_release):
+                t_start = time.perf_counter()
+                callback(key)
+                elapsed = time.perf_counter() - t_start
+                histogram.add(elapsed)
+                total_s += elapsed
+        if dispatcher is not None:
+            dispatcher.stop()
+        print(f"{name:<10} {histogram.percentile(50) * 1e6:>9.2f} {histogram.percentile(99) * 1e6:>9.2f} "
+              f"{histogram.percentile(100) * 1e6:>10.1f} {total_s * 1000:>10.2f} {app.actions:>8}")
+
+
+def bench_capture(args):
+    """
+    Record a long synthetic dictation and compare the peak Python memory of joining a
+    list of chunks with the Recorder's AudioBuffer.
+
+    Fails if the AudioBuffer's peak exceeds a bound that does not depend on the
+    length of the recording: the audio kept in memory until it spills, with the
+    bytearray's over-allocation, plus a few chunks in flight.
+    """
+    chunks = round(args.minutes * 60 * SAMPLE_RATE / FRAMES_PER_BUFFER)
+    audio_mb = chunks * FRAMES_PER_BUFFER * SAMPLE_WIDTH / (1024 * 1024)
+    language_config = LanguageConfig("en", "English", "model", {})
+    print(f"{args.minutes:.0f} min recording, {audio_mb:.1f} MB of audio, spill after {args.spill_after_s:.0f} s")
+    print(f"{'capture':<10} {'peak MB':>9} {'time s':>8} {'spilled':>8}")
+
+    # the list and join of the previous Recorder
+    source = CountingSource(chunks)
+    tracemalloc.start()
+    t_start = time.perf_counter()
+    source.open()
+    frames = [source.read() for _ in range(chunks)]
+    audio_data = b"".join(frames)
+    elapsed = time.perf_counter() - t_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del frames, audio_data
+    print(f"{'join':<10} {peak / (1024 * 1024):>9.1f} {elapsed:>8.2f} {'':>8}")
+
+    scheduler = CollectingScheduler()
+    recorder = None
+    source = CountingSource(chunks, on_exhausted=lambda: recorder.stop())
+    recorder = Recorder(scheduler, None, {"spill_after_s": args.spill_after_s}, audio_source=source)
+    tracemalloc.start()
+    t_start = time.perf_counter()
+    recorder.start(language_config)
+    scheduler.event.wait()
+    elapsed = time.perf_counter() - t_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    audio_data = scheduler.submitted[0]
+    spilled = not isinstance(audio_data.obj, bytearray)
+    if len(audio_data) != chunks * FRAMES_PER_BUFFER * SAMPLE_WIDTH:
+        raise AssertionError(f"Recorded {len(audio_data)} bytes instead of {chunks * FRAMES_PER_BUFFER * SAMPLE_WIDTH}")
+    print(f"{'buffer':<10} {peak / (1024 * 1024):>9.1f} {elapsed:>8.2f} {str(spilled):>8}")
+
+    # bytearray over-allocates by up to an eighth, the rest is chunks in flight and interpreter bookkeeping
+    in_memory_bytes = min(args.spill_after_s * SAMPLE_RATE, args.minutes * 60 * SAMPLE_RATE) * SAMPLE_WIDTH
+    bound = in_memory_bytes * 1.125 + 8 * FRAMES_PER_BUFFER * SAMPLE_WIDTH + 1024 * 1024
+    if peak > bound:
+        raise AssertionError(f"AudioBuffer peak {peak / (1024 * 1024):.1f} MB exceeds the bound of "
+                             f"{bound / (1024 * 1024):.1f} MB")
+    print(f"buffer peak within {bound / (1024 * 1024):.1f} MB, independent of the recording length")
+
+
+def bench_longform(args):
+    """
+    Transcribe one long recording with a single whisper process and as parallel segments, and report the speedup.
+    """
+    audio_data = _read_wav(args.recording)
+    duration_s = len(audio_data) / (SAMPLE_WIDTH * SAMPLE_RATE)
+    longform = LongForm(0.0, args.segment_s, args.overlap_s, args.processes)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.stub_rtf is not None:
+            whisper_path, model_path = _write_stub_whisper(tmp_dir, args.stub_rtf), "stub"
+        else:
+            if args.whisper is None or args.model is None:
+                raise ValueError("--whisper and --model are required unless --stub-rtf is given")
+            whisper_path, model_path = args.whisper, args.model
+
+        t_start = time.perf_counter()
+        single_text = run_whisper(whisper_path, model_path, args.language, DEFAULT_WHISPER_THREADS,
+                                  encode_wav(audio_data)).text
+        single_s = time.perf_counter() - t_start
+
+        t_start = time.perf_counter()
+        parallel_text = longform.transcribe(
+            audio_data, lambda segment, threads: run_whisper(whisper_path, model_path, args.language, threads,
+                                                             encode_wav(segment)).text)
+        parallel_s = time.perf_counter() - t_start
+    longform.shutdown()
+
+    print(f"{duration_s:.0f} s recording, {longform.last_report['segments']} segments")
+    print(f"single process ({DEFAULT_WHISPER_THREADS} threads): {single_s:.2f} s, "
+          f"{len(single_text.split())} words, rtf {single_s / duration_s:.3f}")
+    print(f"{longform.processes} processes ({longform.threads} threads each): {parallel_s:.2f} s, "
+          f"{len(parallel_text.split())} words, rtf {parallel_s / duration_s:.3f}")
+    print(f"speedup {single_s / parallel_s:.2f}x")
+
+
+def bench_resample(args):
+    """
+    Measure resampler throughput on common device formats, and its accuracy on synthetic tones.
+
+    Accuracy is the signal-to-error ratio against the exact tone at 16 kHz, and against
+    `scipy.signal.resample_poly` if SciPy is installed. Chunked conversion is also
+    compared with converting the whole clip at once.
+    """
+    formats = [(48000, 2), (48000, 1), (44100, 2), (44100, 1), (22050, 1), (8000, 1)]
+    rng = np.random.default_rng(0)
+
+    print(f"{'format':<12} {'x realtime':>11} {'Msamples/s':>11}")
+    for rate, channels in formats:
+        noise = rng.integers(-3000, 3000, int(args.seconds * rate) * channels, dtype=np.int16).tobytes()
+        resampler = Resampler(rate, channels)
+        chunk_bytes = round(FRAMES_PER_BUFFER * rate / SAMPLE_RATE) * channels * SAMPLE_WIDTH
+        t_start = time.perf_counter()
+        for offset in range(0, len(noise), chunk_bytes):
+            resampler.process(noise[offset:offset + chunk_bytes])
+        resampler.flush()
+        elapsed = time.perf_counter() - t_start
+        print(f"{rate}x{channels:<6} {args.seconds / elapsed:>11.0f} "
+              f"{args.seconds * rate * channels / elapsed / 1e6:>11.1f}")
+
+    try:
+        from scipy import signal
+    except ImportError:
+        signal = None
+        print("SciPy is not installed, comparing with the exact tones only")
+
+    print(f"{'format':<12} {'tone Hz':>8} {'SNR dB':>8} {'vs scipy':>9} {'chunked':>8}")
+    for rate, channels in formats:
+        for frequency in (200, 1000, 3000, 6000):
+            if frequency >= 0.45 * min(rate, SAMPLE_RATE):
+                continue
+            t = np.arange(2 * rate) / rate
+            tone = 10000 * np.sin(2 * np.pi * frequency * t)
+            pcm = np.repeat(tone[:, None], channels, axis=1).astype(np.int16).tobytes()
+
+            chunked = Resampler(rate, channels)
+            chunk_bytes = round(FRAMES_PER_BUFFER * rate / SAMPLE_RATE) * channels * SAMPLE_WIDTH
+            out = b"".join(chunked.process(pcm[offset:offset + chunk_bytes])
+                           for offset in range(0, len(pcm), chunk_bytes)) + chunked.flush()
+            whole = Resampler(rate, channels)
+            matches = out == whole.process(pcm) + whole.flush()
+
+            converted = np.frombuffer(out, dtype=np.int16).astype(np.float64)
+            exact = 10000 * np.sin(2 * np.pi * frequency * np.arange(len(converted)) / SAMPLE_RATE)
+            # skip the edges, where the filter sees the silence around the clip
+            inner = slice(SAMPLE_RATE // 20, len(converted) - SAMPLE_RATE // 20)
+            snr = _snr_db(exact[inner], converted[inner])
+            vs_scipy = "n/a"
+            if signal is not None:
+                reference = signal.resample_poly(tone, chunked.up, chunked.down)[:len(converted)]
+                vs_scipy = f"{_snr_db(reference[inner], converted[inner]):.1f}"
+            print(f"{rate}x{channels:<6} {frequency:>8} {snr:>8.1f} {vs_scipy:>9} {str(matches):>8}")
+
+
+def bench_postprocess(args):
+    """
+    Measure the cost of phrase replacement per transcript as the dictionary grows.
+
+    Compares the PhraseReplacer automaton with applying one compiled regex per
+    dictionary entry, which is only run up to `--naive-max` entries.
+    """
+    rng = random.Random(0)
+    syllables = ["ka", "lo", "mi", "ter", "zu", "pra", "nex", "do", "vi", "sen", "ra", "tol"]
+
+    def word():
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    phrases = [" ".join(word() for _ in range(rng.randint(1, 3))) for _ in range(max(sizes))]
+    vocabulary = [word() for _ in range(500)]
+
+    print(f"{args.words} word transcripts")
+    print(f"{'entries':>8} {'build ms':>9} {'trie us':>9} {'regex us':>10} {'matches':>8}")
+    for size in sizes:
+        dictionary = {phrase: phrase.upper() for phrase in phrases[:size]}
+        # every tenth word starts a dictionary phrase, so matches are found at every size
+        words = []
+        while len(words) < args.words:
+            words.extend(rng.choice(phrases[:size]).split() if size and rng.random() < 0.1
+                         else [rng.choice(vocabulary)])
+        text = " ".join(words)
+
+        t_start = time.perf_counter()
+        replacer = PhraseReplacer(dictionary)
+        build_s = time.perf_counter() - t_start
+        trie_s = _time_per_call(lambda: replacer.apply(text))
+        replaced = replacer.apply(text)
+        matches = sum(1 for a, b in zip(text.split(), replaced.split()) if a != b)
+
+        regex = "n/a"
+        if size <= args.naive_max:
+            patterns = [(re.compile(r"\b" + re.escape(phrase) + r"\b", re.IGNORECASE), replacement)
+                        for phrase, replacement in dictionary.items()]
+
+            def naive():
+                result = text
+                for pattern, replacement in patterns:
+                    result = pattern.sub(replacement, result)
+                return result
+            regex = f"{_time_per_call(naive) * 1e6:.0f}"
+        print(f"{size:>8} {build_s * 1000:>9.1f} {trie_s * 1e6:>9.0f} {regex:>10} {matches:>8}")
+
+
+def bench_backends(args):
+    """
+    Transcribe a WAV corpus with the `main` executable and with in-process libwhisper, and compare text and latency.
+
+    Both backends decode with the same beam size and best-of. Exits with an error if
+    the words of any file agree less than `--min-match`.
+    """
+    from .libwhisper import InProcessWhisper
+
+    files = sorted(f for f in os.listdir(args.corpus) if f.lower().endswith(".wav"))
+    in_process = InProcessWhisper(args.library)
+    t_start = time.perf_counter()
+    in_process.load(args.model)
+    print(f"model loaded in process in {time.perf_counter() - t_start:.2f} s")
+
+    subprocess_s, in_process_s = RollingHistogram(len(files) * args.repeat), RollingHistogram(len(files) * args.repeat)
+    print(f"{'file':<24} {'main ms':>9} {'lib ms':>9} {'match':>6}")
+    mismatched = []
+    for name in files:
+        audio_data = _read_wav(os.path.join(args.corpus, name))
+        for _ in range(args.repeat):
+            t_start = time.perf_counter()
+            main_text = run_whisper(args.whisper, args.model, args.language, DEFAULT_WHISPER_THREADS,
+                                    encode_wav(audio_data), beam_size=args.beam_size, best_of=args.best_of).text
+            main_s = time.perf_counter() - t_start
+            t_start = time.perf_counter()
+            lib_text = in_process.transcribe(audio_data, args.model, args.language, DEFAULT_WHISPER_THREADS,
+                                             args.beam_size, args.best_of).text
+            lib_s = time.perf_counter() - t_start
+            subprocess_s.add(main_s)
+            in_process_s.add(lib_s)
+        # the backends run the same model with the same decoding parameters, so the words should agree
+        match = difflib.SequenceMatcher(None, main_text.split(), lib_text.split()).ratio()
+        print(f"{name:<24} {main_s * 1000:>9.0f} {lib_s * 1000:>9.0f} {match:>6.2f}")
+        if match < 1.0:
+            print(f"  main: {main_text.strip()}\n  lib:  {lib_text.strip()}")
+        if match < args.min_match:
+            mismatched.append(name)
+    in_process.unload_all()
+
+    for label, histogram in (("main", subprocess_s), ("libwhisper", in_process_s)):
+        print(f"{label:<10} p50 {histogram.percentile(50) * 1000:.0f} ms, p95 {histogram.percentile(95) * 1000:.0f} ms")
+    if mismatched:
+        raise SystemExit(f"{len(mismatched)} files match less than {args.min_match:.2f}: {', '.join(mismatched)}")
+
+
+def bench_server(args):
+    """
+    Run the resident server lifecycle against a stand-in whisper.cpp server.
+
+    Checks that the server is only started by the first request, that a killed
+    server is restarted by the next request, and that a request the server dies
+    during is retried once on a restarted server. Reports cold start and request latency.
+    """
+    from .whisper_server import WhisperServerPool
+
+    audio_data = encode_wav(bytes(int(args.clip_s * SAMPLE_RATE) * SAMPLE_WIDTH))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        crash_path = os.path.join(tmp_dir, "crash")
+        pool = WhisperServerPool(_write_stub_whisper_server(tmp_dir, args.stub_rtf, crash_path), threads=1)
+        server = pool.get("stub")
+        try:
+            if server.is_alive():
+                raise AssertionError("Server was started before the first request")
+            result = server.inference(audio_data, "en")
+            if not server.is_alive() or not result.text.strip() or result.segments[0].start_s is None:
+                raise AssertionError(f"First request did not start the server and transcribe: {result.text!r}")
+            print(f"lazy start: cold start {server.cold_start_s * 1000:.0f} ms")
+
+            requests_s = RollingHistogram(args.requests)
+            for _ in range(args.requests):
+                t_start = time.perf_counter()
+                server.inference(audio_data, "en")
+                requests_s.add(time.perf_counter() - t_start)
+            print(f"warm requests: p50 {requests_s.percentile(50) * 1000:.0f} ms, "
+                  f"p95 {requests_s.percentile(95) * 1000:.0f} ms")
+
+            pid = server._process.pid
+            server._process.kill()
+            server._process.wait()
+            server.inference(audio_data, "en")
+            if server._process.pid == pid:
+                raise AssertionError("Killed server was not restarted")
+            print(f"restart after kill: cold start {server.cold_start_s * 1000:.0f} ms")
+
+            # the stand-in exits without answering the next request, which has to be retried on a new server
+            open(crash_path, "w").close()
+            pid = server._process.pid
+            result = server.inference(audio_data, "en")
+            if os.path.exists(crash_path) or server._process.pid == pid or not result.text.strip():
+                raise AssertionError("Request the server died during was not retried on a restarted server")
+            print(f"retry after crash during request: cold start {server.cold_start_s * 1000:.0f} ms")
+        finally:
+            pool.stop_all()
+
+
+def bench_stress(args):
+    """
+    Measure hook callback latency and typing rate while inference-like load saturates the machine.
+
+    The load is one busy process per inference thread, started like whisper.cpp
+    would be. Hook latency is the delay between posting an event to a waiting
+    thread and that thread handling it, which is what the pynput hook thread sees.
+    The typing rate is that of the per-character typer, whose short sleeps expose
+    scheduling delays. Runs idle, under load at normal priority and under load
+    through the Governor.
+    """
+    from .governor import Governor
+
+    load_threads = args.load_threads if args.load_threads is not None else os.cpu_count() or 1
+    governor = Governor(args.nice, args.io_priority, args.reserved_cores)
+    text = ("The quick brown fox jumps over the lazy dog. " * (args.chars // 45 + 1))[:args.chars]
+    scenarios = [("idle", None, 0), ("loaded", None, load_threads),
+                 ("governed", governor, min(load_threads, governor.max_threads))]
+
+    print(f"{load_threads} load threads, governor: nice {governor.nice}, io {governor.io_priority}, "
+          f"inference cores {governor.inference_cores}, max threads {governor.max_threads}")
+    print(f"{'scenario':<10} {'load':>5} {'p50 us':>9} {'p99 us':>9} {'max us':>10} {'chars/s':>10}")
+    for name, scenario_governor, threads in scenarios:
+        command = [sys.executable, "-c", "while True: pass"]
+        if scenario_governor is not None:
+            command = scenario_governor.command(command)
+        burners = [subprocess.Popen(command) for _ in range(threads)]
+        try:
+            time.sleep(0.5)
+            latency = _hook_latency(args.seconds, args.event_interval_ms / 1000)
+            controller = MockController(args.event_cost_us / 1e6)
+            t_start = time.perf_counter()
+            CharTyper(controller).type(text)
+            chars_s = len(text) / (time.perf_counter() - t_start)
+        finally:
+            for burner in burners:
+                burner.kill()
+                burner.wait()
+        print(f"{name:<10} {threads:>5} {latency.percentile(50) * 1e6:>9.0f} {latency.percentile(99) * 1e6:>9.0f} "
+              f"{latency.percentile(100) * 1e6:>10.0f} {chars_s:>10.0f}")
+
+
+def bench_replay(args):
+    """
+    Replay a recorded or synthetic key event trace through the trigger listeners.
+
+    Without a trace, typing with trigger gestures and stray taps of double tap keys is
+    generated for `--seconds` and the listed number of copies is concatenated to
+    reach a high event count.
+    """
+    from .key_replay import load_trace, replay, save_trace, synthetic_trace
+
+    if args.config is not None:
+        language_configs = Config.from_config_file(args.config).get_language_support()
+    else:
+        language_configs = [
+            LanguageConfig("en", "English", "model", {"type": "double_tap", "key": "cmd_r"}),
+            LanguageConfig("de", "German", "model", {"type": "key_hold", "keys": ["ctrl_r", "shift_r"]}),
+            LanguageConfig("fr", "French", "model", {"type": "key_press", "key": "f13"}),
+        ]
+
+    if args.trace is not None:
+        events = load_trace(args.trace)
+    else:
+        events = synthetic_trace(language_configs, args.seconds, args.typing_cps, args.gesture_interval_s,
+                                 args.stray_rate)
+    if args.save is not None:
+        save_trace(events, args.save)
+
+    t_start = time.perf_counter()
+    report = replay(events, language_configs)
+    elapsed = time.perf_counter() - t_start
+    dispatch, decide = report["dispatch"], report["decide"]
+    print(f"{report['events']} key events replayed in {elapsed * 1000:.0f} ms "
+          f"({report['events'] / elapsed:.0f} events/s)")
+    print(f"dispatch cost: p50 {dispatch.percentile(50) * 1e6:.2f} us, p99 {dispatch.percentile(99) * 1e6:.2f} us, "
+          f"max {dispatch.percentile(100) * 1e6:.1f} us")
+    if len(decide):
+        print(f"time to decide: p50 {decide.percentile(50) * 1000:.0f} ms, p95 {decide.percentile(95) * 1000:.0f} ms")
+    print(f"{report['actions']} actions, {report['ignored']} ignored, {report['expected']} expected, "
+          f"{len(report['false_triggers'])} false triggers, {len(report['misses'])} misses")
+    for action, language, t in report["false_triggers"][:args.show]:
+        print(f"  false trigger {action} {language or ''} at {t:.3f} s")
+    for action, language, t in report["misses"][:args.show]:
+        print(f"  missed {action} {language} at {t:.3f} s")
+
+
+def bench_record_keys(args):
+    """
+    Record the live keyboard into a trace for `replay`.
+    """
+    from .key_replay import record_trace
+
+    record_trace(args.output, args.seconds)
+
+
+def _hook_latency(seconds, interval_s):
+    events = queue.SimpleQueue()
+    histogram = RollingHistogram(int(seconds / interval_s) + 1)
+
+    def handle():
+        while True:
+            t_posted = events.get()
+            if t_posted is None:
+                return
+            histogram.add(time.perf_counter() - t_posted)
+
+    handler = threading.Thread(target=handle)
+    handler.start()
+    t_end = time.perf_counter() + seconds
+    while time.perf_counter() < t_end:
+        events.put(time.perf_counter())
+        time.sleep(interval_s)
+    events.put(None)
+    handler.join()
+    return histogram
+
+
+def _time_per_call(func, min_time_s=0.2):
+    calls = 0
+    t_start = time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - t_start
+        if elapsed >= min_time_s:
+            return elapsed / calls
+
+
+def _snr_db(reference, signal):
+    return 10 * np.log10(np.sum(reference ** 2) / max(np.sum((signal - reference) ** 2), 1e-12))
+
+
+def stub_whisper_main(argv, rtf):
+    """
+    Behave like the whisper.cpp `main` executable reading a WAV from stdin: sleep for
+    `rtf` times the clip duration and print a transcript to stdout.
+    """
+    with wave.open(sys.stdin.buffer, "rb") as w:
+        duration_s = w.getnframes() / w.getframerate()
+    time.sleep(duration_s * rtf)
+    print(f" Stub transcript of {duration_s:.2f} seconds.")
+
+
+def _write_stub_whisper(directory, rtf):
+    path = os.path.join(directory, "whisper-stub")
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"#!{sys.executable}\n"
+                "import sys\n"
+                f"sys.path.insert(0, {package_root!r})\n"
+                "from osx_echo.benchmark import stub_whisper_main\n"
+                f"stub_whisper_main(sys.argv[1:], {rtf!r})\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+def stub_whisper_server_main(argv, rtf, crash_path):
+    """
+    Behave like the whisper.cpp `server` example: answer `POST /inference` with a
+    `verbose_json` transcript after sleeping for `rtf` times the clip duration.
+
+    If `crash_path` exists when a request arrives, it is deleted and the process
+    exits without answering, like a server that crashes during inference.
+    """
+    import http.server
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-m")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    options, _ = parser.parse_known_args(argv)
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            if os.path.exists(crash_path):
+                os.remove(crash_path)
+                os._exit(1)
+            boundary = self.headers["Content-Type"].split("boundary=")[1].encode("utf-8")
+            fields = {}
+            for part in body.split(b"--" + boundary):
+                header, _, content = part.partition(b"\r\n\r\n")
+                name = re.search(rb'name="([^"]+)"', header)
+                if name is not None:
+                    fields[name.group(1).decode("utf-8")] = content[:-2]
+            with wave.open(io.BytesIO(fields["file"]), "rb") as w:
+                duration_s = w.getnframes() / w.getframerate()
+            time.sleep(duration_s * rtf)
+            text = f" Stub transcript of {duration_s:.2f} seconds."
+            if fields.get("response_format") == b"verbose_json":
+                text = json.dumps({"text": text, "segments": [
+                    {"id": 0, "text": text, "start": 0.0, "end": duration_s, "avg_logprob": -0.1}]})
+            response = text.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, format, *args):
+            pass
+
+    http.server.HTTPServer((options.host, options.port), Handler).serve_forever()
+
+
+def _write_stub_whisper_server(directory, rtf, crash_path):
+    path = os.path.join(directory, "whisper-server-stub")
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"#!{sys.executable}\n"
+                "import sys\n"
+                f"sys.path.insert(0, {package_root!r})\n"
+                "from osx_echo.benchmark import stub_whisper_server_main\n"
+                f"stub_whisper_server_main(sys.argv[1:], {rtf!r}, {crash_path!r})\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+def _read_wav(path):
+    with wave.open(path, "rb") as w:
+        if (w.getnchannels(), w.getsampwidth(), w.getframerate()) != (CHANNELS, SAMPLE_WIDTH, SAMPLE_RATE):
+            raise ValueError(f"{path} is not 16 kHz mono 16-bit PCM")
+        return w.readframes(w.getnframes())
+
+
+def _peak_rss_mb(who):
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    max_rss = resource.getrusage(who).ru_maxrss
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m osx_echo.benchmark")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    typing_parser = subparsers.add_parser("typing", help="output engine throughput")
+    typing_parser.add_argument("--chars", type=int, default=1000, help="length of the typed transcript")
+    typing_parser.add_argument("--event-cost-us", type=float, default=20.0,
+                               help="simulated cost of posting one keyboard event")
+    typing_parser.set_defaults(func=bench_typing)
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="replay a WAV corpus through the recorder and transcriber")
+    pipeline_parser.add_argument("corpus", help="directory of 16 kHz mono 16-bit WAV files")
+    pipeline_parser.add_argument("--whisper", help="path to the whisper.cpp main executable")
+    pipeline_parser.add_argument("--model", help="path to the ggml model")
+    pipeline_parser.add_argument("--stub-rtf", type=float,
+                                 help="use a stand-in whisper that takes this real-time factor")
+    pipeline_parser.add_argument("--language", default="en", help="whisper language code")
+    pipeline_parser.add_argument("--realtime", action="store_true", help="deliver audio at microphone pace")
+    pipeline_parser.add_argument("--output", help="write results as JSON to this file")
+    pipeline_parser.set_defaults(func=bench_pipeline)
+
+    diff_parser = subparsers.add_parser("diff", help="compare two pipeline result files")
+    diff_parser.add_argument("baseline")
+    diff_parser.add_argument("candidate")
+    diff_parser.set_defaults(func=bench_diff)
+
+    keys_parser = subparsers.add_parser("keys", help="key event dispatch cost on the hook thread")
+    keys_parser.add_argument("--events", type=int, default=100000, help="number of synthetic key presses")
+    keys_parser.add_argument("--listeners", type=int, default=4, help="number of trigger listeners")
+    keys_parser.add_argument("--trigger-rate", type=float, default=0.01,
+                             help="fraction of key presses that hit a trigger key")
+    keys_parser.add_argument("--action-cost-ms", type=float, default=2.0,
+                             help="simulated cost of starting or stopping a recording")
+    keys_parser.set_defaults(func=bench_keys)
+
+    capture_parser = subparsers.add_parser("capture", help="peak memory of long recordings")
+    capture_parser.add_argument("--minutes", type=float, default=60.0, help="length of the synthetic recording")
+    capture_parser.add_argument("--spill-after-s", type=float, default=600.0,
+                                help="recording length after which the audio is moved to disk")
+    capture_parser.set_defaults(func=bench_capture)
+
+    longform_parser = subparsers.add_parser("longform", help="parallel transcription of a long recording")
+    longform_parser.add_argument("recording", help="16 kHz mono 16-bit WAV file")
+    longform_parser.add_argument("--whisper", help="path to the whisper.cpp main executable")
+    longform_parser.add_argument("--model", help="path to the ggml model")
+    longform_parser.add_argument("--stub-rtf", type=float,
+                                 help="use a stand-in whisper that takes this real-time factor")
+    longform_parser.add_argument("--language", default="en", help="whisper language code")
+    longform_parser.add_argument("--segment-s", type=float, default=30.0, help="target segment length")
+    longform_parser.add_argument("--overlap-s", type=float, default=1.0, help="audio shared by neighbouring segments")
+    longform_parser.add_argument("--processes", type=int, help="concurrent whisper processes")
+    longform_parser.set_defaults(func=bench_longform)
+
+    resample_parser = subparsers.add_parser("resample", help="resampler throughput and accuracy")
+    resample_parser.add_argument("--seconds", type=float, default=60.0, help="length of the throughput clip")
+    resample_parser.set_defaults(func=bench_resample)
+
+    postprocess_parser = subparsers.add_parser("postprocess", help="phrase replacement cost by dictionary size")
+    postprocess_parser.add_argument("--words", type=int, default=200, help="length of the transcript")
+    postprocess_parser.add_argument("--sizes", default="0,10,100,1000,10000,100000",
+                                    help="comma-separated dictionary sizes")
+    postprocess_parser.add_argument("--naive-max", type=int, default=10000,
+                                    help="largest dictionary to run the one-regex-per-entry baseline on")
+    postprocess_parser.set_defaults(func=bench_postprocess)
+
+    backends_parser = subparsers.add_parser("backends", help="subprocess and in-process whisper parity and latency")
+    backends_parser.add_argument("corpus", help="directory of 16 kHz mono 16-bit WAV files")
+    backends_parser.add_argument("--whisper", required=True, help="path to the whisper.cpp main executable")
+    backends_parser.add_argument("--library", required=True, help="path to the libwhisper shared library")
+    backends_parser.add_argument("--model", required=True, help="path to the ggml model")
+    backends_parser.add_argument("--language", default="en", help="whisper language code")
+    backends_parser.add_argument("--repeat", type=int, default=3, help="transcriptions of every file per backend")
+    backends_parser.add_argument("--beam-size", type=int, default=DEFAULT_BEAM_SIZE,
+                                 help="beams of beam search on both backends, 1 to decode greedily")
+    backends_parser.add_argument("--best-of", type=int, default=DEFAULT_BEST_OF,
+                                 help="candidates sampled at a fallback temperature on both backends")
+    backends_parser.add_argument("--min-match", type=float, default=0.95,
+                                 help="lowest accepted word match ratio between the backends")
+    backends_parser.set_defaults(func=bench_backends)
+
+    server_parser = subparsers.add_parser("server", help="resident server start, restart and retry")
+    server_parser.add_argument("--stub-rtf", type=float, default=0.05,
+                               help="real-time factor of the stand-in server")
+    server_parser.add_argument("--requests", type=int, default=20, help="warm requests to time")
+    server_parser.add_argument("--clip-s", type=float, default=2.0, help="length of the transcribed clip")
+    server_parser.set_defaults(func=bench_server)
+
+    stress_parser = subparsers.add_parser("stress", help="hook latency and typing rate under inference load")
+    stress_parser.add_argument("--seconds", type=float, default=5.0, help="length of the hook latency measurement")
+    stress_parser.add_argument("--event-interval-ms", type=float, default=2.0, help="time between hook events")
+    stress_parser.add_argument("--load-threads", type=int, help="busy inference threads, defaults to the core count")
+    stress_parser.add_argument("--chars", type=int, default=2000, help="length of the typed transcript")
+    stress_parser.add_argument("--event-cost-us", type=float, default=20.0,
+                               help="simulated cost of posting one keyboard event")
+    stress_parser.add_argument("--nice", type=int, default=10, help="nice value of the governed load")
+    stress_parser.add_argument("--io-priority", choices=["idle", "best_effort"], default="idle",
+                               help="I/O priority of the governed load")
+    stress_parser.add_argument("--reserved-cores", type=int, default=1, help="cores kept free of the governed load")
+    stress_parser.set_defaults(func=bench_stress)
+
+    replay_parser = subparsers.add_parser("replay", help="replay a key event trace through the trigger listeners")
+    replay_parser.add_argument("trace", nargs="?", help="JSON lines trace, synthetic if omitted")
+    replay_parser.add_argument("--config", help="take the triggers from this config.json")
+    replay_parser.add_argument("--seconds", type=float, default=3600.0, help="length of the synthetic trace")
+    replay_parser.add_argument("--typing-cps", type=float, default=8.0, help="typed characters per second")
+    replay_parser.add_argument("--gesture-interval-s", type=float, default=5.0, help="mean time between gestures")
+    replay_parser.add_argument("--stray-rate", type=float, default=0.02,
+                               help="probability of a stray double tap key tap per typed character")
+    replay_parser.add_argument("--save", help="write the replayed trace to this file")
+    replay_parser.add_argument("--show", type=int, default=5, help="false triggers and misses to list")
+    replay_parser.set_defaults(func=bench_replay)
+
+    record_parser = subparsers.add_parser("record-keys", help="record the keyboard into a key event trace")
+    record_parser.add_argument("output", help="JSON lines trace to write")
+    record_parser.add_argument("--seconds", type=float, default=60.0, help="how long to record")
+    record_parser.set_defaults(func=bench_record_keys)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
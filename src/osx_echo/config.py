@@ -5,15 +5,24 @@ Configuration classes for osx_echo.
 import json
 import os
 class LanguageConfig:
-    def __init__(self, language: str, language_name:str, whisper_model_path: str, trigger: dict):
+    def __init__(self, language: str, language_name:str, whisper_model_path: str, trigger: dict,
+                 streaming: dict | None = None, model_variants: list[str] | None = None,
+                 refine_model_path: str | None = None):
         self.language = language
         self.language_name = language_name
         self.whisper_model_path = whisper_model_path
         self.trigger = trigger
+        # segmentation settings for streaming transcription, None to transcribe after release
+        self.streaming = streaming
+        # alternative models ordered by preference, chosen from by the tuner
+        self.model_variants = model_variants
+        # larger model that re-transcribes typed drafts, None to type the first result only
+        self.refine_model_path = refine_model_path
 
     @staticmethod
     def from_config(config: dict) -> "LanguageConfig":
-        return LanguageConfig(config["language"], config["language_name"], config["whisper_model_path"], config["trigger"])
+        return LanguageConfig(config["language"], config["language_name"], config["whisper_model_path"], config["trigger"],
+                              config.get("streaming"), config.get("model_variants"), config.get("refine_model_path"))
 
 
 
@@ -26,13 +35,40 @@ class Config:
     device settings.
     """
 
-    def __init__(self, whisper_main_path: str, language_support: list[LanguageConfig], input_device_name: str):
+    def __init__(self, whisper_main_path: str, language_support: list[LanguageConfig], input_device_name: str,
+                 whisper_server_path: str | None = None, output: dict | None = None, capture: dict | None = None,
+                 vad: dict | None = None, jobs: dict | None = None, metrics: dict | None = None,
+                 tuning: dict | None = None, longform: dict | None = None, postprocess: dict | None = None,
+                 confidence: dict | None = None, whisper_library_path: str | None = None,
+                 model_pool: dict | None = None, warmup: dict | None = None, governor: dict | None = None,
+                 decoding: dict | None = None):
         """
         Initialize the Config object by loading values from environment variables.
         """
         self.whisper_main_path = whisper_main_path
         self.language_support = language_support
         self.input_device_name = input_device_name
+        self.whisper_server_path = whisper_server_path
+        self.output = output if output is not None else {}
+        self.capture = capture if capture is not None else {}
+        # voice activity gate settings, None to transcribe recordings whole
+        self.vad = vad
+        self.jobs = jobs if jobs is not None else {}
+        self.metrics = metrics if metrics is not None else {}
+        # latency budget tuning settings, None to always use the configured model with default threads
+        self.tuning = tuning
+        # parallel transcription settings for long recordings, None to transcribe them in one process
+        self.longform = longform
+        self.postprocess = postprocess if postprocess is not None else {}
+        self.confidence = confidence if confidence is not None else {}
+        # libwhisper for in-process inference, None to run whisper.cpp executables
+        self.whisper_library_path = whisper_library_path
+        # memory budget of the resident models, None to keep every model loaded once used
+        self.model_pool = model_pool
+        self.warmup = warmup if warmup is not None else {}
+        # inference priority, affinity and thread budget, None to run whisper at normal priority
+        self.governor = governor
+        self.decoding = decoding if decoding is not None else {}
     
     @staticmethod
     def from_config_file(path_to_config: str) -> "Config":
@@ -42,9 +78,32 @@ class Config:
             if not os.path.exists(config["whisper_main_path"]):
                 raise FileNotFoundError(f"Whisper main path {config['whisper_main_path']} does not exist.")
 
+            whisper_server_path = config.get("whisper_server_path")
+            if whisper_server_path is not None and not os.path.exists(whisper_server_path):
+                raise FileNotFoundError(f"Whisper server path {whisper_server_path} does not exist.")
+
+            whisper_library_path = config.get("whisper_library_path")
+            if whisper_library_path is not None and not os.path.exists(whisper_library_path):
+                raise FileNotFoundError(f"Whisper library path {whisper_library_path} does not exist.")
+
             return Config(config["whisper_main_path"],
                          [LanguageConfig.from_config(lcfg) for lcfg in config["language_support"]],
-                         config["input_device_name"])
+                         config["input_device_name"],
+                         whisper_server_path,
+                         config.get("output"),
+                         config.get("capture"),
+                         config.get("vad"),
+                         config.get("jobs"),
+                         config.get("metrics"),
+                         config.get("tuning"),
+                         config.get("longform"),
+                         config.get("postprocess"),
+                         config.get("confidence"),
+                         whisper_library_path,
+                         config.get("model_pool"),
+                         config.get("warmup"),
+                         config.get("governor"),
+                         config.get("decoding"))
 
     def get_language_support(self) -> list[LanguageConfig]:
         """
@@ -64,6 +123,24 @@ class Config:
         """
         return self.whisper_main_path
 
+    def get_whisper_server_path(self):
+        """
+        Retrieve path to the `server` executable from whisper.cpp.
+
+        Returns:
+            str | None: Path to the `server` executable, None to always use `main`.
+        """
+        return self.whisper_server_path
+
+    def get_whisper_library_path(self):
+        """
+        Retrieve path to the whisper.cpp shared library.
+
+        Returns:
+            str | None: Path to libwhisper for in-process inference, None to run the executables.
+        """
+        return self.whisper_library_path
+
     def get_input_device_name(self):
         """
         Retrieve the input device name.
@@ -72,3 +149,120 @@ class Config:
             str: The input device name loaded from the environment.
         """
         return self.input_device_name
+
+    def get_output_config(self) -> dict:
+        """
+        Retrieve the output engine configuration.
+
+        Returns:
+            dict: The output engine configuration, empty for the defaults.
+        """
+        return self.output
+
+    def get_capture_config(self) -> dict:
+        """
+        Retrieve the audio capture configuration.
+
+        Returns:
+            dict: The audio capture configuration, empty for the defaults.
+        """
+        return self.capture
+
+    def get_vad_config(self) -> dict | None:
+        """
+        Retrieve the voice activity gate configuration.
+
+        Returns:
+            dict | None: The voice activity gate configuration, None if disabled.
+        """
+        return self.vad
+
+    def get_jobs_config(self) -> dict:
+        """
+        Retrieve the transcription job scheduler configuration.
+
+        Returns:
+            dict: The job scheduler configuration, empty for the defaults.
+        """
+        return self.jobs
+
+    def get_metrics_config(self) -> dict:
+        """
+        Retrieve the latency metrics configuration.
+
+        Returns:
+            dict: The latency metrics configuration, empty for the defaults.
+        """
+        return self.metrics
+
+    def get_tuning_config(self) -> dict | None:
+        """
+        Retrieve the latency budget tuning configuration.
+
+        Returns:
+            dict | None: The tuning configuration, None if disabled.
+        """
+        return self.tuning
+
+    def get_longform_config(self) -> dict | None:
+        """
+        Retrieve the long-form transcription configuration.
+
+        Returns:
+            dict | None: The long-form configuration, None if disabled.
+        """
+        return self.longform
+
+    def get_postprocess_config(self) -> dict:
+        """
+        Retrieve the transcript post-processing configuration.
+
+        Returns:
+            dict: The post-processing configuration, empty for the defaults.
+        """
+        return self.postprocess
+
+    def get_confidence_config(self) -> dict:
+        """
+        Retrieve the segment confidence filter configuration.
+
+        Returns:
+            dict: The segment filter configuration, empty for the defaults.
+        """
+        return self.confidence
+
+    def get_model_pool_config(self) -> dict | None:
+        """
+        Retrieve the model pool configuration.
+
+        Returns:
+            dict | None: The model pool configuration, None if disabled.
+        """
+        return self.model_pool
+
+    def get_warmup_config(self) -> dict:
+        """
+        Retrieve the warm-up configuration.
+
+        Returns:
+            dict: The warm-up configuration, empty for the defaults.
+        """
+        return self.warmup
+
+    def get_governor_config(self) -> dict | None:
+        """
+        Retrieve the inference governor configuration.
+
+        Returns:
+            dict | None: The governor configuration, None if disabled.
+        """
+        return self.governor
+
+    def get_decoding_config(self) -> dict:
+        """
+        Retrieve the decoding configuration shared by all whisper backends.
+
+        Returns:
+            dict: The decoding configuration, empty for the defaults of whisper.cpp `main`.
+        """
+        return self.decoding
@@ -0,0 +1,97 @@
+"""
+This module reloads config.json while the app is running.
+
+The ConfigWatcher checks the modification time of the config file, re-parses and
+validates it through `Config.from_config_file` and hands the new config together
+with the names of the changed settings to a callback, which rebuilds only the
+affected components. If the new file cannot be loaded, the old config stays in
+effect and the error is printed.
+
+Classes:
+    ConfigWatcher: Detects and loads changes to the config file.
+"""
+
+import os
+
+from .config import Config
+
+
+class ConfigWatcher:
+    """
+    ConfigWatcher polls the config file and reports validated changes.
+
+    Attributes:
+        config (Config): The config currently in effect.
+    """
+
+    def __init__(self, path: str, config: Config, on_reload):
+        """
+        Initialize the ConfigWatcher.
+
+        Args:
+            path (str): Path to config.json.
+            config (Config): The config loaded at startup.
+            on_reload: Callable taking the new Config and the list of changed setting names.
+        """
+        self.path = path
+        self.config = config
+        self.on_reload = on_reload
+        self._mtime_ns = self._current_mtime_ns()
+
+    def check(self) -> bool:
+        """
+        Reload the config file if it has been modified since the last check.
+
+        Returns:
+            bool: True if a new config was applied.
+        """
+        mtime_ns = self._current_mtime_ns()
+        if mtime_ns is None or mtime_ns == self._mtime_ns:
+            return False
+        self._mtime_ns = mtime_ns
+
+        try:
+            config = Config.from_config_file(self.path)
+        except Exception as e:
+            print(f"Not reloading {self.path}, keeping the current config: {e}")
+            return False
+
+        changed = changed_settings(self.config, config)
+        if not changed:
+            return False
+        try:
+            self.on_reload(config, changed)
+        except Exception as e:
+            print(f"Reloading {self.path} failed, keeping the current config: {e}")
+            return False
+        self.config = config
+        print(f"Reloaded {self.path}: {', '.join(changed)} changed")
+        return True
+
+    def _current_mtime_ns(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+
+def changed_settings(old: Config, new: Config) -> list[str]:
+    """
+    Compare two configs.
+
+    Args:
+        old (Config): The config in effect.
+        new (Config): The reloaded config.
+
+    Returns:
+        list[str]: Names of the Config attributes that differ, e.g. `language_support` or `input_device_name`.
+    """
+    changed = []
+    for name, value in vars(new).items():
+        old_value = getattr(old, name, None)
+        if name == "language_support":
+            old_value = [vars(lc) for lc in old_value]
+            value = [vars(lc) for lc in value]
+        if value != old_value:
+            changed.append(name)
+    return changed
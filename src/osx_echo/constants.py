@@ -3,4 +3,13 @@ Constants for the OSX Echo application.
 """
 
 DBL_CLICK_TIMEOUT_MS = 250
-RECORDING_FILE_NAME = "recording.wav"
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+FRAMES_PER_BUFFER = 1024
+DEFAULT_WHISPER_THREADS = 4
+# the decoding defaults of whisper.cpp `main`, used by every backend
+DEFAULT_BEAM_SIZE = 5
+DEFAULT_BEST_OF = 5
+WHISPER_SERVER_HOST = "127.0.0.1"
+WHISPER_SERVER_STARTUP_TIMEOUT_S = 30.0
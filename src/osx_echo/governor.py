@@ -0,0 +1,139 @@
+"""
+This module keeps whisper from starving the interactive parts of the app.
+
+Inference saturates every core it is given. While it runs, the pynput hook
+thread, the rumps UI and the output engine that types the previous transcript
+have to compete for CPU at the same priority, which shows as typing stutter and,
+when the event tap callback is late, as dropped hotkeys. The Governor
+deprioritizes inference:
+
+- whisper.cpp processes are started through `nice`, and through `taskpolicy -d
+  throttle` on macOS or `ionice` on Linux to lower their I/O priority,
+- on Linux they are pinned to all cores but the first `reserved_cores` with
+  `taskset`, leaving those to the interactive threads; macOS has no affinity
+  API, so there the lower priority has to suffice,
+- threads that run in-process inference lower their own priority, with a
+  utility QoS class on macOS and a per-thread nice value on Linux,
+- all inference of all jobs shares `max_threads` threads: a job waits until
+  enough of them are free and never runs with more than the cap.
+
+Classes:
+    Governor: Priority, affinity and thread budget of whisper inference.
+"""
+
+import contextlib
+import ctypes
+import ctypes.util
+import os
+import shutil
+import sys
+import threading
+
+# pthread QoS class of work the user is not waiting on right now, see <sys/qos.h>
+_QOS_CLASS_UTILITY = 0x11
+_IO_CLASSES = {"idle": "3", "best_effort": "2"}
+
+
+class Governor:
+    """
+    Governor runs whisper inference at a lower priority, on fewer cores and within a shared thread budget.
+
+    Attributes:
+        inference_cores (list[int]): Cores inference may run on, all but the reserved ones.
+        max_threads (int): Inference threads all jobs may use together.
+        threads_in_use (int): Inference threads currently granted.
+    """
+
+    def __init__(self, nice: int | None = 10, io_priority: str | None = "idle", reserved_cores: int = 1,
+                 max_threads: int | None = None):
+        """
+        Initialize the Governor.
+
+        Args:
+            nice (int): Nice value of inference, None to keep the normal priority.
+            io_priority (str): `idle` or `best_effort` I/O priority of whisper processes, None to keep the normal one.
+            reserved_cores (int): Cores kept free of inference for the interactive threads.
+            max_threads (int): Inference threads all jobs may use together, defaults to the cores not reserved.
+        """
+        if hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(os.cpu_count() or 1))
+        self.nice = nice
+        self.io_priority = io_priority
+        self.reserved_cores = max(0, min(reserved_cores, len(cores) - 1))
+        self.inference_cores = cores[self.reserved_cores:]
+        self.max_threads = max_threads if max_threads is not None else len(self.inference_cores)
+        self.threads_in_use = 0
+        self._condition = threading.Condition()
+        self._configured_threads = threading.local()
+        self._prefix = self._command_prefix()
+
+    @staticmethod
+    def from_config(config: dict) -> "Governor":
+        return Governor(config.get("nice", 10), config.get("io_priority", "idle"), config.get("reserved_cores", 1),
+                        config.get("max_threads"))
+
+    def command(self, args: list[str]) -> list[str]:
+        """
+        Wrap a whisper.cpp command line so that it runs with the governed priority and affinity.
+        """
+        return self._prefix + args
+
+    @contextlib.contextmanager
+    def inference_threads(self, requested: int):
+        """
+        Reserve inference threads from the shared budget, waiting until enough are free.
+
+        Args:
+            requested (int): Threads the inference would like to use.
+
+        Yields:
+            int: Threads the inference may use, at most `max_threads`.
+        """
+        granted = max(1, min(requested, self.max_threads))
+        with self._condition:
+            self._condition.wait_for(lambda: self.threads_in_use + granted <= self.max_threads)
+            self.threads_in_use += granted
+        try:
+            yield granted
+        finally:
+            with self._condition:
+                self.threads_in_use -= granted
+                self._condition.notify_all()
+
+    def configure_thread(self):
+        """
+        Lower the priority of the calling thread before it runs in-process inference.
+
+        Only done once per thread. The priority cannot be raised again without
+        privileges, so call this only on threads that do nothing but transcribe.
+        """
+        if getattr(self._configured_threads, "done", False):
+            return
+        self._configured_threads.done = True
+        try:
+            if sys.platform == "darwin":
+                libc = ctypes.CDLL(ctypes.util.find_library("c"))
+                libc.pthread_set_qos_class_self_np(_QOS_CLASS_UTILITY, 0)
+            elif sys.platform.startswith("linux"):
+                # on Linux, nice values and affinity belong to threads, and 0 means the calling thread
+                if self.nice is not None:
+                    os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+                if self.reserved_cores:
+                    os.sched_setaffinity(0, self.inference_cores)
+        except (OSError, AttributeError) as e:
+            print(f"Could not lower the priority of the inference thread: {e}")
+
+    def _command_prefix(self):
+        prefix = []
+        if self.nice is not None and shutil.which("nice"):
+            prefix += ["nice", "-n", str(self.nice)]
+        if self.io_priority is not None:
+            if sys.platform == "darwin" and shutil.which("taskpolicy"):
+                prefix += ["taskpolicy", "-d", "throttle" if self.io_priority == "idle" else "utility"]
+            elif shutil.which("ionice"):
+                prefix += ["ionice", "-c", _IO_CLASSES[self.io_priority]]
+        if self.reserved_cores and sys.platform.startswith("linux") and shutil.which("taskset"):
+            prefix += ["taskset", "-c", ",".join(str(core) for core in self.inference_cores)]
+        return prefix
@@ -0,0 +1,230 @@
+"""
+This module schedules transcription jobs between the Recorder and the Transcriber.
+
+Recordings are submitted as jobs into a bounded queue and transcribed by a pool of
+worker threads, so back-to-back dictations can be transcribed in parallel. The
+results are typed strictly in submission order, one job at a time, so output of
+overlapping dictations never interleaves. Jobs that have not been typed yet can be
+cancelled, and a new job can supersede everything that is still pending.
+
+Classes:
+    TranscriptionJob: A single recording (or streamed segment) waiting for transcription.
+    JobScheduler: Bounded job queue with a worker pool and ordered delivery.
+"""
+
+import collections
+import threading
+import time
+
+from .config import LanguageConfig
+
+
+class TranscriptionJob:
+    """
+    TranscriptionJob holds the audio of one recording or streamed segment.
+
+    Attributes:
+        seq (int): Position of the job in submission order.
+        group (int): Jobs with the same group belong to one dictation and are typed with a space in between.
+        cancelled (bool): True if the job should not be typed.
+        wait_s (float): Seconds the job waited in the queue before a worker picked it up.
+        trace (Trace): Latency trace finished once the job has been typed, may be None.
+    """
+
+    def __init__(self, seq: int, audio_data: bytes, language_config: LanguageConfig, group: int, trace=None):
+        self.seq = seq
+        self.audio_data = audio_data
+        self.language_config = language_config
+        self.group = group
+        self.trace = trace
+        self.cancelled = False
+        self.submitted_time = time.perf_counter()
+        self.wait_s = None
+        self.done = threading.Event()
+
+
+class JobScheduler:
+    """
+    JobScheduler runs transcription jobs on worker threads and types results in order.
+
+    Attributes:
+        transcriber: The Transcriber used to produce and type the text.
+        max_queue_depth (int): Largest number of queued jobs seen so far.
+        wait_times_s (collections.deque): Queue wait times of the most recent jobs.
+    """
+
+    def __init__(self, transcriber, workers: int = 2, max_queue: int = 8, refiner=None):
+        """
+        Initialize the scheduler and start the worker threads.
+
+        Args:
+            transcriber: An object responsible for transcribing audio.
+            workers (int): Number of jobs transcribed concurrently.
+            max_queue (int): Number of queued jobs after which `submit` blocks.
+            refiner (Refiner): Refines drafts of languages with a refine model, may be None.
+        """
+        self.transcriber = transcriber
+        self.refiner = refiner
+        self.max_queue = max_queue
+        self.max_queue_depth = 0
+        self.wait_times_s = collections.deque(maxlen=100)
+
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._next_seq = 0
+        self._next_group = 0
+        self._running = True
+
+        self._undelivered = {}
+        self._results = {}
+        self._next_delivery = 0
+        self._last_typed_group = None
+        self._delivery_lock = threading.Lock()
+
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    @staticmethod
+    def from_config(transcriber, config: dict, refiner=None) -> "JobScheduler":
+        return JobScheduler(transcriber, config.get("workers", 2), config.get("max_queue", 8), refiner)
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of jobs waiting for a worker.
+        """
+        with self._condition:
+            return len(self._queue)
+
+    @property
+    def idle(self) -> bool:
+        """
+        True if no job is waiting, running or waiting to be typed.
+        """
+        with self._condition:
+            return not self._undelivered
+
+    def new_group(self) -> int:
+        """
+        Allocate a group id for the jobs of one dictation.
+
+        Returns:
+            int: The new group id.
+        """
+        with self._condition:
+            self._next_group += 1
+            return self._next_group
+
+    def submit(self, audio_data: bytes, language_config: LanguageConfig, group: int | None = None,
+               supersede: bool = False, trace=None) -> TranscriptionJob:
+        """
+        Queue audio for transcription, blocking while the queue is full.
+
+        Args:
+            audio_data (bytes): 16 kHz mono 16-bit PCM samples.
+            language_config (LanguageConfig): language configuration to use for transcription.
+            group (int): Group id from `new_group` for streamed segments, None for a standalone recording.
+            supersede (bool): Cancel all jobs that have not been typed yet before queueing this one.
+            trace (Trace): Latency trace of the dictation, may be None.
+
+        Returns:
+            TranscriptionJob: The queued job.
+        """
+        if supersede:
+            self.cancel_pending()
+        if group is None:
+            group = self.new_group()
+
+        with self._condition:
+            while len(self._queue) >= self.max_queue:
+                self._condition.wait()
+            job = TranscriptionJob(self._next_seq, audio_data, language_config, group, trace)
+            self._next_seq += 1
+            self._queue.append(job)
+            self._undelivered[job.seq] = job
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            self._condition.notify_all()
+        return job
+
+    def cancel(self, job: TranscriptionJob):
+        """
+        Cancel a job so that its text is not typed.
+
+        A queued job is never transcribed, a running job is transcribed but discarded.
+        """
+        job.cancelled = True
+
+    def cancel_pending(self):
+        """
+        Cancel every job that has not been typed yet.
+        """
+        with self._condition:
+            for job in self._undelivered.values():
+                job.cancelled = True
+
+    def wait(self, job: TranscriptionJob, timeout: float | None = None) -> bool:
+        """
+        Wait until a job has been typed or skipped.
+
+        Returns:
+            bool: True if the job finished within the timeout.
+        """
+        return job.done.wait(timeout)
+
+    def shutdown(self):
+        """
+        Stop the workers after the jobs they are running have finished.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                job = self._queue.popleft()
+                depth = len(self._queue)
+                self._condition.notify_all()
+
+            job.wait_s = time.perf_counter() - job.submitted_time
+            self.wait_times_s.append(job.wait_s)
+            print(f"Job {job.seq} waited {job.wait_s * 1000:.0f} ms in queue, {depth} still queued")
+
+            text = ""
+            if not job.cancelled:
+                try:
+                    text = self.transcriber.transcribe_clean(job.audio_data, job.language_config, job.trace)
+                except Exception as e:
+                    print(f"Transcription job {job.seq} failed: {e}")
+            self._deliver(job, text)
+
+    def _deliver(self, job, text):
+        with self._delivery_lock:
+            self._results[job.seq] = (job, text)
+            while self._next_delivery in self._results:
+                job, text = self._results.pop(self._next_delivery)
+                with self._condition:
+                    del self._undelivered[job.seq]
+                self._next_delivery += 1
+                try:
+                    if not job.cancelled:
+                        separator = " " if job.group == self._last_typed_group else ""
+                        if self.transcriber.type_text(text, separator, job.trace):
+                            self._last_typed_group = job.group
+                            if self.refiner is not None and job.language_config.refine_model_path is not None:
+                                self.refiner.submit(job.audio_data, job.language_config, text,
+                                                    self.transcriber.output_seq)
+                        if job.trace is not None:
+                            job.trace.finish()
+                except Exception as e:
+                    # a failed delivery must not stop the worker or the delivery of later jobs
+                    print(f"Delivering transcription job {job.seq} failed: {e}")
+                finally:
+                    job.done.set()
@@ -0,0 +1,293 @@
+"""
+This module replays key event traces through the trigger listeners.
+
+The listeners decide on triggers from the timing of live pynput events, which
+makes their behavior hard to measure or to check after a change. A trace is a
+JSON lines file with one key event per line, plus the triggers the events are
+expected to produce:
+
+    {"t": 12.031, "type": "press", "key": "cmd_r"}
+    {"t": 12.102, "type": "release", "char": "a"}
+    {"t": 12.031, "type": "expect", "action": "toggle_recording", "language": "en"}
+
+`t` is in seconds, `key` names a pynput `Key` and `char` a character key. An
+`expect` line gives the time the gesture started, the app action it should cause
+and the language of its trigger. Traces are recorded from the keyboard with
+`record_trace` or generated with `synthetic_trace`.
+
+`replay` feeds a trace through a `_ListenerMultiplexer` as fast as it can, with a
+clock that returns the time of the current event, so timing windows such as
+`DBL_CLICK_TIMEOUT_MS` behave as if the events arrived live. It reports the cost
+of every dispatch, the time from the start of a gesture to the action it
+triggered, and the actions that were triggered without being expected or
+expected without being triggered.
+
+Classes:
+    KeyEvent: One entry of a trace.
+    ReplayClock: Clock that is set to the time of the event being replayed.
+"""
+
+import json
+import random
+import threading
+import time
+
+from pynput import keyboard
+
+from .constants import DBL_CLICK_TIMEOUT_MS
+from .listeners import build_key_listener, build_listener_multiplexer
+from .metrics import RollingHistogram
+
+
+class KeyEvent:
+    """
+    KeyEvent is a key press or release, or an expected action.
+
+    Attributes:
+        t (float): Time in seconds.
+        type (str): `press`, `release` or `expect`.
+        key: The pynput key of a press or release.
+        action (str): The expected app action, e.g. `toggle_recording`.
+        language (str): Language of the trigger of an expected action.
+    """
+
+    def __init__(self, t: float, type: str, key=None, action: str | None = None, language: str | None = None):
+        self.t = t
+        self.type = type
+        self.key = key
+        self.action = action
+        self.language = language
+
+    def to_dict(self) -> dict:
+        if self.type == "expect":
+            return {"t": self.t, "type": self.type, "action": self.action, "language": self.language}
+        if isinstance(self.key, keyboard.Key):
+            return {"t": self.t, "type": self.type, "key": self.key.name}
+        return {"t": self.t, "type": self.type, "char": self.key.char}
+
+    @staticmethod
+    def from_dict(record: dict) -> "KeyEvent":
+        if record["type"] == "expect":
+            return KeyEvent(record["t"], "expect", action=record["action"], language=record.get("language"))
+        key = keyboard.Key[record["key"]] if "key" in record else keyboard.KeyCode.from_char(record["char"])
+        return KeyEvent(record["t"], record["type"], key)
+
+
+class ReplayClock:
+    """
+    ReplayClock stands in for `time.time` in the listeners and returns the time of the replayed event.
+    """
+
+    def __init__(self, t: float = 0.0):
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+
+class _RecordingApp:
+    """
+    Stands in for the app and records the actions the listeners trigger.
+
+    Like the app, starting while recording and stopping while not recording do
+    nothing, so those calls are only counted as ignored.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.recording = False
+        self.actions = []
+        self.ignored = 0
+
+    def toggle_recording(self, language_config):
+        self.recording = not self.recording
+        self.actions.append(("toggle_recording", language_config.language, self.clock()))
+
+    def start_recording(self, language_config):
+        if self.recording:
+            self.ignored += 1
+            return
+        self.recording = True
+        self.actions.append(("start_recording", language_config.language, self.clock()))
+
+    def stop_recording(self, sender):
+        if not self.recording:
+            self.ignored += 1
+            return
+        self.recording = False
+        # the key hold listener does not say which language it stops
+        self.actions.append(("stop_recording", None, self.clock()))
+
+
+def load_trace(path: str) -> list[KeyEvent]:
+    """
+    Read a trace from a JSON lines file.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [KeyEvent.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def save_trace(events: list[KeyEvent], path: str):
+    """
+    Write a trace to a JSON lines file.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event.to_dict()) + "\n")
+
+
+def record_trace(path: str, seconds: float):
+    """
+    Record the live keyboard into a trace, without expected actions.
+
+    Args:
+        path (str): The JSON lines file to write.
+        seconds (float): How long to record.
+    """
+    events = []
+    lock = threading.Lock()
+    t_start = time.perf_counter()
+
+    def on_event(event_type):
+        def callback(key):
+            with lock:
+                events.append(KeyEvent(time.perf_counter() - t_start, event_type, key))
+        return callback
+
+    with keyboard.Listener(on_press=on_event("press"), on_release=on_event("release")):
+        time.sleep(seconds)
+    with lock:
+        save_trace(events, path)
+    print(f"Recorded {len(events)} key events to {path}")
+
+
+def synthetic_trace(language_configs: list, seconds: float = 60.0, typing_cps: float = 8.0,
+                    gesture_interval_s: float = 5.0, stray_rate: float = 0.02, seed: int = 0) -> list[KeyEvent]:
+    """
+    Generate a trace of typing interleaved with trigger gestures.
+
+    Typing presses random letters at about `typing_cps` characters per second.
+    Every `gesture_interval_s` seconds on average the typing pauses for the
+    trigger of a random language: a double tap, a held chord or a single press,
+    with an `expect` event for each action it should cause. A recording started
+    by a toggle is stopped by the next gesture, with the same trigger. With probability
+    `stray_rate` per typed character, a double tap key is tapped once on its own, like
+    a modifier of a shortcut, which should not trigger anything. Keys of key press and
+    key hold triggers are never tapped stray, since a single press of them is a gesture.
+
+    Args:
+        language_configs (list[LanguageConfig]): The languages whose triggers are used.
+        seconds (float): Length of the trace.
+        typing_cps (float): Characters typed per second.
+        gesture_interval_s (float): Mean time between gestures.
+        stray_rate (float): Probability of a stray double tap key tap per typed character.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        list[KeyEvent]: The events ordered by time.
+    """
+    rng = random.Random(seed)
+    letters = [keyboard.KeyCode.from_char(c) for c in "abcdefghijklmnopqrstuvwxyz "]
+    gesture_keys = {key for lc in language_configs if lc.trigger["type"] != "double_tap"
+                    for key in build_key_listener(None, lc).keys}
+    stray_keys = [key for lc in language_configs if lc.trigger["type"] == "double_tap"
+                  for key in build_key_listener(None, lc).keys if key not in gesture_keys]
+    events = []
+
+    def tap(key, t, hold_s):
+        events.append(KeyEvent(t, "press", key))
+        events.append(KeyEvent(t + hold_s, "release", key))
+
+    t = 0.0
+    next_gesture = rng.expovariate(1 / gesture_interval_s)
+    # language whose toggle started the current recording, its next gesture has to stop it
+    toggled = None
+    while t < seconds:
+        if t >= next_gesture:
+            language_config = toggled if toggled is not None else rng.choice(language_configs)
+            if language_config.trigger["type"] != "key_hold":
+                toggled = None if toggled is not None else language_config
+            t = _gesture(language_config, t + 0.5, rng, tap, events) + 0.5
+            next_gesture = t + rng.expovariate(1 / gesture_interval_s)
+            continue
+        if stray_keys and rng.random() < stray_rate:
+            tap(rng.choice(stray_keys), t, rng.uniform(0.05, 0.15))
+            # a stray tap is followed by the key it modifies, never by a second tap of itself
+            t += rng.uniform(0.3, 0.6)
+        tap(rng.choice(letters), t, rng.uniform(0.04, 0.1))
+        t += rng.expovariate(typing_cps)
+    events.sort(key=lambda event: event.t)
+    return events
+
+
+def _gesture(language_config, t, rng, tap, events):
+    # returns the time the gesture is over
+    listener = build_key_listener(None, language_config)
+    language = language_config.language
+    trigger_type = language_config.trigger["type"]
+    if trigger_type == "double_tap":
+        events.append(KeyEvent(t, "expect", action="toggle_recording", language=language))
+        tap(listener.key, t, rng.uniform(0.03, 0.08))
+        t += rng.uniform(0.1, DBL_CLICK_TIMEOUT_MS / 1000 * 0.8)
+        tap(listener.key, t, rng.uniform(0.03, 0.08))
+        return t + 0.1
+    if trigger_type == "key_hold":
+        events.append(KeyEvent(t, "expect", action="start_recording", language=language))
+        for key in listener.keys:
+            events.append(KeyEvent(t, "press", key))
+            t += rng.uniform(0.01, 0.05)
+        t += rng.uniform(1.0, 3.0)
+        events.append(KeyEvent(t, "expect", action="stop_recording", language=language))
+        for key in listener.keys:
+            events.append(KeyEvent(t, "release", key))
+            t += rng.uniform(0.01, 0.05)
+        return t
+    events.append(KeyEvent(t, "expect", action="toggle_recording", language=language))
+    tap(listener.key, t, rng.uniform(0.03, 0.08))
+    return t + 0.1
+
+
+def replay(events: list[KeyEvent], language_configs: list, match_window_s: float = 1.0) -> dict:
+    """
+    Replay a trace through the listeners of the given languages.
+
+    Args:
+        events (list[KeyEvent]): The trace, ordered by time.
+        language_configs (list[LanguageConfig]): The languages whose triggers listen.
+        match_window_s (float): Longest time from the start of a gesture to its action.
+
+    Returns:
+        dict: `events`, `dispatch` (RollingHistogram of seconds per dispatch), `decide`
+        (RollingHistogram of trace seconds from gesture start to action), `actions`, `ignored`
+        (calls that did not change the recording state), `expected`, `false_triggers` and
+        `misses`, the last two lists of (action, language, t).
+    """
+    clock = ReplayClock()
+    app = _RecordingApp(clock)
+    multiplexer = build_listener_multiplexer([build_key_listener(app, lc, clock) for lc in language_configs])
+    callbacks = {"press": multiplexer.on_key_press, "release": multiplexer.on_key_release}
+
+    key_events = [event for event in events if event.type != "expect"]
+    dispatch = RollingHistogram(len(key_events))
+    for event in key_events:
+        clock.t = event.t
+        callback = callbacks[event.type]
+        t_start = time.perf_counter()
+        callback(event.key)
+        dispatch.add(time.perf_counter() - t_start)
+
+    expected = sorted((event for event in events if event.type == "expect"), key=lambda event: event.t)
+    remaining = list(app.actions)
+    decide = RollingHistogram(max(1, len(expected)))
+    misses = []
+    for expectation in expected:
+        match = next((action for action in remaining
+                      if action[0] == expectation.action and action[1] in (expectation.language, None)
+                      and expectation.t <= action[2] <= expectation.t + match_window_s), None)
+        if match is None:
+            misses.append((expectation.action, expectation.language, expectation.t))
+            continue
+        remaining.remove(match)
+        decide.add(match[2] - expectation.t)
+    return {"events": len(key_events), "dispatch": dispatch, "decide": decide, "actions": len(app.actions),
+            "ignored": app.ignored, "expected": len(expected), "false_triggers": remaining, "misses": misses}
@@ -0,0 +1,287 @@
+"""
+This module runs whisper inference in-process through the whisper.cpp shared library.
+
+Even with the model resident in a server, every dictation through `main` pays for
+fork/exec, argument parsing and WAV encoding. InProcessWhisper loads libwhisper
+with ctypes instead, keeps one whisper context per model and passes the recorded
+samples straight to `whisper_full`. The int16 samples are converted to float32 in
+a single pass into a buffer that is reused across calls, which is the only copy
+whisper needs. ctypes releases the GIL for the duration of every foreign call, so
+inference on a job worker thread does not block the key listeners or the UI.
+
+`whisper_full_params` and `whisper_context_params` are passed by value. Only the
+leading fields that are changed here are declared, following whisper.h of
+whisper.cpp 1.7; the rest of each struct is carried as opaque padding that is
+filled by the library's own `*_default_params` functions, so fields added at the
+end of the structs by later versions keep their defaults. Like `main`, inference
+uses beam search whenever the beam size is above 1, so both backends decode the
+same way.
+
+Classes:
+    LibWhisperError: Raised when the library cannot be loaded or inference fails.
+    InProcessWhisper: Resident whisper contexts keyed by model path.
+"""
+
+import ctypes
+import math
+import threading
+import time
+
+from .constants import DEFAULT_BEAM_SIZE, DEFAULT_BEST_OF, DEFAULT_WHISPER_THREADS
+from .whisper_output import Segment, TranscriptionResult
+
+_SAMPLING_GREEDY = 0
+_SAMPLING_BEAM_SEARCH = 1
+# larger than any version of the structs, the library only reads its own prefix
+_OPAQUE_WORDS = 160
+
+
+class LibWhisperError(RuntimeError):
+    """
+    Raised when libwhisper cannot be loaded, a model cannot be initialized or inference fails.
+    """
+
+
+class _ContextParams(ctypes.Structure):
+    _fields_ = [("_opaque", ctypes.c_uint64 * _OPAQUE_WORDS)]
+
+
+class _FullParams(ctypes.Structure):
+    _fields_ = [
+        ("strategy", ctypes.c_int),
+        ("n_threads", ctypes.c_int),
+        ("n_max_text_ctx", ctypes.c_int),
+        ("offset_ms", ctypes.c_int),
+        ("duration_ms", ctypes.c_int),
+        ("translate", ctypes.c_bool),
+        ("no_context", ctypes.c_bool),
+        ("no_timestamps", ctypes.c_bool),
+        ("single_segment", ctypes.c_bool),
+        ("print_special", ctypes.c_bool),
+        ("print_progress", ctypes.c_bool),
+        ("print_realtime", ctypes.c_bool),
+        ("print_timestamps", ctypes.c_bool),
+        ("token_timestamps", ctypes.c_bool),
+        ("thold_pt", ctypes.c_float),
+        ("thold_ptsum", ctypes.c_float),
+        ("max_len", ctypes.c_int),
+        ("split_on_word", ctypes.c_bool),
+        ("max_tokens", ctypes.c_int),
+        ("debug_mode", ctypes.c_bool),
+        ("audio_ctx", ctypes.c_int),
+        ("tdrz_enable", ctypes.c_bool),
+        ("suppress_regex", ctypes.c_char_p),
+        ("initial_prompt", ctypes.c_char_p),
+        ("prompt_tokens", ctypes.c_void_p),
+        ("prompt_n_tokens", ctypes.c_int),
+        ("language", ctypes.c_char_p),
+        ("detect_language", ctypes.c_bool),
+        ("suppress_blank", ctypes.c_bool),
+        ("suppress_non_speech_tokens", ctypes.c_bool),
+        ("temperature", ctypes.c_float),
+        ("max_initial_ts", ctypes.c_float),
+        ("length_penalty", ctypes.c_float),
+        ("temperature_inc", ctypes.c_float),
+        ("entropy_thold", ctypes.c_float),
+        ("logprob_thold", ctypes.c_float),
+        ("no_speech_thold", ctypes.c_float),
+        ("greedy_best_of", ctypes.c_int),
+        ("beam_search_beam_size", ctypes.c_int),
+        ("beam_search_patience", ctypes.c_float),
+        ("_opaque", ctypes.c_uint64 * _OPAQUE_WORDS),
+    ]
+
+
+def _load_library(library_path):
+    try:
+        lib = ctypes.CDLL(library_path)
+    except OSError as e:
+        raise LibWhisperError(f"Could not load {library_path}: {e}") from e
+
+    lib.whisper_context_default_params.argtypes = []
+    lib.whisper_context_default_params.restype = _ContextParams
+    lib.whisper_init_from_file_with_params.argtypes = [ctypes.c_char_p, _ContextParams]
+    lib.whisper_init_from_file_with_params.restype = ctypes.c_void_p
+    lib.whisper_free.argtypes = [ctypes.c_void_p]
+    lib.whisper_free.restype = None
+    lib.whisper_full_default_params.argtypes = [ctypes.c_int]
+    lib.whisper_full_default_params.restype = _FullParams
+    lib.whisper_full.argtypes = [ctypes.c_void_p, _FullParams, ctypes.POINTER(ctypes.c_float), ctypes.c_int]
+    lib.whisper_full.restype = ctypes.c_int
+    lib.whisper_full_n_segments.argtypes = [ctypes.c_void_p]
+    lib.whisper_full_n_segments.restype = ctypes.c_int
+    lib.whisper_full_get_segment_text.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.whisper_full_get_segment_text.restype = ctypes.c_char_p
+    lib.whisper_full_get_segment_t0.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.whisper_full_get_segment_t0.restype = ctypes.c_int64
+    lib.whisper_full_get_segment_t1.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.whisper_full_get_segment_t1.restype = ctypes.c_int64
+    lib.whisper_full_n_tokens.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.whisper_full_n_tokens.restype = ctypes.c_int
+    lib.whisper_full_get_token_id.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+    lib.whisper_full_get_token_id.restype = ctypes.c_int32
+    lib.whisper_full_get_token_p.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+    lib.whisper_full_get_token_p.restype = ctypes.c_float
+    lib.whisper_token_eot.argtypes = [ctypes.c_void_p]
+    lib.whisper_token_eot.restype = ctypes.c_int32
+    return lib
+
+
+class _Context:
+    """
+    A whisper context for one model, with the sample buffer reused across calls.
+    """
+
+    def __init__(self, lib, model_path):
+        self.lib = lib
+        self.model_path = model_path
+        self.lock = threading.Lock()
+        self._samples = None
+        self.handle = lib.whisper_init_from_file_with_params(model_path.encode("utf-8"),
+                                                             lib.whisper_context_default_params())
+        if not self.handle:
+            raise LibWhisperError(f"libwhisper could not load the model {model_path}")
+
+    def samples(self, audio_data):
+        import numpy as np
+
+        pcm = np.frombuffer(audio_data, dtype=np.int16)
+        if self._samples is None or len(self._samples) < len(pcm):
+            self._samples = np.empty(len(pcm), dtype=np.float32)
+        samples = self._samples[:len(pcm)]
+        np.multiply(pcm, 1 / 32768, out=samples, casting="unsafe")
+        return samples
+
+    def free(self):
+        if self.handle:
+            self.lib.whisper_free(self.handle)
+            self.handle = None
+
+
+class InProcessWhisper:
+    """
+    InProcessWhisper transcribes with whisper contexts that stay loaded in this process.
+
+    A context is created on the first request for a model and kept until it is
+    unloaded. A context can only run one inference at a time, so requests for the
+    same model are serialized while different models run concurrently.
+
+    Attributes:
+        library_path (str): Path to the libwhisper shared library.
+        last_inference_s (float): Seconds `whisper_full` took for the last request.
+    """
+
+    def __init__(self, library_path: str):
+        """
+        Load the library without loading any model.
+
+        Args:
+            library_path (str): Path to libwhisper, e.g. `libwhisper.dylib` or a CPU-only `libwhisper.so` on Linux.
+
+        Raises:
+            LibWhisperError: If the library cannot be loaded.
+        """
+        self.library_path = library_path
+        self.last_inference_s = None
+        self._lib = _load_library(library_path)
+        self._contexts = {}
+        self._lock = threading.Lock()
+
+    def load(self, model_path: str):
+        """
+        Load the context for a model unless it is loaded already.
+
+        Raises:
+            LibWhisperError: If the model cannot be loaded.
+        """
+        self._context(model_path)
+
+    def loaded(self) -> list[str]:
+        """
+        Return the model paths with a resident context.
+        """
+        with self._lock:
+            return list(self._contexts)
+
+    def unload(self, model_path: str):
+        """
+        Free the context for a model, waiting for a running inference on it to finish.
+        """
+        with self._lock:
+            context = self._contexts.pop(model_path, None)
+        if context is not None:
+            with context.lock:
+                context.free()
+
+    def unload_all(self):
+        for model_path in self.loaded():
+            self.unload(model_path)
+
+    def transcribe(self, audio_data: bytes, model_path: str, language: str, threads: int = DEFAULT_WHISPER_THREADS,
+                   beam_size: int = DEFAULT_BEAM_SIZE, best_of: int = DEFAULT_BEST_OF) -> TranscriptionResult:
+        """
+        Transcribe raw PCM samples.
+
+        Args:
+            audio_data (bytes): 16 kHz mono 16-bit PCM samples, any buffer.
+            model_path (str): Path to the ggml model.
+            language (str): Whisper language code.
+            threads (int): Number of inference threads.
+            beam_size (int): Beams of beam search, 1 or less to decode greedily.
+            best_of (int): Candidates sampled when falling back to a higher temperature.
+
+        Returns:
+            TranscriptionResult: The segments with timestamps and confidences.
+
+        Raises:
+            LibWhisperError: If the model cannot be loaded or inference fails.
+        """
+        context = self._context(model_path)
+        lib = self._lib
+        params = lib.whisper_full_default_params(_SAMPLING_BEAM_SEARCH if beam_size > 1 else _SAMPLING_GREEDY)
+        params.greedy_best_of = best_of
+        if beam_size > 1:
+            params.beam_search_beam_size = beam_size
+        params.n_threads = threads
+        params.language = language.encode("utf-8")
+        params.print_progress = False
+        params.print_realtime = False
+        params.print_timestamps = False
+        params.no_timestamps = False
+
+        with context.lock:
+            if not context.handle:
+                raise LibWhisperError(f"The context for {model_path} was unloaded")
+            samples = context.samples(audio_data)
+            t_start = time.perf_counter()
+            status = lib.whisper_full(context.handle, params,
+                                      samples.ctypes.data_as(ctypes.POINTER(ctypes.c_float)), len(samples))
+            elapsed = time.perf_counter() - t_start
+            if status != 0:
+                raise LibWhisperError(f"whisper_full failed with status {status}")
+            segments = self._segments(context.handle)
+        self.last_inference_s = elapsed
+        return TranscriptionResult(segments, {"full": elapsed})
+
+    def _context(self, model_path):
+        with self._lock:
+            context = self._contexts.get(model_path)
+            if context is None:
+                context = _Context(self._lib, model_path)
+                self._contexts[model_path] = context
+            return context
+
+    def _segments(self, handle):
+        lib = self._lib
+        eot = lib.whisper_token_eot(handle)
+        segments = []
+        for i in range(lib.whisper_full_n_segments(handle)):
+            # timestamps are in units of 10 ms, special tokens have ids from end-of-text on
+            logprobs = [math.log(max(lib.whisper_full_get_token_p(handle, i, j), 1e-10))
+                        for j in range(lib.whisper_full_n_tokens(handle, i))
+                        if lib.whisper_full_get_token_id(handle, i, j) < eot]
+            segments.append(Segment(lib.whisper_full_get_segment_text(handle, i).decode("utf-8", errors="replace"),
+                                    lib.whisper_full_get_segment_t0(handle, i) / 100,
+                                    lib.whisper_full_get_segment_t1(handle, i) / 100,
+                                    sum(logprobs) / len(logprobs) if logprobs else None))
+        return segments
@@ -6,8 +6,15 @@ listeners, as well as utility functions for building listeners and parsing keys.
 The module supports different types of listeners based on configuration,
 allowing for flexible control of recording start/stop actions through keyboard
 interactions.
+
+Key events arrive on the pynput hook thread, and macOS disables an event tap whose
+callback is too slow. The multiplexer therefore looks up the listeners of a key in
+a dict, so keys no listener cares about return immediately, and the listeners call
+the app through an action dispatcher that runs the actions on its own thread.
 """
 
+import queue
+import threading
 import time
 
 from pynput import keyboard
@@ -15,21 +22,43 @@ from pynput import keyboard
 from osx_echo.constants import DBL_CLICK_TIMEOUT_MS
 
 
-def build_listener_multiplexer(listeners):
+def build_listener_multiplexer(listeners, dispatcher=None, prefetch=None):
     """
     Builds a listener multiplexer based on the language configurations.
+
+    Args:
+        listeners (list): The key listeners to dispatch events to.
+        dispatcher (_ActionDispatcher): The dispatcher the listeners call the app through, may be None.
+        prefetch: Callable taking a LanguageConfig, called on the hook thread when one of its trigger keys
+            goes down, may be None. It must return immediately.
     """
 
-    return _ListenerMultiplexer(listeners)
+    return _ListenerMultiplexer(listeners, dispatcher, prefetch)
 
 
-def build_key_listener(app, language_config):
+def build_action_dispatcher(app, metrics=None):
     """
-    Builds a key listener based on the listener configuration.
+    Builds the dispatcher that runs app actions triggered by key events off the hook thread.
+
+    Pass the dispatcher instead of the app to `build_key_listener`.
 
     Args:
         app: The main application instance.
+        metrics (Metrics): Records the time of key events for latency traces, may be None.
+    """
+
+    return _ActionDispatcher(app, metrics)
+
+
+def build_key_listener(app, language_config, clock=time.time):
+    """
+    Builds a key listener based on the listener configuration.
+
+    Args:
+        app: The main application instance, or the action dispatcher standing in for it.
         listener_config (dict): Configuration for the listener.
+        clock: Callable returning the current time in seconds, replaced by the replay clock of `osx_echo.key_replay`.
+            Only the double tap listener measures time.
 
     Returns:
         A listener instance (_DoubleTapListener or _KeyHoldListener).
@@ -40,7 +69,7 @@ def build_key_listener(app, language_config):
     listener_config = language_config.trigger
     listener_type = listener_config["type"]
     if listener_type == "double_tap":
-        return _DoubleTapListener(app, _parse_key(listener_config["key"]), language_config)
+        return _DoubleTapListener(app, _parse_key(listener_config["key"]), language_config, clock)
     if listener_type == "key_hold":
         return _KeyHoldListener(app, [_parse_key(key) for key in listener_config["keys"]], language_config)
     if listener_type == "key_press":
@@ -51,12 +80,30 @@ def build_key_listener(app, language_config):
 
 class _ListenerMultiplexer:
     """
-    This class implements a listener that detects double taps of a specified key
-    to toggle recording on and off.
+    This class dispatches key events to the listeners of the key.
     """
 
-    def __init__(self, listeners):
+    def __init__(self, listeners, dispatcher=None, prefetch=None):
+        self.dispatcher = dispatcher
+        self.prefetch = prefetch
+        self.set_listeners(listeners)
+
+    def set_listeners(self, listeners):
+        """
+        Replace the listeners, e.g. after the triggers in the config changed.
+
+        The new index is built before it is swapped in, so the hook thread sees
+        either the old or the new listeners.
+
+        Args:
+            listeners (list): The key listeners to dispatch events to.
+        """
+        index = {}
+        for listener in listeners:
+            for key in listener.keys:
+                index.setdefault(key, []).append(listener)
         self.listeners = listeners
+        self._index = index
 
     def on_key_press(self, key):
         """
@@ -65,7 +112,14 @@ class _ListenerMultiplexer:
         Args:
             key: The key that was pressed.
         """
-        for listener in self.listeners:
+        listeners = self._index.get(key)
+        if listeners is None:
+            return
+        if self.dispatcher is not None:
+            self.dispatcher.key_event_time = time.perf_counter()
+        for listener in listeners:
+            if self.prefetch is not None:
+                self.prefetch(listener.language_config)
             listener.on_key_press(key)
 
     def on_key_release(self, key):
@@ -75,15 +129,70 @@ class _ListenerMultiplexer:
         Args:
             key: The key that was released.
         """
-        for listener in self.listeners:
+        listeners = self._index.get(key)
+        if listeners is None:
+            return
+        if self.dispatcher is not None:
+            self.dispatcher.key_event_time = time.perf_counter()
+        for listener in listeners:
             listener.on_key_release(key)
 
 
+class _ActionDispatcher:
+    """
+    This class stands in for the app in the listeners and runs the app actions on a dispatcher thread.
+
+    Actions are handed over through a SimpleQueue, whose `put` never blocks, together
+    with the time of the key event that triggered them.
+    """
+
+    def __init__(self, app, metrics=None):
+        self.app = app
+        self.metrics = metrics
+        # set by the multiplexer on the hook thread before calling the listeners
+        self.key_event_time = None
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def toggle_recording(self, language_config):
+        self._queue.put((self.app.toggle_recording, language_config, self.key_event_time))
+
+    def start_recording(self, language_config):
+        self._queue.put((self.app.start_recording, language_config, self.key_event_time))
+
+    def stop_recording(self, sender):
+        self._queue.put((self.app.stop_recording, sender, self.key_event_time))
+
+    def stop(self):
+        """
+        Stop the dispatcher thread after the queued actions have run.
+        """
+        self._queue.put((None, None, None))
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            action, arg, key_event_time = self._queue.get()
+            if action is None:
+                return
+            if self.metrics is not None and key_event_time is not None:
+                self.metrics.note_key_event(key_event_time)
+            try:
+                action(arg)
+            except Exception as e:
+                print(f"Key action failed: {e}")
+            finally:
+                if self.metrics is not None:
+                    self.metrics.clear_key_event()
+
+
 class _KeyPressListener:
 
     def __init__(self, app, key, language_config):
         self.app = app
         self.key = key
+        self.keys = [key]
         self.language_config = language_config
 
     def on_key_press(self, key):
@@ -113,19 +222,22 @@ class _DoubleTapListener:
     to toggle recording on and off.
     """
 
-    def __init__(self, app, key, language_config):
+    def __init__(self, app, key, language_config, clock=time.time):
         """
         Initialize the _DoubleTapListener.
 
         Args:
             app: The main application instance.
             key: The key to listen for double taps.
+            clock: Callable returning the current time in seconds.
         """
         self.app = app
         self.key = key
+        self.keys = [key]
         self.pressed = 0
-        self.last_press_time = 0
+        self.last_press_time = None
         self.language_config = language_config
+        self.clock = clock
 
     def on_key_press(self, key):
         """
@@ -135,7 +247,7 @@ class _DoubleTapListener:
             key: The key that was pressed.
         """
         if key == self.key:
-            current_time = time.time()
+            current_time = self.clock()
             if (
                 self.last_press_time is not None
                 and current_time - self.last_press_time < DBL_CLICK_TIMEOUT_MS / 1000
@@ -173,6 +285,7 @@ class _KeyHoldListener:
         self.app = app
         # FIX: fix the keys_pressed array to accept the keys argument.
         self.keys_pressed = {key: False for key in keys}
+        self.keys = list(self.keys_pressed)
         self.language_config = language_config
 
     def on_key_press(self, key):
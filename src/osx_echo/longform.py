@@ -0,0 +1,158 @@
+"""
+This module transcribes long recordings in parallel.
+
+A single whisper.cpp process only scales to a handful of threads, so on machines
+with many cores a long dictation leaves most of them idle. LongForm cuts the audio
+into segments of about `segment_s` seconds at the quietest point near each
+boundary, extends every segment by half of `overlap_s` past the cut so words on
+the cut are not lost, and transcribes the segments concurrently with one whisper
+process each. The transcripts are joined in order, dropping the words that the
+overlap produced twice.
+
+Classes:
+    LongForm: Splits, transcribes in parallel and stitches long recordings.
+"""
+
+import concurrent.futures
+import os
+import re
+import time
+
+import numpy as np
+
+from .constants import DEFAULT_WHISPER_THREADS, SAMPLE_RATE, SAMPLE_WIDTH
+from .vad import frame_rms
+
+
+class LongForm:
+    """
+    LongForm transcribes recordings longer than `min_duration_s` as parallel segments.
+
+    Attributes:
+        processes (int): Number of whisper processes run at the same time.
+        threads (int): Inference threads of every process.
+        last_report (dict): Segment count, processes and wall time of the last transcription.
+    """
+
+    def __init__(self, min_duration_s: float = 60.0, segment_s: float = 30.0, overlap_s: float = 1.0,
+                 processes: int | None = None, frame_s: float = 0.03, max_overlap_words: int = 8):
+        """
+        Initialize LongForm and its worker pool.
+
+        Args:
+            min_duration_s (float): Shortest recording that is split.
+            segment_s (float): Target length of a segment.
+            overlap_s (float): Audio shared by neighbouring segments.
+            processes (int): Concurrent whisper processes, defaults to the core count divided by the default threads.
+            frame_s (float): Length of the frames the quietest cut point is searched on.
+            max_overlap_words (int): Most words removed as duplicates at a segment boundary.
+        """
+        cores = os.cpu_count() or DEFAULT_WHISPER_THREADS
+        self.min_duration_s = min_duration_s
+        self.segment_s = segment_s
+        self.overlap_s = overlap_s
+        self.processes = processes if processes is not None else max(1, cores // DEFAULT_WHISPER_THREADS)
+        self.threads = max(1, cores // self.processes)
+        self.frame_len = max(1, int(frame_s * SAMPLE_RATE))
+        self.max_overlap_words = max_overlap_words
+        self.last_report = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.processes)
+
+    @staticmethod
+    def from_config(config: dict) -> "LongForm":
+        return LongForm(config.get("min_duration_s", 60.0), config.get("segment_s", 30.0),
+                        config.get("overlap_s", 1.0), config.get("processes"), config.get("frame_s", 0.03),
+                        config.get("max_overlap_words", 8))
+
+    def applies(self, audio_data: bytes) -> bool:
+        """
+        Check whether a recording is long enough to be split.
+        """
+        return len(audio_data) / (SAMPLE_WIDTH * SAMPLE_RATE) >= self.min_duration_s
+
+    def split(self, audio_data: bytes) -> list[bytes]:
+        """
+        Cut a recording into overlapping segments at quiet points.
+
+        Args:
+            audio_data (bytes): 16 kHz mono 16-bit PCM samples.
+
+        Returns:
+            list[bytes]: The segments in order, views into `audio_data` where possible.
+        """
+        audio = memoryview(audio_data).cast("B")
+        n_samples = len(audio) // SAMPLE_WIDTH
+        segment_len = max(1, int(self.segment_s * SAMPLE_RATE))
+        half_overlap = int(self.overlap_s * SAMPLE_RATE / 2)
+        rms = frame_rms(audio, self.frame_len)
+
+        cuts = []
+        start = 0
+        # the last segment may be up to 1.5 segments long rather than leaving a short remainder
+        while n_samples - start > 1.5 * segment_len:
+            # search the last quarter before the target length for the quietest frame
+            first_frame = (start + segment_len * 3 // 4) // self.frame_len
+            last_frame = (start + segment_len) // self.frame_len
+            # segments of only a few frames leave no frame to search, or one whose middle lies before the start
+            cut = start + segment_len
+            if first_frame < last_frame:
+                quietest = first_frame + int(np.argmin(rms[first_frame:last_frame]))
+                if quietest * self.frame_len + self.frame_len // 2 > start:
+                    cut = quietest * self.frame_len + self.frame_len // 2
+            cuts.append(cut)
+            start = cut
+
+        bounds = [0] + cuts + [n_samples]
+        return [audio[max(0, begin - half_overlap) * SAMPLE_WIDTH:min(n_samples, end + half_overlap) * SAMPLE_WIDTH]
+                for begin, end in zip(bounds, bounds[1:])]
+
+    def transcribe(self, audio_data: bytes, transcribe_segment) -> str:
+        """
+        Transcribe a recording as parallel segments.
+
+        Args:
+            audio_data (bytes): 16 kHz mono 16-bit PCM samples.
+            transcribe_segment: Callable taking the PCM samples of a segment and a thread count, returning its text.
+
+        Returns:
+            str: The stitched transcript.
+        """
+        t_start = time.perf_counter()
+        segments = self.split(audio_data)
+        texts = list(self._executor.map(lambda segment: transcribe_segment(segment, self.threads), segments))
+        elapsed = time.perf_counter() - t_start
+        self.last_report = {"segments": len(segments), "processes": self.processes, "wall_s": elapsed}
+        print(f"Transcribed {len(audio_data) / (SAMPLE_WIDTH * SAMPLE_RATE):.0f} s as {len(segments)} segments "
+              f"on {self.processes} processes with {self.threads} threads in {elapsed:.1f} s")
+        return self.stitch(texts)
+
+    def stitch(self, texts: list[str]) -> str:
+        """
+        Join segment transcripts, removing words repeated at the boundaries.
+
+        Args:
+            texts (list[str]): Transcripts of consecutive overlapping segments.
+
+        Returns:
+            str: The joined transcript.
+        """
+        words = []
+        for text in texts:
+            new_words = text.split()
+            words.extend(new_words[_overlap(words, new_words, self.max_overlap_words):])
+        return " ".join(words)
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+
+def _overlap(previous, new, max_words):
+    # longest run of words that ends `previous` and starts `new`, ignoring case and punctuation
+    for count in range(min(max_words, len(previous), len(new)), 0, -1):
+        if [_normalize(w) for w in previous[-count:]] == [_normalize(w) for w in new[:count]]:
+            return count
+    return 0
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
@@ -0,0 +1,263 @@
+"""
+This module records where the time goes in every dictation.
+
+Each utterance gets a Trace that collects a timestamp per stage, from the key
+event that triggered it until the text has been typed. When a trace finishes,
+the time between consecutive stages is added to rolling histograms that the
+menu shows as p50/p95, and the trace can be appended to a JSON lines file or a
+Chrome trace-event file (open it in chrome://tracing or https://ui.perfetto.dev).
+
+Stages, in the order they normally happen:
+    key_event, start_recording, stream_open, first_frame, stop, audio_ready,
+    wav_encoded, whisper_start, whisper_end, cleanup, typed
+
+Durations measured elsewhere, such as the load, mel, encode and decode times
+whisper.cpp reports for itself, are recorded on the trace as `whisper_<name>`
+and get histograms of their own.
+
+Classes:
+    RollingHistogram: Percentiles over the most recent samples.
+    Trace: Stage timestamps of a single utterance.
+    Metrics: Histograms and sinks shared by all traces.
+"""
+
+import collections
+import json
+import math
+import threading
+import time
+
+STAGES = ["key_event", "start_recording", "stream_open", "first_frame", "stop", "audio_ready",
+          "wav_encoded", "whisper_start", "whisper_end", "cleanup", "typed", "release_to_text", "key_to_text"]
+
+
+class RollingHistogram:
+    """
+    RollingHistogram keeps the most recent `size` samples and reports percentiles.
+    """
+
+    def __init__(self, size: int = 200):
+        self._samples = collections.deque(maxlen=size)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, value: float):
+        self._samples.append(value)
+
+    def percentile(self, p: float) -> float | None:
+        """
+        Compute a percentile with the nearest-rank method.
+
+        Args:
+            p (float): The percentile, between 0 and 100.
+
+        Returns:
+            float | None: The percentile, or None if there are no samples.
+        """
+        samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = max(0, min(len(samples) - 1, math.ceil(p / 100 * len(samples)) - 1))
+        return samples[rank]
+
+
+class Trace:
+    """
+    Trace collects the stage timestamps of a single utterance.
+
+    Attributes:
+        trace_id (int): Sequential id of the utterance.
+        marks (dict): Stage name to `time.perf_counter()` timestamp.
+        durations (dict): Name to seconds of durations that are not between two marks.
+    """
+
+    def __init__(self, metrics: "Metrics", trace_id: int):
+        self.metrics = metrics
+        self.trace_id = trace_id
+        self.marks = {}
+        self.durations = {}
+
+    def mark(self, stage: str, t: float | None = None):
+        """
+        Record the time a stage was reached.
+
+        Args:
+            stage (str): Name of the stage.
+            t (float): `time.perf_counter()` timestamp, defaults to now.
+        """
+        self.marks[stage] = time.perf_counter() if t is None else t
+
+    def record(self, name: str, duration: float):
+        """
+        Record a duration measured elsewhere, e.g. by whisper.cpp.
+
+        Args:
+            name (str): Name of the histogram.
+            duration (float): Duration in seconds.
+        """
+        self.durations[name] = duration
+
+    def finish(self):
+        """
+        Hand the trace to the metrics for aggregation and export.
+        """
+        self.metrics.finish(self)
+
+    def intervals(self) -> list[tuple[str, float, float]]:
+        """
+        Compute the time between consecutive stages.
+
+        Returns:
+            list[tuple[str, float, float]]: (stage, start, duration) for every stage after the first,
+            where the stage ended at start + duration.
+        """
+        ordered = sorted(self.marks.items(), key=lambda item: item[1])
+        return [(stage, prev_t, t - prev_t) for (_, prev_t), (stage, t) in zip(ordered, ordered[1:])]
+
+
+class Metrics:
+    """
+    Metrics aggregates finished traces into rolling histograms and writes them to the configured sinks.
+
+    Besides one histogram per stage, `release_to_text` measures the time from
+    releasing the trigger to the end of typing and `key_to_text` the whole utterance.
+
+    Attributes:
+        histograms (dict): Histogram name to RollingHistogram.
+        last_key_event_time (float): `time.perf_counter()` of the most recent key event.
+        on_update: Optional callable invoked after each finished trace.
+    """
+
+    def __init__(self, jsonl_path: str | None = None, chrome_trace_path: str | None = None, size: int = 200):
+        """
+        Initialize the Metrics.
+
+        Args:
+            jsonl_path (str): File to append one JSON object per utterance to, None to disable.
+            chrome_trace_path (str): File to write Chrome trace events to, None to disable.
+            size (int): Number of samples kept per histogram.
+        """
+        self.size = size
+        self.histograms = {}
+        self.last_key_event_time = None
+        self.on_update = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._epoch = time.perf_counter()
+        self._jsonl = open(jsonl_path, "a", encoding="utf-8") if jsonl_path is not None else None
+        self._chrome = None
+        if chrome_trace_path is not None:
+            # the trace-event format allows leaving the array unterminated, so events can be appended
+            self._chrome = open(chrome_trace_path, "w", encoding="utf-8")
+            self._chrome.write("[\n")
+
+    @staticmethod
+    def from_config(config: dict) -> "Metrics":
+        return Metrics(config.get("jsonl_path"), config.get("chrome_trace_path"), config.get("histogram_size", 200))
+
+    def note_key_event(self, t: float | None = None):
+        """
+        Remember the time of a key event, used as the first stage of a trace started while it is dispatched.
+
+        Args:
+            t (float): `time.perf_counter()` timestamp of the event, defaults to now.
+        """
+        self.last_key_event_time = time.perf_counter() if t is None else t
+
+    def clear_key_event(self):
+        """
+        Forget the key event once it has been dispatched.
+        """
+        self.last_key_event_time = None
+
+    def start_trace(self) -> Trace:
+        """
+        Start a trace for a new utterance.
+
+        Returns:
+            Trace: The new trace, starting at the most recent key event if there was one.
+        """
+        with self._lock:
+            self._next_id += 1
+            trace = Trace(self, self._next_id)
+        if self.last_key_event_time is not None:
+            trace.mark("key_event", self.last_key_event_time)
+            self.last_key_event_time = None
+        return trace
+
+    def finish(self, trace: Trace):
+        """
+        Aggregate a finished trace and write it to the sinks.
+
+        Args:
+            trace (Trace): The finished trace.
+        """
+        intervals = trace.intervals()
+        with self._lock:
+            for stage, _, duration in intervals:
+                self._histogram(stage).add(duration)
+            for name, duration in trace.durations.items():
+                self._histogram(name).add(duration)
+            if "stop" in trace.marks and "typed" in trace.marks:
+                self._histogram("release_to_text").add(trace.marks["typed"] - trace.marks["stop"])
+            if "key_event" in trace.marks and "typed" in trace.marks:
+                self._histogram("key_to_text").add(trace.marks["typed"] - trace.marks["key_event"])
+            self._write(trace, intervals)
+
+        if self.on_update is not None:
+            self.on_update(self)
+
+    def summary(self) -> list[tuple[str, float, float]]:
+        """
+        Report p50 and p95 of every histogram, in stage order.
+
+        Returns:
+            list[tuple[str, float, float]]: (name, p50 seconds, p95 seconds) for every histogram with samples.
+        """
+        with self._lock:
+            names = sorted(self.histograms, key=lambda name: STAGES.index(name) if name in STAGES else len(STAGES))
+            return [(name, self.histograms[name].percentile(50), self.histograms[name].percentile(95))
+                    for name in names if len(self.histograms[name])]
+
+    def close(self):
+        """
+        Flush and close the sinks.
+        """
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+            if self._chrome is not None:
+                self._chrome.close()
+                self._chrome = None
+
+    def _histogram(self, name):
+        if name not in self.histograms:
+            self.histograms[name] = RollingHistogram(self.size)
+        return self.histograms[name]
+
+    def _write(self, trace, intervals):
+        if self._jsonl is not None:
+            record = {
+                "trace_id": trace.trace_id,
+                "marks_ms": {stage: (t - self._epoch) * 1000 for stage, t in trace.marks.items()},
+                "stages_ms": {stage: duration * 1000 for stage, _, duration in intervals},
+                "durations_ms": {name: duration * 1000 for name, duration in trace.durations.items()},
+            }
+            self._jsonl.write(json.dumps(record) + "\n")
+            self._jsonl.flush()
+
+        if self._chrome is not None:
+            for stage, start, duration in intervals:
+                event = {
+                    "name": stage,
+                    "cat": "dictation",
+                    "ph": "X",
+                    "ts": (start - self._epoch) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": 1,
+                    "tid": trace.trace_id,
+                }
+                self._chrome.write(json.dumps(event) + ",\n")
+            self._chrome.flush()
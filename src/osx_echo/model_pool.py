@@ -0,0 +1,234 @@
+"""
+This module decides which whisper models stay loaded.
+
+Every language in `language_support` has its own model, and a resident backend
+(the in-process libwhisper contexts or the whisper.cpp servers) keeps each model
+it has used in memory. On smaller machines they do not all fit, while loading a
+model for every switch of language is slow. The ModelPool keeps the most recently
+used models loaded within a memory budget and unloads the least recently used one
+when another has to be loaded. A model's memory is estimated from the size of
+its file plus a fixed overhead for the inference buffers. Loads that are still
+running count against the budget, and a model is pinned while inference runs on
+it, so it is never unloaded underneath a dictation; a load that does not fit
+waits for those instead of going over the budget.
+
+Loading can start before it is needed: the key listeners call `prefetch` when a
+trigger key goes down, so the model is usually loaded by the time the recording
+ends. Hits, misses, evictions and load times are counted for sizing the budget.
+
+Classes:
+    ModelPool: LRU set of loaded models within a memory budget.
+"""
+
+import collections
+import contextlib
+import os
+import threading
+import time
+
+from .metrics import RollingHistogram
+
+_MB = 1024 * 1024
+
+
+class ModelPool:
+    """
+    ModelPool loads and unloads models on a resident backend in least-recently-used order.
+
+    The backend needs `load(model_path)` and `unload(model_path)`. Loads run on the
+    thread that needs the model, or on the prefetch thread; a request for a model
+    that is still being prefetched waits for that load instead of starting another.
+    Only models that are neither pinned nor still loading can be evicted.
+
+    Attributes:
+        memory_budget_mb (float): Memory the loaded models may use together, None for no limit.
+        overhead_mb (float): Memory estimated per model on top of its file size.
+        hits (int): Requests for a model that was loaded.
+        misses (int): Requests that had to load or wait for the model.
+        prefetches (int): Loads started by `prefetch`.
+        evictions (int): Models unloaded to stay within the budget.
+        load_times (RollingHistogram): Seconds each load took.
+    """
+
+    def __init__(self, backend, memory_budget_mb: float | None = None, overhead_mb: float = 150.0):
+        """
+        Initialize the ModelPool without loading anything.
+
+        Args:
+            backend: The resident backend, InProcessWhisper or WhisperServerPool.
+            memory_budget_mb (float): Memory the loaded models may use together, None for no limit.
+            overhead_mb (float): Memory estimated per model on top of its file size.
+        """
+        self.backend = backend
+        self.memory_budget_mb = memory_budget_mb
+        self.overhead_mb = overhead_mb
+        self.hits = 0
+        self.misses = 0
+        self.prefetches = 0
+        self.evictions = 0
+        self.load_times = RollingHistogram()
+        # model path to estimated MB, least recently used first
+        self._loaded = collections.OrderedDict()
+        # model path to the Event set when its load finishes
+        self._loading = {}
+        # model path to the estimated MB of a running load, counted against the budget
+        self._reserved = {}
+        # model path to the number of inferences using it
+        self._pins = collections.Counter()
+        self._lock = threading.Lock()
+        # notified whenever a load finishes or a pin is released
+        self._released = threading.Condition(self._lock)
+
+    @staticmethod
+    def from_config(backend, config: dict) -> "ModelPool":
+        return ModelPool(backend, config.get("memory_budget_mb"), config.get("overhead_mb", 150.0))
+
+    @contextlib.contextmanager
+    def acquire(self, model_path: str, trace=None):
+        """
+        Make sure a model is loaded and keep it loaded until the block exits.
+
+        The model is loaded if needed, evicting others, and pinned for the
+        duration of the block, so it cannot be evicted while inference runs on it.
+        If the model cannot be loaded, the block runs unpinned and the backend
+        reports the error when it loads the model itself.
+
+        Args:
+            model_path (str): Path to the ggml model.
+            trace (Trace): Latency trace of the dictation, gets `model_wait` if the model was not loaded.
+        """
+        t_start = time.perf_counter()
+        missed = False
+        loaded_here = False
+        pinned = False
+        while True:
+            with self._lock:
+                if model_path in self._loaded:
+                    self._loaded.move_to_end(model_path)
+                    self._pins[model_path] += 1
+                    pinned = True
+                    if not missed:
+                        self.hits += 1
+                    break
+                if not missed:
+                    self.misses += 1
+                    missed = True
+                pending = self._loading.get(model_path)
+                if pending is None:
+                    if loaded_here:
+                        break
+                    pending = self._loading[model_path] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            if owner:
+                loaded_here = True
+                self._load(model_path, pending)
+            else:
+                pending.wait()
+        if missed and trace is not None:
+            trace.record("model_wait", time.perf_counter() - t_start)
+
+        try:
+            yield
+        finally:
+            if pinned:
+                with self._lock:
+                    self._pins[model_path] -= 1
+                    if not self._pins[model_path]:
+                        del self._pins[model_path]
+                    self._released.notify_all()
+
+    def prefetch(self, model_path: str):
+        """
+        Start loading a model in the background unless it is loaded or loading.
+
+        Cheap enough to call from the key listener hook thread.
+
+        Args:
+            model_path (str): Path to the ggml model.
+        """
+        if model_path in self._loaded or model_path in self._loading:
+            return
+        with self._lock:
+            if model_path in self._loaded or model_path in self._loading:
+                return
+            pending = self._loading[model_path] = threading.Event()
+            self.prefetches += 1
+        threading.Thread(target=self._load, args=(model_path, pending), daemon=True).start()
+
+    def loaded(self) -> list[str]:
+        """
+        Return the loaded models, least recently used first.
+        """
+        with self._lock:
+            return list(self._loaded)
+
+    def summary(self) -> str:
+        """
+        Describe the pool state and counters in one line.
+        """
+        with self._lock:
+            used_mb = sum(self._loaded.values())
+            loaded = len(self._loaded)
+        budget = f"{self.memory_budget_mb:.0f}" if self.memory_budget_mb is not None else "unlimited"
+        p50 = self.load_times.percentile(50)
+        load = f", load p50 {p50:.2f} s" if p50 is not None else ""
+        return (f"{loaded} models loaded, {used_mb:.0f}/{budget} MB, {self.hits} hits, {self.misses} misses, "
+                f"{self.prefetches} prefetches, {self.evictions} evictions{load}")
+
+    def _load(self, model_path, pending):
+        try:
+            size_mb = self.estimate_mb(model_path)
+            for evicted in self._reserve(size_mb, model_path):
+                self.backend.unload(evicted)
+                print(f"Unloaded model {evicted} to stay within the memory budget")
+            t_start = time.perf_counter()
+            self.backend.load(model_path)
+            elapsed = time.perf_counter() - t_start
+            with self._lock:
+                self._loaded[model_path] = size_mb
+                self.load_times.add(elapsed)
+            print(f"Loaded model {model_path} in {elapsed:.2f} s: {self.summary()}")
+        except Exception as e:
+            # the backend loads the model itself on use, where the error is reported to the dictation
+            print(f"Could not load model {model_path}: {e}")
+        finally:
+            with self._lock:
+                self._reserved.pop(model_path, None)
+                self._loading.pop(model_path, None)
+                self._released.notify_all()
+            pending.set()
+
+    def _reserve(self, size_mb, model_path):
+        # returns the models to unload; waits while running loads or pinned models would be pushed over the budget
+        evicted = []
+        with self._lock:
+            if self.memory_budget_mb is not None:
+                while True:
+                    used_mb = sum(self._loaded.values()) + sum(self._reserved.values())
+                    evictable = [path for path in self._loaded if not self._pins[path]]
+                    evictable_mb = sum(self._loaded[path] for path in evictable)
+                    if used_mb - evictable_mb + size_mb <= self.memory_budget_mb or not (self._reserved or self._pins):
+                        break
+                    self._released.wait()
+                for oldest in evictable:
+                    if used_mb + size_mb <= self.memory_budget_mb:
+                        break
+                    used_mb -= self._loaded.pop(oldest)
+                    evicted.append(oldest)
+                    self.evictions += 1
+                if used_mb + size_mb > self.memory_budget_mb:
+                    print(f"Model {model_path} needs about {size_mb:.0f} MB, more than the budget of "
+                          f"{self.memory_budget_mb:.0f} MB")
+            self._reserved[model_path] = size_mb
+        return evicted
+
+    def estimate_mb(self, model_path: str) -> float:
+        """
+        Estimate the memory of a loaded model from its file size plus `overhead_mb`.
+        """
+        try:
+            return os.path.getsize(model_path) / _MB + self.overhead_mb
+        except OSError:
+            return self.overhead_mb
@@ -0,0 +1,204 @@
+"""
+This module provides the output engines that put transcribed text into the focused
+application.
+
+Typing one character at a time with a sleep after each one makes long transcripts
+appear slowly and floods the target application with events. The engines below
+trade these costs differently and are selected through the `output` section of the
+configuration. All engines can also delete text before the cursor, which is used to
+patch drafts with refined transcripts.
+
+Classes:
+    CharTyper: Types one character at a time with a fixed delay (the original behavior).
+    BatchedTyper: Types fixed-size chunks of text without per-character delays.
+    AdaptiveTyper: Types growing chunks so the first words appear immediately.
+    ClipboardPaster: Pastes the text through the clipboard and restores its previous content.
+"""
+
+import subprocess
+import time
+
+
+def build_output_engine(output_config: dict, controller=None, clipboard=None):
+    """
+    Builds an output engine based on the output configuration.
+
+    Args:
+        output_config (dict): Configuration for the output engine, may be empty.
+        controller: Keyboard controller to use, defaults to a pynput keyboard controller.
+        clipboard: Clipboard to use for pasting, defaults to the macOS pasteboard.
+
+    Returns:
+        An output engine instance.
+
+    Raises:
+        ValueError: If an invalid output strategy is specified.
+    """
+    if controller is None:
+        controller = _default_controller()
+
+    strategy = output_config.get("strategy", "batched")
+    if strategy == "char":
+        return CharTyper(controller, output_config.get("delay_s", 0.001))
+    if strategy == "batched":
+        return BatchedTyper(controller, output_config.get("chunk_size", 32), output_config.get("delay_s", 0.0))
+    if strategy == "adaptive":
+        return AdaptiveTyper(controller, output_config.get("min_chunk_size", 4),
+                             output_config.get("max_chunk_size", 128), output_config.get("delay_s", 0.0))
+    if strategy == "paste":
+        return ClipboardPaster(controller, clipboard if clipboard is not None else MacClipboard(),
+                               output_config.get("restore_delay_s", 0.2))
+
+    raise ValueError(f"Invalid output strategy: {strategy}")
+
+
+class _OutputEngine:
+    """
+    Common base of the output engines, providing deletion of typed text.
+    """
+
+    controller = None
+
+    def erase(self, count: int):
+        """
+        Delete characters before the cursor with backspace.
+
+        Args:
+            count (int): Number of characters to delete.
+        """
+        from pynput import keyboard
+
+        for _ in range(count):
+            self.controller.press(keyboard.Key.backspace)
+            self.controller.release(keyboard.Key.backspace)
+
+
+class CharTyper(_OutputEngine):
+    """
+    Types text one character at a time and sleeps after every character.
+    """
+
+    def __init__(self, controller, delay_s=0.001):
+        self.controller = controller
+        self.delay_s = delay_s
+
+    def type(self, text: str):
+        """
+        Type out the text.
+
+        Args:
+            text (str): The text to type.
+        """
+        for char in text:
+            self.controller.type(char)
+            time.sleep(self.delay_s)
+
+
+class BatchedTyper(_OutputEngine):
+    """
+    Types text in fixed-size chunks, optionally sleeping between chunks.
+    """
+
+    def __init__(self, controller, chunk_size=32, delay_s=0.0):
+        self.controller = controller
+        self.chunk_size = chunk_size
+        self.delay_s = delay_s
+
+    def type(self, text: str):
+        """
+        Type out the text.
+
+        Args:
+            text (str): The text to type.
+        """
+        for start in range(0, len(text), self.chunk_size):
+            self.controller.type(text[start:start + self.chunk_size])
+            if self.delay_s:
+                time.sleep(self.delay_s)
+
+
+class AdaptiveTyper(_OutputEngine):
+    """
+    Types text in chunks that double in size from `min_chunk_size` up to `max_chunk_size`.
+
+    The first few characters reach the target application right away while the
+    rest of a long transcript is sent in few, large calls.
+    """
+
+    def __init__(self, controller, min_chunk_size=4, max_chunk_size=128, delay_s=0.0):
+        self.controller = controller
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.delay_s = delay_s
+
+    def type(self, text: str):
+        """
+        Type out the text.
+
+        Args:
+            text (str): The text to type.
+        """
+        start = 0
+        chunk_size = self.min_chunk_size
+        while start < len(text):
+            self.controller.type(text[start:start + chunk_size])
+            start += chunk_size
+            chunk_size = min(chunk_size * 2, self.max_chunk_size)
+            if self.delay_s:
+                time.sleep(self.delay_s)
+
+
+class ClipboardPaster(_OutputEngine):
+    """
+    Pastes text through the clipboard with a single paste shortcut.
+
+    The previous clipboard content is restored after `restore_delay_s`, which
+    gives the target application time to read the pasted text. Only text content
+    of the clipboard is preserved.
+    """
+
+    def __init__(self, controller, clipboard, restore_delay_s=0.2, modifier=None):
+        self.controller = controller
+        self.clipboard = clipboard
+        self.restore_delay_s = restore_delay_s
+        if modifier is None:
+            from pynput import keyboard
+
+            modifier = keyboard.Key.cmd
+        self.modifier = modifier
+
+    def type(self, text: str):
+        """
+        Paste the text into the focused application.
+
+        Args:
+            text (str): The text to paste.
+        """
+        previous = self.clipboard.get()
+        try:
+            self.clipboard.set(text)
+            with self.controller.pressed(self.modifier):
+                self.controller.press("v")
+                self.controller.release("v")
+            time.sleep(self.restore_delay_s)
+        finally:
+            # a failed paste must not leave the transcript on the clipboard
+            self.clipboard.set(previous)
+
+
+class MacClipboard:
+    """
+    Reads and writes the text content of the macOS pasteboard.
+    """
+
+    def get(self) -> str:
+        return subprocess.run(["pbpaste"], check=True, stdout=subprocess.PIPE).stdout.decode("utf-8")
+
+    def set(self, text: str):
+        subprocess.run(["pbcopy"], input=text.encode("utf-8"), check=True)
+
+
+def _default_controller():
+    from pynput import keyboard
+
+    return keyboard.Controller()
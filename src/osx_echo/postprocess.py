@@ -0,0 +1,210 @@
+"""
+This module cleans up transcripts before they are typed.
+
+The PostProcessor is built once at startup from the `postprocess` section of the
+configuration. It removes bracketed tokens such as "[BLANK_AUDIO]", collapses all
+whitespace into single spaces and applies a user dictionary of phrase
+replacements, e.g. to correct jargon that whisper keeps getting wrong.
+
+The dictionary can have many thousands of entries, so it is compiled into an
+Aho-Corasick automaton that finds all phrases in one pass over the transcript,
+instead of running one replacement per entry. The cost of a transcript therefore
+depends on its length and not on the size of the dictionary.
+
+Classes:
+    PhraseReplacer: Replaces whole-word phrases from a dictionary in one pass.
+    PostProcessor: The transcript cleanup pipeline.
+"""
+
+import collections
+import json
+import re
+
+_BRACKETED = re.compile(r"\[.*?\]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class PhraseReplacer:
+    """
+    PhraseReplacer replaces dictionary phrases that occur as whole words.
+
+    Overlapping matches are resolved leftmost-longest: of all phrases found, the
+    one starting first wins, and of those starting at the same position the
+    longest. Matching ignores case unless `case_sensitive` is set, and the
+    replacement is inserted exactly as given.
+    """
+
+    def __init__(self, replacements: dict[str, str], case_sensitive: bool = False):
+        """
+        Compile the dictionary into an Aho-Corasick automaton.
+
+        Args:
+            replacements (dict[str, str]): Phrase to replacement.
+            case_sensitive (bool): Match the phrases' case exactly.
+        """
+        self.case_sensitive = case_sensitive
+        self._goto = [{}]
+        self._fail = [0]
+        self._depth = [0]
+        # replacement of the phrase ending at a node, None if no phrase ends there
+        self._value = [None]
+        # nearest node on the fail chain where a phrase ends, 0 if there is none
+        self._output = [0]
+
+        for phrase, replacement in replacements.items():
+            phrase = _WHITESPACE.sub(" ", phrase).strip()
+            if phrase:
+                self._insert(phrase if case_sensitive else phrase.lower(), replacement)
+        self._link()
+
+    def __len__(self):
+        return sum(value is not None for value in self._value)
+
+    def apply(self, text: str) -> str:
+        """
+        Replace all dictionary phrases in a text.
+
+        Args:
+            text (str): The text to correct.
+
+        Returns:
+            str: The text with every matched phrase replaced.
+        """
+        haystack = text if self.case_sensitive else _lower_preserving_length(text)
+        goto, fail, depth, value, output = self._goto, self._fail, self._depth, self._value, self._output
+
+        matches = []
+        state = 0
+        for end, char in enumerate(haystack, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            node = state if value[state] is not None else output[state]
+            while node:
+                start = end - depth[node]
+                if _is_boundary(text, start - 1) and _is_boundary(text, end):
+                    matches.append((start, end, node))
+                node = output[node]
+        if not matches:
+            return text
+
+        matches.sort(key=lambda m: (m[0], -m[1]))
+        parts = []
+        position = 0
+        for start, end, node in matches:
+            if start < position:
+                continue
+            parts.append(text[position:start])
+            parts.append(value[node])
+            position = end
+        parts.append(text[position:])
+        return "".join(parts)
+
+    def _insert(self, phrase, replacement):
+        state = 0
+        for char in phrase:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._depth.append(self._depth[state] + 1)
+                self._value.append(None)
+                self._output.append(0)
+                self._goto[state][char] = next_state
+            state = next_state
+        self._value[state] = replacement
+
+    def _link(self):
+        # breadth-first, so the fail target of every node is linked before the node itself
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = target if self._value[target] is not None else self._output[target]
+                queue.append(child)
+
+
+class PostProcessor:
+    """
+    PostProcessor turns raw whisper output into the text that is typed.
+
+    Steps, in order: remove bracketed tokens (unless `remove_brackets` is off),
+    collapse whitespace runs into single spaces and strip the ends, and apply the
+    phrase dictionary, if any.
+    """
+
+    def __init__(self, remove_brackets: bool = True, replacer: PhraseReplacer | None = None):
+        self.remove_brackets = remove_brackets
+        self.replacer = replacer
+
+    @staticmethod
+    def from_config(config: dict) -> "PostProcessor":
+        replacements = dict(config.get("replacements", {}))
+        if config.get("replacements_path") is not None:
+            replacements.update(load_replacements(config["replacements_path"]))
+        replacer = None
+        if replacements:
+            replacer = PhraseReplacer(replacements, config.get("case_sensitive", False))
+            print(f"Loaded {len(replacer)} phrase replacements")
+        return PostProcessor(config.get("remove_brackets", True), replacer)
+
+    def process(self, text: str) -> str:
+        """
+        Clean up a transcript.
+
+        Args:
+            text (str): The raw transcript.
+
+        Returns:
+            str: The cleaned transcript, empty if nothing is left.
+        """
+        if self.remove_brackets:
+            text = _BRACKETED.sub("", text)
+        text = _WHITESPACE.sub(" ", text).strip()
+        if self.replacer is not None:
+            text = self.replacer.apply(text)
+        return text
+
+
+def load_replacements(path: str) -> dict[str, str]:
+    """
+    Load a phrase dictionary.
+
+    Args:
+        path (str): A JSON object of phrase to replacement, or a text file with one
+            tab-separated phrase and replacement per line. Lines starting with `#` are ignored.
+
+    Returns:
+        dict[str, str]: Phrase to replacement.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        replacements = {}
+        for line_number, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            if "\t" not in line:
+                raise ValueError(f"{path}:{line_number}: expected a phrase and a replacement separated by a tab")
+            phrase, replacement = line.split("\t", 1)
+            replacements[phrase] = replacement
+        return replacements
+
+
+def _is_boundary(text, index):
+    return index < 0 or index >= len(text) or not (text[index].isalnum() or text[index] == "_")
+
+
+def _lower_preserving_length(text):
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # a few characters lower-case to more than one, which would shift the match positions
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
@@ -1,68 +1,180 @@
 """
 This module contains the Recorder class, which is responsible for capturing audio
-from the default recording device, saving it as a wave file, and initiating
-transcription.
+from the default recording device and handing it to the transcriber.
 
-The module uses PyAudio for audio capture and the wave module for saving audio data.
-It also interacts with a transcriber object to convert the recorded audio to text.
+The module uses PyAudio for audio capture through the sources in `osx_echo.audio_source`.
+The recorded PCM samples are collected in an AudioBuffer, which spills long recordings
+to disk, and submitted without copying to a job scheduler, which has them transcribed
+and typed in order.
 """
 
+import json
+import os
 import threading
-from wave import Wave_write
-
-import pyaudio
+import time
 
+from .audio_buffer import AudioBuffer
+from .audio_source import ContinuousCapture, PyAudioSource
 from .config import LanguageConfig
-from .constants import RECORDING_FILE_NAME
 
 class Recorder:
     """
-    Recorder is responsible for grabbing audio from the default recording device,
-    saving it as a wave file, and calling a transcriber to convert the audio to text.
+    Recorder is responsible for grabbing audio from the default recording device
+    and submitting it to a job scheduler that converts the audio to text.
 
     The recording process runs in a separate thread to allow for non-blocking operation.
 
+    With `always_open` capture the input stream is opened once and kept open on a
+    capture thread, and every recording starts with `pre_roll_s` seconds of audio
+    from before the trigger.
+
     TODO: Handle multiple audio devices and allow user to select one.
     """
 
-    def __init__(self, transcriber, input_device_name):
+    def __init__(self, scheduler, input_device_name, capture_config: dict | None = None, audio_source=None):
         """
         Initialize the Recorder.
 
         Args:
-            transcriber: An object responsible for transcribing audio.
+            scheduler (JobScheduler): Queues recorded audio for transcription.
             input_device_name (str): exact name of the input device to use.
+            capture_config (dict): optional `always_open`, `pre_roll_s`, `ring_buffer_s`, `spill_after_s`,
+                `spill_dir`, `native_rate` and `device_cache_path` settings.
+            audio_source: source to record from instead of the input device, e.g. a SyntheticSource.
 
         Note:
-            This method also prints information about available audio devices.
+            The input device is looked up and an always-open capture is started on a
+            background thread, so PortAudio initialization does not delay startup.
+            The first recording waits for it if necessary.
         """
+        capture_config = capture_config if capture_config is not None else {}
+        self.capture_config = capture_config
         self.is_recording = False
-        self.transcriber = transcriber
+        self.scheduler = scheduler
+        self.input_device_name = input_device_name
         self.input_device_index = None
         self.language_config = None
+        self.pre_roll_s = capture_config.get("pre_roll_s", 0.3)
+        self.ring_buffer_s = capture_config.get("ring_buffer_s", 2.0)
+        self.device_cache_path = os.path.expanduser(
+            capture_config.get("device_cache_path", "~/.cache/osx_echo/devices.json"))
+        self.last_first_frame_latency_s = None
+        self.audio_source = audio_source
+        self.capture = None
+        # called with the trace of a recording that an audio error ended, from the recording thread
+        self.on_error = None
+        self._audio_error = None
 
-        p = pyaudio.PyAudio()
-        api_info = p.get_host_api_info_by_index(0)
-        for idx in range(api_info.get('deviceCount')):
-            device_info = (p.get_device_info_by_host_api_device_index(0, idx))
-            print(f"Device {device_info["index"]}: {device_info["name"]}")
-            if device_info['name'] == input_device_name:
-                self.input_device_index = device_info['index']
+        if audio_source is None:
+            self._audio_init = threading.Thread(target=self._init_audio, daemon=True)
+            self._audio_init.start()
+        else:
+            self._audio_init = None
+            if capture_config.get("always_open", False):
+                self.capture = self._start_capture()
+
+    def wait_until_ready(self) -> bool:
+        """
+        Wait for the background audio initialization to finish.
+
+        Returns:
+            bool: True if the input device is usable.
+        """
+        if self._audio_init is not None:
+            self._audio_init.join()
+        if self._audio_error is not None:
+            print(f"Audio initialization failed: {self._audio_error}")
+            return False
+        return True
+
+    def _init_audio(self):
+        t_start = time.perf_counter()
+        try:
+            # warm the resampler's NumPy import here rather than on the first recording
+            from . import resample
 
-        print(f"Selected device index {self.input_device_index} [{input_device_name}]")
-        assert self.input_device_index is not None
+            self.input_device_index = _find_input_device(self.input_device_name, self.device_cache_path)
+            if self.capture_config.get("always_open", False):
+                self.capture = self._start_capture()
+        except Exception as e:
+            self._audio_error = e
+            return
+        print(f"Audio initialized in {(time.perf_counter() - t_start) * 1000:.0f} ms")
 
-    def start(self, language_config: LanguageConfig):
+    def set_input_device(self, input_device_name: str):
+        """
+        Switch to another input device for the next recording.
+
+        The device is looked up, and with `always_open` its capture started,
+        before anything changes, so a device that cannot be found or opened
+        leaves the current one in use. The previous capture is stopped only once
+        the new one runs.
+
+        Args:
+            input_device_name (str): exact name of the input device to use.
+
+        Raises:
+            ValueError: If no input device has that name.
+        """
+        if self.audio_source is not None or input_device_name == self.input_device_name:
+            return
+        self.wait_until_ready()
+        input_device_index = _find_input_device(input_device_name, self.device_cache_path)
+        capture = None
+        if self.capture_config.get("always_open", False):
+            capture = self._start_capture(input_device_index)
+        previous_capture = self.capture
+        self.capture = capture
+        self.input_device_index = input_device_index
+        self.input_device_name = input_device_name
+        self._audio_error = None
+        if previous_capture is not None:
+            previous_capture.stop()
+
+    def _device_source(self, input_device_index=None):
+        if input_device_index is None:
+            input_device_index = self.input_device_index
+        return PyAudioSource(input_device_index, native_rate=self.capture_config.get("native_rate", True))
+
+    def _start_capture(self, input_device_index=None):
+        source = self.audio_source if self.audio_source is not None else self._device_source(input_device_index)
+        capture = ContinuousCapture(source, self.ring_buffer_s)
+        capture.start()
+        return capture
+
+    def start(self, language_config: LanguageConfig, trace=None):
         """
         Start the recording process in a new thread.
 
         This method sets the recording flag to True and spawns a new thread
         that runs the _recording method.
+
+        Args:
+            language_config (LanguageConfig): language configuration to use for transcription.
+            trace (Trace): latency trace of this dictation, may be None.
+
+        Returns:
+            bool: True if the recording started, False if it is already recording or audio could not be initialized.
         """
-        if not self.is_recording:
-            self.is_recording = True
-            thread = threading.Thread(target=lambda: self._recording(language_config))
-            thread.start()
+        if self.is_recording or not self.wait_until_ready():
+            return False
+        if self.capture is not None and self.capture.error is not None:
+            print(f"Reopening the input device after a capture error: {self.capture.error}")
+            try:
+                self.capture.start()
+            except Exception as e:
+                print(f"Could not reopen the input device: {e}")
+                return False
+        self.is_recording = True
+        trigger_time = time.perf_counter()
+        if self.capture is not None:
+            # subscribe right away so the pre-roll ends at the trigger, not when the thread starts
+            source = self.capture.subscribe(self.pre_roll_s)
+        else:
+            source = self.audio_source if self.audio_source is not None else self._device_source()
+        thread = threading.Thread(target=lambda: self._recording(source, language_config, trigger_time, trace))
+        thread.start()
+        return True
 
     def stop(self):
         """
@@ -74,50 +186,166 @@ class Recorder:
         self.is_recording = False
         self.language_config = None
 
-    def _recording(self, language_config: LanguageConfig):
+    def shutdown(self):
+        """
+        Stop the persistent capture thread, if any.
+        """
+        if self.capture is not None:
+            self.capture.stop()
+
+    def _recording(self, source, language_config: LanguageConfig, trigger_time: float, trace=None):
         """
         Internal method to handle the recording process.
 
         This method runs in a separate thread and captures audio until `is_recording`
-        is set to False. It then saves the recorded audio as a wave file and
-        initiates the transcription process.
+        is set to False. It then submits the recorded PCM samples for transcription.
+        Recordings longer than `spill_after_s` are kept in a memory-mapped temporary file.
+
+        If the language has streaming enabled, the audio is cut into segments at
+        pauses and each segment is submitted while recording continues.
 
-        The audio is recorded with the following parameters:
+        The audio is delivered by the source with the following parameters,
+        converted from the device's native format if necessary:
         - Format: 16-bit PCM
         - Channels: 1 (mono)
         - Sample rate: 16000 Hz
 
         Args:
+            source: The audio source to record from.
             language_config (LanguageConfig): language configuration to use for transcription.
+            trigger_time (float): `time.perf_counter()` when the recording was triggered.
+            trace (Trace): latency trace of this dictation, may be None.
         """
         self.is_recording = True
-        frames_per_buffer = 1024
-        p = pyaudio.PyAudio()
-        stream = p.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=16000,
-            input=True,
-            frames_per_buffer=frames_per_buffer,
-            input_device_index=self.input_device_index
-        )
-
-        frames = []
-        while self.is_recording:
-            data = stream.read(frames_per_buffer)
-            frames.append(data)
-
-        stream.stop_stream()
-        stream.close()
+        try:
+            source.open()
+        except Exception as e:
+            self._end_on_error(e, trace)
+            return
+        if trace is not None:
+            trace.mark("stream_open")
+
+        if language_config.streaming is not None:
+            self._recording_streaming(source, language_config, trigger_time, trace)
+            return
+
+        buffer = AudioBuffer.from_config(self.capture_config)
+        try:
+            while self.is_recording:
+                buffer.write(source.read())
+        except OSError as e:
+            self._end_on_error(e, trace)
+
+        source.close()
+        buffer.write(source.drain())
+        self._report_first_frame(source, trigger_time, trace)
+
+        audio_data = buffer.getbuffer()
+        if trace is not None:
+            trace.mark("audio_ready")
+
+        # daisy chain the transcriber analyze the audio and type result
+        self.scheduler.submit(audio_data, language_config, trace=trace)
+
+    def _recording_streaming(self, source, language_config: LanguageConfig, trigger_time: float, trace=None):
+        """
+        Capture audio and transcribe it segment by segment while recording.
+
+        Only the final segment carries the latency trace, since it determines the
+        time from releasing the trigger to the end of typing.
+
+        Args:
+            source: The open audio source.
+            language_config (LanguageConfig): language configuration to use for transcription.
+            trigger_time (float): `time.perf_counter()` when the recording was triggered.
+            trace (Trace): latency trace of this dictation, may be None.
+        """
+        from .streaming import Segmenter
+
+        segmenter = Segmenter.from_config(language_config.streaming)
+        group = self.scheduler.new_group()
+        try:
+            while self.is_recording:
+                segment = segmenter.feed(source.read())
+                if segment is not None:
+                    self.scheduler.submit(segment, language_config, group)
+        except OSError as e:
+            self._end_on_error(e, trace)
+
+        source.close()
+        tail = source.drain()
+        if tail:
+            segment = segmenter.feed(tail)
+            if segment is not None:
+                self.scheduler.submit(segment, language_config, group)
+        self._report_first_frame(source, trigger_time, trace)
+
+        segment = segmenter.flush()
+        if trace is not None:
+            trace.mark("audio_ready")
+        if segment is not None:
+            self.scheduler.submit(segment, language_config, group, trace=trace)
+
+    def _end_on_error(self, error, trace):
+        # the audio recorded so far is still transcribed, and the next start reopens the device
+        print(f"Recording ended early: {error}")
+        self.is_recording = False
+        if self.on_error is not None:
+            self.on_error(trace)
+
+    def _report_first_frame(self, source, trigger_time, trace):
+        if source.first_frame_time is None:
+            return
+        if trace is not None:
+            trace.mark("first_frame", source.first_frame_time)
+        self.last_first_frame_latency_s = source.first_frame_time - trigger_time
+        print(f"First frame captured {self.last_first_frame_latency_s * 1000:.0f} ms after trigger")
+
+
+def _find_input_device(input_device_name, cache_path):
+    # imported here so that recording from other sources works without PortAudio
+    import pyaudio
+
+    cache = _load_device_cache(cache_path)
+    p = pyaudio.PyAudio()
+    input_device_index = None
+    try:
+        cached_index = cache.get(input_device_name)
+        # indices change when devices are plugged in or out, so the cached one must still have the same name
+        if cached_index is not None and cached_index < p.get_device_count():
+            if p.get_device_info_by_index(cached_index)["name"] == input_device_name:
+                print(f"Selected cached device index {cached_index} [{input_device_name}]")
+                return cached_index
+
+        api_info = p.get_host_api_info_by_index(0)
+        for idx in range(api_info.get('deviceCount')):
+            device_info = (p.get_device_info_by_host_api_device_index(0, idx))
+            print(f"Device {device_info["index"]}: {device_info["name"]}")
+            if device_info['name'] == input_device_name:
+                input_device_index = device_info['index']
+    finally:
         p.terminate()
 
-        audio_data = b"".join(frames)
-        w = Wave_write(RECORDING_FILE_NAME)
-        w.setnchannels(1)
-        w.setsampwidth(p.get_sample_size(pyaudio.paInt16))
-        w.setframerate(16000)
-        w.writeframes(audio_data)
-        w.close()
+    print(f"Selected device index {input_device_index} [{input_device_name}]")
+    if input_device_index is None:
+        raise ValueError(f"Input device {input_device_name} not found")
+    cache[input_device_name] = input_device_index
+    _save_device_cache(cache_path, cache)
+    return input_device_index
+
+
+def _load_device_cache(cache_path):
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
 
-        # daisy chain the transcriber analyze the wav file and type result
-        self.transcriber.transcribe(RECORDING_FILE_NAME, language_config)
+def _save_device_cache(cache_path, cache):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        print(f"Could not write device cache {cache_path}: {e}")
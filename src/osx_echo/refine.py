@@ -0,0 +1,135 @@
+"""
+This module implements draft-then-refine dictation.
+
+A language with a `refine_model_path` is first transcribed and typed with its fast
+`whisper_model_path`. The same audio is then transcribed again with the larger refine
+model in the background, and if the result differs, the typed draft is patched in
+place with the fewest keystrokes.
+
+The patch can only be applied while the draft is still the last text osx-echo typed
+and within `max_delay_s` of typing it, otherwise the user has moved on and editing
+the text behind the cursor would do more harm than good.
+
+Classes:
+    Edit: Backspaces and text that turn the draft into the refined text.
+    Refiner: Runs refinements in the background and keeps statistics.
+"""
+
+import queue
+import threading
+import time
+
+from .config import LanguageConfig
+
+
+class Edit:
+    """
+    Edit describes a patch applied at the end of the typed text.
+
+    Attributes:
+        backspaces (int): Number of characters to delete before the cursor.
+        text (str): Text to type afterwards.
+    """
+
+    def __init__(self, backspaces: int, text: str):
+        self.backspaces = backspaces
+        self.text = text
+
+    @property
+    def keystrokes(self) -> int:
+        return self.backspaces + len(self.text)
+
+
+def plan_edit(old: str, new: str) -> Edit:
+    """
+    Plan the edit with the fewest keystrokes that turns `old` into `new` with the cursor after `old`.
+
+    Only keeping the common prefix is optimal: reaching a change in the middle of
+    the text needs one arrow key per character to the left and one back to the
+    right, which costs exactly as much as deleting and retyping those characters.
+
+    Args:
+        old (str): The typed text.
+        new (str): The text it should become.
+
+    Returns:
+        Edit: The edit to apply.
+    """
+    prefix = 0
+    for a, b in zip(old, new):
+        if a != b:
+            break
+        prefix += 1
+    return Edit(len(old) - prefix, new[prefix:])
+
+
+class Refiner:
+    """
+    Refiner re-transcribes typed drafts with the refine model and patches the text.
+
+    Attributes:
+        stats (dict): Counts of `refined`, `changed`, `applied` and `stale` refinements
+            and the total `keystrokes` spent on patches.
+    """
+
+    def __init__(self, transcriber, max_delay_s: float = 5.0):
+        """
+        Initialize the Refiner and start its worker thread.
+
+        Args:
+            transcriber: The Transcriber that typed the drafts.
+            max_delay_s (float): Longest time after typing the draft at which a patch is still applied.
+        """
+        self.transcriber = transcriber
+        self.max_delay_s = max_delay_s
+        self.stats = {"refined": 0, "changed": 0, "applied": 0, "stale": 0, "keystrokes": 0}
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, audio_data: bytes, language_config: LanguageConfig, draft: str, output_seq: int):
+        """
+        Queue a typed draft for refinement.
+
+        Args:
+            audio_data (bytes): The audio the draft was transcribed from.
+            language_config (LanguageConfig): language configuration with a `refine_model_path`.
+            draft (str): The cleaned transcript of the draft.
+            output_seq (int): The transcriber's `output_seq` right after typing the draft.
+        """
+        self._queue.put((audio_data, language_config, draft, output_seq, time.perf_counter()))
+
+    @property
+    def change_rate(self) -> float:
+        """
+        Fraction of refinements that changed the text.
+        """
+        return self.stats["changed"] / self.stats["refined"] if self.stats["refined"] else 0.0
+
+    def _run(self):
+        while True:
+            audio_data, language_config, draft, output_seq, typed_time = self._queue.get()
+            try:
+                refined = self.transcriber.transcribe_clean(audio_data, language_config,
+                                                            model_path=language_config.refine_model_path)
+            except Exception as e:
+                print(f"Refinement failed: {e}")
+                continue
+
+            self.stats["refined"] += 1
+            if refined == draft:
+                continue
+            self.stats["changed"] += 1
+
+            edit = None
+            if time.perf_counter() - typed_time <= self.max_delay_s:
+                edit = self.transcriber.patch_last_typed(output_seq, refined)
+            if edit is None:
+                self.stats["stale"] += 1
+                print("Refined text differs but the draft is no longer the last output, not patching")
+                continue
+
+            self.stats["applied"] += 1
+            self.stats["keystrokes"] += edit.keystrokes
+            print(f"Refined draft with {edit.backspaces} backspaces and {len(edit.text)} characters, "
+                  f"{self.change_rate:.0%} of refinements changed the text")
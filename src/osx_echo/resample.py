@@ -0,0 +1,122 @@
+"""
+This module converts captured audio to the 16 kHz mono that whisper expects.
+
+Many microphones run at 44.1 or 48 kHz, often in stereo, and opening them at
+16 kHz mono either fails or leaves the conversion to the OS. The input device is
+therefore opened at its native format and the Resampler downmixes and resamples
+chunk by chunk with a polyphase windowed-sinc filter in NumPy. It keeps the tail
+of the previous chunk as filter context, so streamed chunks give the same result
+as converting the whole recording at once.
+
+Classes:
+    Resampler: Streaming downmix and rational-ratio resampler for 16-bit PCM.
+"""
+
+import math
+
+import numpy as np
+
+from .constants import SAMPLE_RATE
+
+
+class Resampler:
+    """
+    Resampler turns interleaved 16-bit PCM at any rate and channel count into 16-bit mono at `output_rate`.
+
+    The ratio is reduced to `up / down`. Output sample `n` lies at input position
+    `n * down / up`, and is computed from the `2 * half_width` input samples around
+    it with the filter phase for its fractional part. The filter is a Kaiser-windowed
+    sinc with its cutoff just below the lower of the two Nyquist frequencies.
+    """
+
+    def __init__(self, input_rate: int, channels: int = 1, output_rate: int = SAMPLE_RATE, zero_crossings: int = 16,
+                 rolloff: float = 0.94, kaiser_beta: float = 8.6):
+        """
+        Initialize the Resampler and precompute its filter bank.
+
+        Args:
+            input_rate (int): Sample rate of the input.
+            channels (int): Interleaved channels of the input, averaged into one.
+            output_rate (int): Sample rate of the output.
+            zero_crossings (int): Zero crossings of the sinc on either side, longer filters attenuate aliases more.
+            rolloff (float): Cutoff as a fraction of the lower Nyquist frequency.
+            kaiser_beta (float): Shape of the Kaiser window.
+        """
+        self.input_rate = input_rate
+        self.channels = channels
+        self.output_rate = output_rate
+        divisor = math.gcd(input_rate, output_rate)
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+        self.passthrough = self.up == self.down and channels == 1
+
+        # cutoff in cycles per input sample, below the Nyquist frequency of the lower rate
+        cutoff = rolloff * min(1.0, self.up / self.down) / 2
+        self.half_width = max(1, math.ceil(zero_crossings / (2 * cutoff)))
+        taps = np.arange(2 * self.half_width)
+        # distance of every tap from the output position, for every phase
+        offsets = (np.arange(self.up)[:, None] / self.up) + (self.half_width - 1 - taps)[None, :]
+        window = np.kaiser(2 * self.half_width + 1, kaiser_beta)
+        window = np.interp(offsets, np.arange(-self.half_width, self.half_width + 1), window)
+        self._filters = (2 * cutoff * np.sinc(2 * cutoff * offsets) * window).astype(np.float32)
+        self._taps = taps
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the stream state, e.g. before a new recording.
+        """
+        # left context of the first output sample is silence
+        self._history = np.zeros(self.half_width, dtype=np.float32)
+        self._history_start = -self.half_width
+        self._next_output = 0
+        self._input_samples = 0
+
+    def process(self, chunk: bytes) -> bytes:
+        """
+        Convert the next chunk of the stream.
+
+        Args:
+            chunk (bytes): Interleaved 16-bit PCM at `input_rate`.
+
+        Returns:
+            bytes: 16-bit mono PCM at `output_rate`, all samples whose filter context is complete.
+        """
+        if self.passthrough:
+            return chunk
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        mono = samples.reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+        self._input_samples += len(mono)
+        self._history = np.concatenate((self._history, mono))
+        return self._convert(self._history_start + len(self._history) - 1)
+
+    def flush(self) -> bytes:
+        """
+        Convert the rest of the stream, padding it with silence.
+
+        Returns:
+            bytes: The remaining 16-bit mono PCM at `output_rate`.
+        """
+        if self.passthrough:
+            return b""
+        self._history = np.concatenate((self._history, np.zeros(self.half_width, dtype=np.float32)))
+        output_samples = -(-self._input_samples * self.up // self.down)
+        return self._convert(self._history_start + len(self._history) - 1, output_samples)
+
+    def _convert(self, last_available, output_limit=None):
+        # output n needs input samples up to floor(n * down / up) + half_width
+        end = ((last_available - self.half_width + 1) * self.up + self.down - 1) // self.down
+        if output_limit is not None:
+            end = min(end, output_limit)
+        n = np.arange(self._next_output, max(self._next_output, end))
+        positions = n * self.down
+        first = positions // self.up - self.half_width + 1 - self._history_start
+        windows = self._history[first[:, None] + self._taps[None, :]]
+        out = np.einsum("ij,ij->i", windows, self._filters[positions % self.up])
+
+        self._next_output += len(n)
+        next_first = (self._next_output * self.down) // self.up - self.half_width + 1
+        drop = max(0, next_first - self._history_start)
+        self._history = self._history[drop:]
+        self._history_start += drop
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16).tobytes()
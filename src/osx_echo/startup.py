@@ -1,49 +1,214 @@
-import os
-import json
+import atexit
+import contextlib
+import time
 
-from pynput import keyboard
-
-from osx_echo.app import App
-from osx_echo.recorder import Recorder
-from osx_echo.transcriber import Transcriber
-from osx_echo.listeners import build_key_listener, build_listener_multiplexer
 from osx_echo.config import Config
 
 
-def start_app():
+class StartupProfiler:
+    """
+    StartupProfiler measures the import and initialization time of every startup stage.
+
+    Heavy modules are imported inside the stages that need them, so their import
+    time is attributed to that stage.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages = []
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Time the enclosed block as one stage.
+
+        Args:
+            name (str): Name of the stage in the report.
+        """
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - t_start))
+
+    def report(self):
+        """
+        Print the time of every stage and the total, if profiling is enabled.
+        """
+        if not self.enabled:
+            return
+        print("Startup profile:")
+        for name, duration in self.stages:
+            print(f"  {name:<28} {duration * 1000:>8.1f} ms")
+        print(f"  {'total until UI':<28} {(time.perf_counter() - self._start) * 1000:>8.1f} ms")
+
+
+def start_app(profile_startup: bool = False):
     """
     Orchestrates the startup of the OSX Echo application.
 
     This function performs the following steps:
-    1. Loads environment variables from .env file
-    2. Initializes the configuration
-    3. Sets up the Whisper-based transcriber
-    4. Creates a recorder instance
-    5. Initializes the main DictationApp
-    6. Configures and starts the keyboard listener
-    7. Runs the application
+    1. Initializes the configuration
+    2. Sets up the Whisper-based transcriber
+    3. Creates a recorder instance, which initializes audio in the background
+    4. Initializes the main DictationApp
+    5. Configures and starts the keyboard listener
+    6. Runs the application
 
-    The function uses configuration values from the Config class and environment
-    variables to set up various components of the application, including the
-    Whisper model paths, input device index, and listener configuration.
+    Optional components are only imported when they are configured, and PortAudio
+    is initialized off the startup path, so the menu bar icon appears as early as
+    possible.
 
-    No parameters or return values.
+    Args:
+        profile_startup (bool): Print the import and initialization time of every stage.
 
     Raises:
         Potential exceptions from component initialization or configuration errors.
     """
-    config = Config.from_config_file("config.json")
+    profiler = StartupProfiler(profile_startup)
+
+    config_path = "config.json"
+    with profiler.stage("config"):
+        config = Config.from_config_file(config_path)
+
+    with profiler.stage("metrics"):
+        from osx_echo.metrics import Metrics
+
+        metrics = Metrics.from_config(config.get_metrics_config())
+        atexit.register(metrics.close)
+
+    vad_config = config.get_vad_config()
+    longform_config = config.get_longform_config()
+    with profiler.stage("transcriber"):
+        from osx_echo.constants import DEFAULT_BEAM_SIZE, DEFAULT_BEST_OF
+        from osx_echo.output import build_output_engine
+        from osx_echo.postprocess import PostProcessor
+        from osx_echo.transcriber import Transcriber
+        from osx_echo.whisper_output import SegmentFilter
+
+        voice_gate = None
+        if vad_config is not None:
+            from osx_echo.vad import VoiceGate
+
+            voice_gate = VoiceGate.from_config(vad_config)
+        longform = None
+        if longform_config is not None:
+            from osx_echo.longform import LongForm
+
+            longform = LongForm.from_config(longform_config)
+        in_process = None
+        if config.get_whisper_library_path() is not None:
+            from osx_echo.libwhisper import InProcessWhisper, LibWhisperError
+
+            try:
+                in_process = InProcessWhisper(config.get_whisper_library_path())
+            except LibWhisperError as e:
+                print(f"{e}, using the whisper.cpp executables")
+        governor = None
+        if config.get_governor_config() is not None:
+            from osx_echo.governor import Governor
+
+            governor = Governor.from_config(config.get_governor_config())
+        tuner = None
+        if config.get_tuning_config() is not None:
+            if in_process is not None or config.get_whisper_server_path() is not None:
+                # calibration measures the main executable, its choices do not carry over to a resident model
+                print("Latency tuning only applies to the whisper.cpp main executable, "
+                      "it is off with the in-process or server backend")
+            else:
+                from osx_echo.tuning import Tuner
+
+                tuner = Tuner.from_config(config.get_whisper_path(), config.get_tuning_config(), governor)
+        transcriber = Transcriber(config.get_whisper_path(), config.get_whisper_server_path(),
+                                  build_output_engine(config.get_output_config()), voice_gate, tuner, longform,
+                                  PostProcessor.from_config(config.get_postprocess_config()),
+                                  SegmentFilter.from_config(config.get_confidence_config()), in_process,
+                                  governor, config.get_decoding_config().get("beam_size", DEFAULT_BEAM_SIZE),
+                                  config.get_decoding_config().get("best_of", DEFAULT_BEST_OF))
+        atexit.register(transcriber.shutdown)
+        model_pool = None
+        resident_backend = in_process if in_process is not None else transcriber.server_pool
+        if config.get_model_pool_config() is not None and resident_backend is not None:
+            from osx_echo.model_pool import ModelPool
+
+            model_pool = ModelPool.from_config(resident_backend, config.get_model_pool_config())
+            transcriber.model_pool = model_pool
+
+    with profiler.stage("scheduler"):
+        from osx_echo.jobs import JobScheduler
+
+        refiner = None
+        if any(lc.refine_model_path is not None for lc in config.get_language_support()):
+            from osx_echo.refine import Refiner
+
+            refiner = Refiner(transcriber)
+        scheduler = JobScheduler.from_config(transcriber, config.get_jobs_config(), refiner)
+
+    with profiler.stage("recorder"):
+        from osx_echo.recorder import Recorder
+
+        recorder = Recorder(scheduler, config.get_input_device_name(), config.get_capture_config())
+        atexit.register(recorder.shutdown)
+
+    def reload(new_config, changed):
+        # everything that can fail runs before anything is replaced, so a bad config leaves the old one running
+        new_listeners = None
+        if "language_support" in changed:
+            new_listeners = [build_key_listener(dispatcher, language_config)
+                             for language_config in new_config.get_language_support()]
+        if "input_device_name" in changed:
+            recorder.set_input_device(new_config.get_input_device_name())
+        if new_listeners is not None:
+            listener_multiplexer.set_listeners(new_listeners)
+            app.set_language_support(new_config)
+            if warmup is not None:
+                warmup.language_configs = new_config.get_language_support()
+        restart_required = [name for name in changed if name not in ("input_device_name", "language_support")]
+        if restart_required:
+            print(f"Restart osx-echo to apply changes to {', '.join(restart_required)}")
+
+    with profiler.stage("app"):
+        from osx_echo.app import App
+        from osx_echo.config_watcher import ConfigWatcher
+
+        app = App(recorder, config, metrics, ConfigWatcher(config_path, config, reload))
+
+    warmup = None
+    if config.get_warmup_config().get("enabled", True):
+        with profiler.stage("warmup"):
+            from osx_echo.warmup import Warmup
+
+            warmup = Warmup.from_config(transcriber, config.get_language_support(), config.get_warmup_config(),
+                                        lambda: app.recording_in_progress or not scheduler.idle)
+
+    if tuner is not None:
+        # calibration competes with dictations for the cores, so every run waits until none is in progress
+        tuner.calibrate_in_background(config.get_language_support(),
+                                      lambda: app.recording_in_progress or not scheduler.idle)
+
+    with profiler.stage("listeners"):
+        from pynput import keyboard
+
+        from osx_echo.listeners import build_action_dispatcher, build_key_listener, build_listener_multiplexer
 
-    transcriber = Transcriber(config.get_whisper_path())
+        dispatcher = build_action_dispatcher(app, metrics)
+        listeners = [build_key_listener(dispatcher, language_config)
+                     for language_config in config.get_language_support()]
 
-    recorder = Recorder(transcriber, config.get_input_device_name())
-    app = App(recorder, config)
+        def prefetch(language_config):
+            if model_pool is not None:
+                model_pool.prefetch(language_config.whisper_model_path)
+            if warmup is not None:
+                warmup.record_use(language_config)
+        listener_multiplexer = build_listener_multiplexer(listeners, dispatcher, prefetch)
+        listener = keyboard.Listener(
+             on_press=listener_multiplexer.on_key_press, on_release=listener_multiplexer.on_key_release
+        )
+        listener.start()
 
-    listeners = [build_key_listener(app, language_config) for language_config in config.get_language_support()]
-    listener_multiplexer = build_listener_multiplexer(listeners)
-    listener = keyboard.Listener(
-         on_press=listener_multiplexer.on_key_press, on_release=listener_multiplexer.on_key_release
-    )
-    listener.start()
+    if warmup is not None:
+        warmup.start()
 
+    profiler.report()
     app.run()
@@ -0,0 +1,96 @@
+"""
+This module implements streaming transcription while the trigger is held.
+
+Instead of waiting for the trigger to be released, the live audio stream is cut
+into segments at pauses (or when a segment grows too long) and every finished
+segment is submitted to the job scheduler while recording continues, which types
+the segments in order. After release only the final segment remains to be transcribed.
+
+Classes:
+    Segmenter: Cuts a stream of PCM chunks into segments at pauses.
+"""
+
+import numpy as np
+
+from .constants import SAMPLE_RATE, SAMPLE_WIDTH
+
+
+class Segmenter:
+    """
+    Segmenter accumulates PCM chunks and decides where to cut segments.
+
+    A segment is finished when it is at least `min_segment_s` long and ends with
+    `pause_s` seconds of audio below `silence_rms`, or when it reaches
+    `max_segment_s`. Segments that never rise above `silence_rms` are dropped.
+    """
+
+    def __init__(self, pause_s: float = 0.6, min_segment_s: float = 2.0, max_segment_s: float = 15.0,
+                 silence_rms: float = 500.0):
+        """
+        Initialize the Segmenter.
+
+        Args:
+            pause_s (float): Length of silence that ends a segment.
+            min_segment_s (float): Minimum segment length before a pause may cut it.
+            max_segment_s (float): Length at which a segment is cut regardless of pauses.
+            silence_rms (float): RMS level of 16-bit samples below which a chunk counts as silence.
+        """
+        self.pause_s = pause_s
+        self.min_segment_s = min_segment_s
+        self.max_segment_s = max_segment_s
+        self.silence_rms = silence_rms
+        self._reset()
+
+    @staticmethod
+    def from_config(config: dict) -> "Segmenter":
+        return Segmenter(config.get("pause_s", 0.6), config.get("min_segment_s", 2.0),
+                         config.get("max_segment_s", 15.0), config.get("silence_rms", 500.0))
+
+    def feed(self, chunk: bytes) -> bytes | None:
+        """
+        Add a chunk of audio to the current segment.
+
+        Args:
+            chunk (bytes): 16 kHz mono 16-bit PCM samples.
+
+        Returns:
+            bytes | None: The finished segment if `chunk` completed one, otherwise None.
+        """
+        chunk_s = len(chunk) / (SAMPLE_WIDTH * SAMPLE_RATE)
+        self._chunks.append(chunk)
+        self._length_s += chunk_s
+        if _rms(chunk) < self.silence_rms:
+            self._silence_s += chunk_s
+        else:
+            self._silence_s = 0.0
+            self._had_speech = True
+
+        if self._length_s >= self.max_segment_s or (
+            self._length_s >= self.min_segment_s and self._silence_s >= self.pause_s
+        ):
+            return self.flush()
+        return None
+
+    def flush(self) -> bytes | None:
+        """
+        Finish the current segment.
+
+        Returns:
+            bytes | None: The segment audio, or None if it contained no speech.
+        """
+        segment = b"".join(self._chunks) if self._had_speech else None
+        self._reset()
+        return segment
+
+    def _reset(self):
+        self._chunks = []
+        self._length_s = 0.0
+        self._silence_s = 0.0
+        self._had_speech = False
+
+
+def _rms(chunk):
+    samples = np.frombuffer(chunk, dtype=np.int16).astype(np.float32)
+    if not len(samples):
+        return 0.0
+    return float(np.sqrt(np.mean(np.square(samples))))
@@ -1,99 +1,421 @@
 """
-This module provides functionality for transcribing audio files and simulating keyboard input.
+This module provides functionality for transcribing audio and simulating keyboard input.
 
 It contains the Transcriber class, which uses whisper.cpp to convert audio to text,
 and utility functions for typing out the transcribed content using keyboard simulation.
 
-The module relies on the pynput library for keyboard control and the subprocess module
-for running the whisper.cpp executable.
+The module relies on an output engine (see `osx_echo.output`) for keyboard control and
+the subprocess module for running the whisper.cpp executable. Audio is handed over in memory: the WAV data is
+piped to whisper's stdin and the timestamped segments are read back from its stdout. The
+full JSON output with token probabilities is read from a private temporary directory,
+since whisper.cpp cannot write it to stdout (see `osx_echo.whisper_output`).
 
 Classes:
     Transcriber: Handles audio transcription and text output via simulated typing.
 """
 
-import subprocess
-import time
+import concurrent.futures
+import contextlib
+import io
 import os
+import subprocess
 import re
-
-from pynput import keyboard
+import tempfile
+import threading
+import uuid
+from wave import Wave_write
 
 from .config import LanguageConfig
+from .constants import (CHANNELS, DEFAULT_BEAM_SIZE, DEFAULT_BEST_OF, DEFAULT_WHISPER_THREADS, SAMPLE_RATE,
+                        SAMPLE_WIDTH)
+from .libwhisper import LibWhisperError
+from .output import build_output_engine
+from .postprocess import PostProcessor
+from .refine import Edit, plan_edit
+from .whisper_output import SegmentFilter, TranscriptionResult, WhisperError, parse_output
+from .whisper_server import WhisperServerError, WhisperServerPool
+
+_BRACKETED = re.compile(r"\[.*?\]")
 
 class Transcriber:
     """
     Transcriber uses whisper.cpp to convert audio to text and types out the result.
 
-    This class encapsulates the functionality to transcribe audio files using
+    This class encapsulates the functionality to transcribe recorded audio using
     the whisper.cpp library and automatically type out the transcribed text
     using keyboard input simulation.
 
+    If a whisper.cpp server executable is configured, the audio is sent to a
+    long-lived server process that keeps the model loaded. The `main` executable
+    is kept as a fallback whenever the server cannot be used.
+
+    If libwhisper is configured, inference runs in this process instead, with
+    the model context kept loaded and the PCM samples passed without a WAV file.
+
+    Recordings long enough for `longform` are split at silences and transcribed
+    by several `main` processes in parallel instead.
+
     Attributes:
         whisper_path (str): Path to the whisper.cpp executable.
+        server_pool (WhisperServerPool): Resident servers, or None if not configured.
+        in_process (InProcessWhisper): In-process libwhisper backend, or None if not configured.
+        model_pool (ModelPool): Decides which models the resident backend keeps loaded, or None to keep all.
+        governor (Governor): Priority and shared thread budget of inference, or None to run at full priority.
+            In-process inference then runs on threads of its own, so the job workers that type keep their priority.
+        output_engine: The engine used to type out transcripts.
+        voice_gate (VoiceGate): Trims silence before transcription, or None to transcribe clips whole.
+        tuner (Tuner): Chooses model variant and thread count per clip, or None for the configured model.
+        longform (LongForm): Transcribes long recordings as parallel segments, or None to never split.
+        postprocessor (PostProcessor): Cleans up transcripts before they are typed.
+        segment_filter (SegmentFilter): Drops low-confidence and hallucinated segments, or None to keep all.
+        output_seq (int): Incremented whenever text is typed or patched.
+        beam_size (int): Beams of beam search on every backend, 1 to decode greedily.
+        best_of (int): Candidates sampled at a fallback temperature on every backend.
     """
 
-    def __init__(self, whisper_main_path=None):
+    def __init__(self, whisper_main_path=None, whisper_server_path=None, output_engine=None, voice_gate=None,
+                 tuner=None, longform=None, postprocessor=None, segment_filter=None, in_process=None, governor=None,
+                 beam_size=DEFAULT_BEAM_SIZE, best_of=DEFAULT_BEST_OF):
         assert whisper_main_path is not None
         self.whisper_main_path = whisper_main_path
+        self.beam_size = beam_size
+        self.best_of = best_of
+        self.server_pool = (WhisperServerPool(whisper_server_path, governor=governor, beam_size=beam_size,
+                                              best_of=best_of)
+                            if whisper_server_path is not None else None)
+        self.output_engine = output_engine if output_engine is not None else build_output_engine({})
+        self.voice_gate = voice_gate
+        self.tuner = tuner
+        self.longform = longform
+        self.postprocessor = postprocessor if postprocessor is not None else PostProcessor()
+        self.segment_filter = segment_filter if segment_filter is not None else SegmentFilter()
+        self.in_process = in_process
+        self.model_pool = None
+        self.governor = governor
+        self.output_seq = 0
+        self._inference_executor = None
+        if in_process is not None and governor is not None:
+            self._inference_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, governor.max_threads), thread_name_prefix="inference",
+                initializer=governor.configure_thread)
+        self._last_typed = ""
+        self._output_lock = threading.Lock()
 
-    def transcribe(self, audio_path: str, language_support: LanguageConfig):
+    def shutdown(self):
         """
-        Transcribe the given audio file and type out the result.
+        Stop any resident whisper.cpp server processes, free in-process models and stop the long-form workers.
+        """
+        if self.server_pool is not None:
+            self.server_pool.stop_all()
+        if self._inference_executor is not None:
+            self._inference_executor.shutdown(cancel_futures=True)
+        if self.in_process is not None:
+            self.in_process.unload_all()
+        if self.longform is not None:
+            self.longform.shutdown()
 
-        This method runs the whisper.cpp executable to transcribe the audio file,
-        reads the resulting text file, and then types out the content using
-        keyboard input simulation.
+    def transcribe(self, audio_data: bytes, language_support: LanguageConfig, separator: str = "", trace=None) -> bool:
+        """
+        Transcribe the given audio and type out the result.
 
         Args:
-            audio_path (str): Path to the audio file to be transcribed.
+            audio_data (bytes): Raw 16 kHz mono 16-bit PCM samples.
             language_support (LanguageSupport): Language support configuration.
+            separator (str): Text typed before the transcript, e.g. a space between streamed segments.
+            trace (Trace): Latency trace of the dictation, may be None.
+
+        Returns:
+            bool: True if any text was typed.
+
         Raises:
-            subprocess.CalledProcessError: If the whisper.cpp process fails.
+            WhisperError: If the whisper.cpp process fails.
+        """
+        return self.type_text(self.transcribe_clean(audio_data, language_support, trace), separator, trace)
+
+    def transcribe_clean(self, audio_data: bytes, language_support: LanguageConfig, trace=None,
+                         model_path: str | None = None) -> str:
+        """
+        Transcribe the given audio and return the cleaned transcript ready for typing.
+
+        If a voice gate is configured, silence is trimmed first and clips without
+        speech are dropped without starting whisper.
+
+        Args:
+            audio_data (bytes): Raw 16 kHz mono 16-bit PCM samples.
+            language_support (LanguageSupport): Language support configuration.
+            trace (Trace): Latency trace of the dictation, may be None.
+            model_path (str): Model to use instead of the configured or tuned one.
+
+        Returns:
+            str: The cleaned transcript, empty if the clip contained no speech.
+
+        Raises:
+            WhisperError: If the whisper.cpp process fails.
+        """
+        if self.voice_gate is not None:
+            audio_data, saved_s = self.voice_gate.process(audio_data)
+            if trace is not None:
+                trace.record("vad_saved", saved_s)
+            if audio_data is None:
+                return ""
+        content = self.postprocessor.process(self.transcribe_text(audio_data, language_support, trace, model_path))
+        if trace is not None:
+            trace.mark("cleanup")
+        return content
+
+    def type_text(self, text: str, separator: str = "", trace=None) -> bool:
+        """
+        Type out a cleaned transcript with the output engine.
+
+        Args:
+            text (str): The transcript to type.
+            separator (str): Text typed before the transcript if there is anything to type.
+            trace (Trace): Latency trace of the dictation, may be None.
+
+        Returns:
+            bool: True if any text was typed.
+        """
+        with self._output_lock:
+            typed = _type_content(self.output_engine, text, separator)
+            if typed:
+                self.output_seq += 1
+                self._last_typed = _typeable_text(text)
+        if trace is not None:
+            trace.mark("typed")
+        return typed
+
+    def patch_last_typed(self, output_seq: int, text: str) -> Edit | None:
+        """
+        Replace the most recently typed transcript with another one using the fewest keystrokes.
+
+        Args:
+            output_seq (int): The `output_seq` right after the transcript to replace was typed.
+            text (str): The cleaned transcript to replace it with.
+
+        Returns:
+            Edit | None: The applied edit, or None if something else has been typed since.
+        """
+        with self._output_lock:
+            if output_seq != self.output_seq:
+                return None
+            new_text = _typeable_text(text)
+            edit = plan_edit(self._last_typed, new_text)
+            self.output_engine.erase(edit.backspaces)
+            if edit.text:
+                self.output_engine.type(edit.text)
+            self.output_seq += 1
+            self._last_typed = new_text
+            return edit
+
+    def transcribe_text(self, audio_data: bytes, language_support: LanguageConfig, trace=None,
+                        model_path: str | None = None, threads: int | None = None) -> str:
         """
-        subprocess.run(
-            [
-                self.whisper_main_path,
-                "-m",
-                language_support.whisper_model_path,
-                "-f",
-                audio_path,
-                "-l",
-                language_support.language,
-                "-t",
-                "4",
-                "-otxt",
-            ],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+        Transcribe the given audio and return the raw transcript.
+
+        This method runs the in-process libwhisper backend if one is configured,
+        then tries the resident whisper.cpp server, and otherwise (or if both
+        fail) pipes the audio to the whisper.cpp executable and parses its segments. Long recordings are
+        transcribed in parallel segments with `longform`. Segments rejected by the
+        segment filter are left out.
+
+        Args:
+            audio_data (bytes): Raw 16 kHz mono 16-bit PCM samples.
+            language_support (LanguageSupport): Language support configuration.
+            trace (Trace): Latency trace of the dictation, may be None.
+            model_path (str): Model to use instead of the configured or tuned one.
+            threads (int): Inference threads instead of the default or tuned number.
+
+        Returns:
+            str: The transcript as produced by whisper.cpp.
+
+        Raises:
+            WhisperError: If the whisper.cpp process fails.
+        """
+        chosen_threads = DEFAULT_WHISPER_THREADS
+        if model_path is None and self.tuner is not None:
+            model_path, chosen_threads = self.tuner.choose(language_support,
+                                                           len(audio_data) / (SAMPLE_WIDTH * SAMPLE_RATE))
+        elif model_path is None:
+            model_path = language_support.whisper_model_path
+        threads = threads if threads is not None else chosen_threads
+
+        if self.longform is not None and self.longform.applies(audio_data):
+            if trace is not None:
+                trace.mark("whisper_start")
+            content = self.longform.transcribe(
+                audio_data, lambda segment, segment_threads: self._filter(self._run_main(
+                    model_path, language_support.language, segment_threads, encode_wav(segment))))
+            if trace is not None:
+                trace.mark("whisper_end")
+            return content
+
+        # the resident model stays pinned in the pool until inference on it has finished
+        with self._acquire_model(model_path, trace):
+            result = None
+            if self.in_process is not None:
+                if trace is not None:
+                    trace.mark("whisper_start")
+                try:
+                    result = self._run_in_process(audio_data, model_path, language_support.language, threads)
+                except LibWhisperError as e:
+                    print(f"{e}, falling back to {self.whisper_main_path}")
+
+            if result is None:
+                wav_data = encode_wav(audio_data)
+                if trace is not None:
+                    trace.mark("wav_encoded")
+                    trace.mark("whisper_start")
+
+                if self.server_pool is not None:
+                    try:
+                        with self._inference_threads(self.server_pool.threads):
+                            result = self._transcribe_server(wav_data, language_support, model_path)
+                    except WhisperServerError as e:
+                        print(f"{e}, falling back to {self.whisper_main_path}")
+
+                if result is None:
+                    result = self._run_main(model_path, language_support.language, threads, wav_data)
+        if trace is not None:
+            trace.mark("whisper_end")
+            for name, duration in result.timings_s.items():
+                trace.record(f"whisper_{name}", duration)
+        return self._filter(result)
+
+    def _acquire_model(self, model_path, trace):
+        if self.model_pool is None:
+            return contextlib.nullcontext()
+        return self.model_pool.acquire(model_path, trace)
+
+    def _run_in_process(self, audio_data, model_path, language, threads):
+        def run():
+            with self._inference_threads(threads) as granted:
+                return self.in_process.transcribe(audio_data, model_path, language, granted, self.beam_size,
+                                                  self.best_of)
+
+        if self._inference_executor is None:
+            return run()
+        # the governor lowers the priority of the inference threads for good, and the calling job worker types
+        return self._inference_executor.submit(run).result()
+
+    def _run_main(self, model_path, language, threads, wav_data):
+        with self._inference_threads(threads) as granted:
+            return run_whisper(self.whisper_main_path, model_path, language, granted, wav_data, self.governor,
+                               self.beam_size, self.best_of)
+
+    def _inference_threads(self, threads):
+        if self.governor is None:
+            return contextlib.nullcontext(threads)
+        return self.governor.inference_threads(threads)
+
+    def _filter(self, result):
+        return self.segment_filter.apply(result) if self.segment_filter is not None else result.text
+
+    def _transcribe_server(self, wav_data, language_support, model_path):
+        server = self.server_pool.get(model_path)
+        return server.inference(wav_data, language_support.language, f"recording-{uuid.uuid4().hex}.wav")
+
+
+def run_whisper(whisper_main_path: str, model_path: str, language: str, threads: int,
+                wav_data: bytes, governor=None, beam_size: int | None = None,
+                best_of: int | None = None) -> TranscriptionResult:
+    """
+    Run the whisper.cpp executable on in-memory WAV data.
+
+    Args:
+        whisper_main_path (str): Path to the whisper.cpp `main` executable.
+        model_path (str): Path to the ggml model.
+        language (str): Whisper language code.
+        threads (int): Number of inference threads.
+        wav_data (bytes): Complete WAV file contents, piped to whisper's stdin.
+        governor (Governor): Runs the process at a lower priority and on the inference cores, may be None.
+        beam_size (int): Beams of beam search, None for the executable's default.
+        best_of (int): Candidates sampled at a fallback temperature, None for the executable's default.
+
+    Returns:
+        TranscriptionResult: The segments with timestamps and confidences, and whisper's timings.
+
+    Raises:
+        WhisperError: If the whisper.cpp process fails, with the end of its stderr.
+    """
+    with tempfile.TemporaryDirectory(prefix="osx_echo-") as tmp_dir:
+        output_base = os.path.join(tmp_dir, "transcript")
+        args = [
+            whisper_main_path,
+            "-m",
+            model_path,
+            "-f",
+            "-",
+            "-l",
+            language,
+            "-t",
+            str(threads),
+            "-ojf",
+            "-of",
+            output_base,
+        ]
+        args += _decoding_args(beam_size, best_of)
+        if governor is not None:
+            args = governor.command(args)
+        process = subprocess.run(
+            args,
+            input=wav_data,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
         )
+        stderr = process.stderr.decode("utf-8", errors="replace")
+        if process.returncode != 0:
+            raise WhisperError(process.returncode, stderr)
+        json_text = None
+        if os.path.exists(output_base + ".json"):
+            with open(output_base + ".json", "rb") as f:
+                json_text = f.read().decode("utf-8", errors="replace")
+    return parse_output(process.stdout.decode("utf-8", errors="replace"), stderr, json_text)
 
-        with open(audio_path + ".txt", "r", encoding="utf-8") as f:
-            content = f.read()
-            _type_content(_clean_content(content))
 
-        # cleanup the audio file and the text file
-        os.remove(audio_path)
-        os.remove(audio_path + ".txt")
+def _decoding_args(beam_size, best_of):
+    args = []
+    if beam_size is not None:
+        args += ["-bs", str(beam_size)]
+    if best_of is not None:
+        args += ["-bo", str(best_of)]
+    return args
 
 
-def _clean_content(content):
+def encode_wav(audio_data: bytes) -> bytes:
     """
-    Clean the content by stripping surrounding whitespace, converting
-    newlines to spaces and reducing multiple spaces to a single space.
+    Wrap raw PCM samples into an in-memory WAV container.
     """
-    return content.strip().replace("\n", " ").replace("  ", " ")
+    buffer = io.BytesIO()
+    w = Wave_write(buffer)
+    w.setnchannels(CHANNELS)
+    w.setsampwidth(SAMPLE_WIDTH)
+    w.setframerate(SAMPLE_RATE)
+    w.writeframes(audio_data)
+    w.close()
+    return buffer.getvalue()
 
 
-def _type_content(text):
+def _typeable_text(text):
     """
-    Type out content on the keyboard after stripping leading
-    whitespace and converting newlines to spaces.
+    Strip leading whitespace, convert newlines to spaces and remove anything
+    between square brackets. Returns an empty string if nothing is left to type.
     """
-    ctrl = keyboard.Controller()
     raw_text = text.lstrip().replace("\n", " ")
     # Remove anything between square brackets, including the brackets themselves
-    clean_text = re.sub(r"\[.*?\]", "", raw_text)
-    for char in clean_text:
-        ctrl.type(char)
-        time.sleep(0.001)
+    clean_text = _BRACKETED.sub("", raw_text)
+    return clean_text if clean_text.strip() else ""
+
+
+def _type_content(output_engine, text, separator=""):
+    """
+    Type out content with the output engine after stripping leading
+    whitespace and converting newlines to spaces.
+
+    The separator is only typed if there is some content left to type.
+    Returns True if anything was typed.
+    """
+    clean_text = _typeable_text(text)
+    if not clean_text:
+        return False
+    output_engine.type(separator + clean_text)
+    return True
@@ -0,0 +1,274 @@
+"""
+This module picks the whisper model variant and thread count for every dictation.
+
+A one-time calibration runs each model variant of a language with every candidate
+thread count on synthetic audio of two lengths and fits the latency as
+`fixed_s + rtf * duration`. The results are cached on disk, keyed by the whisper
+binary, the model file and the CPU, so calibration only runs again when one of
+them changes. At dictation time the Tuner predicts the latency of every variant for
+the clip's duration and picks the most preferred model whose fastest thread count
+fits the latency budget.
+
+Calibration runs the `main` executable, whose `fixed_s` includes loading the model,
+so it only describes dictations transcribed by `main`. With a governor, calibration
+runs at its priority and within its thread budget, and in the background it waits
+until no dictation is recorded or transcribed before every run.
+
+Usage:
+    python -m osx_echo.tuning [--config config.json]
+
+Classes:
+    Calibration: Fitted latency model of one model variant and thread count.
+    Tuner: Calibrates, caches and chooses configurations.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import threading
+import time
+
+import numpy as np
+
+from .config import Config, LanguageConfig
+from .constants import DEFAULT_WHISPER_THREADS, SAMPLE_RATE
+from .transcriber import encode_wav, run_whisper
+
+CALIBRATION_CLIP_S = (2.0, 8.0)
+_IDLE_POLL_S = 1.0
+
+
+class Calibration:
+    """
+    Calibration holds the fitted latency model of one model variant at one thread count.
+    """
+
+    def __init__(self, model_path: str, threads: int, fixed_s: float, rtf: float):
+        self.model_path = model_path
+        self.threads = threads
+        self.fixed_s = fixed_s
+        self.rtf = rtf
+
+    def predict(self, duration_s: float) -> float:
+        """
+        Predict the transcription latency of a clip.
+
+        Args:
+            duration_s (float): Length of the clip in seconds.
+
+        Returns:
+            float: Predicted seconds from starting whisper to getting the transcript.
+        """
+        return self.fixed_s + self.rtf * duration_s
+
+    def to_dict(self) -> dict:
+        return {"model_path": self.model_path, "threads": self.threads, "fixed_s": self.fixed_s, "rtf": self.rtf}
+
+    @staticmethod
+    def from_dict(d: dict) -> "Calibration":
+        return Calibration(d["model_path"], d["threads"], d["fixed_s"], d["rtf"])
+
+
+class Tuner:
+    """
+    Tuner chooses the model variant and thread count that meet the latency budget.
+
+    The variants of a language are its `model_variants`, ordered from the most to the
+    least preferred (e.g. full precision before quantized), or just its
+    `whisper_model_path`. Until a variant has been calibrated, the configured model
+    with the default thread count is used.
+    """
+
+    def __init__(self, whisper_main_path: str, latency_budget_s: float = 1.5, thread_counts: list[int] | None = None,
+                 cache_path: str = "~/.cache/osx_echo/calibration.json", governor=None):
+        """
+        Initialize the Tuner and load the calibration cache.
+
+        Args:
+            whisper_main_path (str): Path to the whisper.cpp `main` executable.
+            latency_budget_s (float): Longest acceptable transcription latency.
+            thread_counts (list[int]): Thread counts to calibrate, defaults to powers of two up to the core count.
+            cache_path (str): JSON file the calibrations are stored in.
+            governor (Governor): Priority and thread budget of the calibration runs, may be None.
+        """
+        self.whisper_main_path = whisper_main_path
+        self.latency_budget_s = latency_budget_s
+        self.governor = governor
+        if thread_counts is None:
+            cores = os.cpu_count() or DEFAULT_WHISPER_THREADS
+            thread_counts = sorted({min(cores, 2 ** i) for i in range(cores.bit_length())})
+        if governor is not None:
+            # dictations never get more threads than the governor grants, so more are not worth calibrating
+            thread_counts = sorted({max(1, min(threads, governor.max_threads)) for threads in thread_counts})
+        self.thread_counts = thread_counts
+        self.cache_path = os.path.expanduser(cache_path)
+        self._lock = threading.Lock()
+        self._cache = self._load_cache()
+
+    @staticmethod
+    def from_config(whisper_main_path: str, config: dict, governor=None) -> "Tuner":
+        return Tuner(whisper_main_path, config.get("latency_budget_s", 1.5), config.get("thread_counts"),
+                     config.get("cache_path", "~/.cache/osx_echo/calibration.json"), governor)
+
+    def choose(self, language_config: LanguageConfig, duration_s: float) -> tuple[str, int]:
+        """
+        Choose the model and thread count for a clip.
+
+        Args:
+            language_config (LanguageConfig): language configuration of the dictation.
+            duration_s (float): Length of the clip in seconds.
+
+        Returns:
+            tuple[str, int]: Model path and thread count.
+        """
+        fastest = None
+        for model_path in _model_variants(language_config):
+            calibrations = self.calibrations(model_path)
+            if not calibrations:
+                continue
+            best = min(calibrations, key=lambda c: c.predict(duration_s))
+            if best.predict(duration_s) <= self.latency_budget_s:
+                return best.model_path, best.threads
+            if fastest is None or best.predict(duration_s) < fastest.predict(duration_s):
+                fastest = best
+
+        if fastest is not None:
+            return fastest.model_path, fastest.threads
+        return language_config.whisper_model_path, DEFAULT_WHISPER_THREADS
+
+    def calibrations(self, model_path: str) -> list[Calibration]:
+        """
+        Retrieve the cached calibrations of a model on this machine.
+
+        Args:
+            model_path (str): Path to the ggml model.
+
+        Returns:
+            list[Calibration]: One calibration per thread count, empty if not calibrated.
+        """
+        with self._lock:
+            return [Calibration.from_dict(d) for d in self._cache.get(self._cache_key(model_path), [])]
+
+    def calibrate(self, language_config: LanguageConfig, force: bool = False, busy=None):
+        """
+        Calibrate every model variant of a language that has no cached calibration.
+
+        Args:
+            language_config (LanguageConfig): language configuration to calibrate.
+            force (bool): Calibrate again even if there are cached results.
+            busy: Callable returning True while a dictation is recorded or transcribed, may be None.
+        """
+        for model_path in _model_variants(language_config):
+            if self.calibrations(model_path) and not force:
+                continue
+            results = []
+            for threads in self.thread_counts:
+                calibration = self._measure(model_path, language_config.language, threads, busy)
+                print(f"Calibrated {os.path.basename(model_path)} with {threads} threads: "
+                      f"{calibration.fixed_s * 1000:.0f} ms + {calibration.rtf:.3f} x duration")
+                results.append(calibration.to_dict())
+            with self._lock:
+                self._cache[self._cache_key(model_path)] = results
+                self._save_cache()
+
+    def calibrate_in_background(self, language_configs: list[LanguageConfig], busy=None) -> threading.Thread:
+        """
+        Calibrate all languages on a background thread.
+
+        Args:
+            language_configs (list[LanguageConfig]): The languages to calibrate.
+            busy: Callable returning True while a dictation is recorded or transcribed, every run waits until
+                it returns False. May be None.
+
+        Returns:
+            threading.Thread: The calibration thread.
+        """
+        thread = threading.Thread(target=lambda: [self.calibrate(lc, busy=busy) for lc in language_configs],
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def _measure(self, model_path, language, threads, busy=None):
+        timings = []
+        for clip_s in CALIBRATION_CLIP_S:
+            wav_data = encode_wav(_calibration_audio(clip_s))
+            while busy is not None and busy():
+                time.sleep(_IDLE_POLL_S)
+            with self._inference_threads(threads):
+                t_start = time.perf_counter()
+                run_whisper(self.whisper_main_path, model_path, language, threads, wav_data, self.governor)
+                timings.append(time.perf_counter() - t_start)
+
+        (short_s, long_s), (short_t, long_t) = CALIBRATION_CLIP_S, timings
+        rtf = max(0.0, (long_t - short_t) / (long_s - short_s))
+        return Calibration(model_path, threads, max(0.0, short_t - rtf * short_s), rtf)
+
+    def _inference_threads(self, threads):
+        if self.governor is None:
+            return contextlib.nullcontext(threads)
+        return self.governor.inference_threads(threads)
+
+    def _cache_key(self, model_path):
+        parts = [_file_fingerprint(self.whisper_main_path), _file_fingerprint(model_path), _cpu_fingerprint()]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        with open(self.cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_cache(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._cache, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+
+def _model_variants(language_config):
+    return language_config.model_variants or [language_config.whisper_model_path]
+
+
+def _calibration_audio(duration_s):
+    # speech-band noise keeps whisper decoding, pure silence can end inference early
+    rng = np.random.default_rng(0)
+    return (rng.normal(0, 2000, int(duration_s * SAMPLE_RATE))).astype(np.int16).tobytes()
+
+
+def _file_fingerprint(path):
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _cpu_fingerprint():
+    return f"{platform.machine()}:{platform.processor()}:{os.cpu_count()}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m osx_echo.tuning",
+                                     description="Calibrate whisper model variants and thread counts.")
+    parser.add_argument("--config", default="config.json", help="path to config.json")
+    parser.add_argument("--force", action="store_true", help="calibrate again even if cached")
+    args = parser.parse_args(argv)
+
+    config = Config.from_config_file(args.config)
+    governor = None
+    if config.get_governor_config() is not None:
+        from .governor import Governor
+
+        governor = Governor.from_config(config.get_governor_config())
+    tuner = Tuner.from_config(config.get_whisper_path(), config.get_tuning_config() or {}, governor)
+    for language_config in config.get_language_support():
+        tuner.calibrate(language_config, args.force)
+        for duration_s in (2.0, 10.0, 30.0):
+            model_path, threads = tuner.choose(language_config, duration_s)
+            print(f"{language_config.language}: {duration_s:.0f} s clip -> {os.path.basename(model_path)}, "
+                  f"{threads} threads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+This module gates recordings on voice activity before they reach whisper.
+
+Accidental taps of the trigger produce clips that contain only silence, and most
+dictations start and end with silence. Running whisper on that audio wastes CPU
+and tends to produce hallucinated text such as "[BLANK_AUDIO]". The VoiceGate
+measures the energy of short frames with NumPy, trims leading and trailing
+silence and drops clips that do not contain enough speech.
+
+Classes:
+    VoiceGate: Trims silence and rejects clips without speech.
+"""
+
+import numpy as np
+
+from .constants import SAMPLE_RATE, SAMPLE_WIDTH
+
+
+class VoiceGate:
+    """
+    VoiceGate trims silence from recordings and drops recordings without speech.
+
+    A frame counts as speech if its RMS level reaches `silence_rms`. The clip is
+    cut to the first and last speech frame, extended by `padding_s` on both sides.
+    Clips with less than `min_speech_s` of speech are dropped entirely.
+
+    The gate is shared by all job workers, so it keeps no per-clip state.
+    """
+
+    def __init__(self, silence_rms: float = 500.0, min_speech_s: float = 0.3, padding_s: float = 0.2,
+                 frame_s: float = 0.03):
+        """
+        Initialize the VoiceGate.
+
+        Args:
+            silence_rms (float): RMS level of 16-bit samples below which a frame counts as silence.
+            min_speech_s (float): Minimum amount of speech for a clip to be transcribed.
+            padding_s (float): Silence kept before the first and after the last speech frame.
+            frame_s (float): Length of the frames the energy is measured on.
+        """
+        self.silence_rms = silence_rms
+        self.min_speech_s = min_speech_s
+        self.padding_s = padding_s
+        self.frame_len = max(1, int(frame_s * SAMPLE_RATE))
+
+    @staticmethod
+    def from_config(config: dict) -> "VoiceGate":
+        return VoiceGate(config.get("silence_rms", 500.0), config.get("min_speech_s", 0.3),
+                         config.get("padding_s", 0.2), config.get("frame_s", 0.03))
+
+    def process(self, audio_data: bytes) -> tuple[bytes | None, float]:
+        """
+        Trim silence from a clip.
+
+        Args:
+            audio_data (bytes): 16 kHz mono 16-bit PCM samples.
+
+        Returns:
+            tuple[bytes | None, float]: The trimmed clip, or None if it does not contain enough speech,
+            and the seconds of audio removed.
+        """
+        total_s = len(audio_data) / (SAMPLE_WIDTH * SAMPLE_RATE)
+        voiced = np.flatnonzero(frame_rms(audio_data, self.frame_len) >= self.silence_rms)
+
+        if len(voiced) == 0 or len(voiced) * self.frame_len / SAMPLE_RATE < self.min_speech_s:
+            print(f"VAD dropped clip of {total_s:.2f} s without speech")
+            return None, total_s
+
+        padding = int(self.padding_s * SAMPLE_RATE)
+        first_sample = max(0, voiced[0] * self.frame_len - padding)
+        last_sample = min(len(audio_data) // SAMPLE_WIDTH, (voiced[-1] + 1) * self.frame_len + padding)
+        trimmed = audio_data[first_sample * SAMPLE_WIDTH:last_sample * SAMPLE_WIDTH]
+
+        saved_s = total_s - len(trimmed) / (SAMPLE_WIDTH * SAMPLE_RATE)
+        print(f"VAD trimmed {saved_s:.2f} s of {total_s:.2f} s")
+        return trimmed, saved_s
+
+
+def frame_rms(audio_data: bytes, frame_len: int) -> np.ndarray:
+    """
+    Compute the RMS level of consecutive frames of 16-bit PCM.
+
+    Args:
+        audio_data (bytes): 16-bit PCM samples.
+        frame_len (int): Number of samples per frame, a trailing partial frame is included.
+
+    Returns:
+        np.ndarray: RMS level of every frame.
+    """
+    samples = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32)
+    n_frames = -(-len(samples) // frame_len)
+    padded = np.zeros(n_frames * frame_len, dtype=np.float32)
+    padded[:len(samples)] = samples
+    return np.sqrt(np.mean(np.square(padded.reshape(n_frames, frame_len)), axis=1))
@@ -0,0 +1,231 @@
+"""
+This module warms up whisper so that the first dictation is not a cold start.
+
+Right after launch, and after the Mac wakes from sleep, the model files are
+usually not in the page cache and whisper's first run does one-time
+initialization, which makes the first dictation much slower than the next ones.
+Warmup reads the model files of the most recently used languages, at a capped
+rate so it does not compete with other I/O. With a model pool, only as many
+languages are warmed as fit into its memory budget, so warm-up does not evict
+the model that is actually used.
+
+Transcribing a short clip of silence warms up more, but only a resident backend
+(in-process libwhisper or the whisper.cpp server) keeps anything of it, so this
+step is opt-in and skipped for the `main` executable. It runs twice per language,
+so the difference between the first and the second run estimates what the first
+real dictation saves. Warm-up stops as soon as a dictation is recorded or
+queued, so it never delays one for longer than the step that is running.
+
+Waking from sleep is detected without any notification API: the monotonic clock
+stops while the machine sleeps and the wall clock does not, so a check that finds
+the wall clock far ahead of the monotonic clock knows the machine has slept.
+
+The languages used most recently are kept in a small JSON file, so the order is
+known right after launch.
+
+Classes:
+    Warmup: Background model read-ahead and warm-up inference.
+"""
+
+import json
+import os
+import threading
+import time
+
+from .config import LanguageConfig
+from .constants import SAMPLE_RATE, SAMPLE_WIDTH
+
+_READ_CHUNK = 8 * 1024 * 1024
+
+
+class Warmup:
+    """
+    Warmup reads the model files and optionally runs a silent inference per language in the background.
+
+    Attributes:
+        language_configs (list[LanguageConfig]): The languages that may be warmed up.
+        recent_languages (list[str]): Language codes, most recently used first.
+        last_report (dict): Language code to read, cold and warm seconds of the last warm-up.
+    """
+
+    def __init__(self, transcriber, language_configs: list[LanguageConfig], clip_s: float = 1.0, threads: int = 1,
+                 read_mb_s: float | None = 200.0, resume_gap_s: float = 60.0, check_interval_s: float = 15.0,
+                 inference: bool = False, busy=None, recent_path: str = "~/.cache/osx_echo/recent_languages.json"):
+        """
+        Initialize the Warmup without starting it.
+
+        Args:
+            transcriber (Transcriber): Runs the warm-up inference on the configured backend.
+            language_configs (list[LanguageConfig]): The languages that may be warmed up.
+            clip_s (float): Length of the silent clip.
+            threads (int): Inference threads of the warm-up runs.
+            read_mb_s (float): Highest rate the model files are read at, None for no limit.
+            resume_gap_s (float): Slept time after which the models are warmed up again.
+            check_interval_s (float): Interval of the wake-from-sleep check.
+            inference (bool): Transcribe silence after reading the models, only done with a resident backend.
+            busy: Callable returning True while a dictation is recorded or transcribed, may be None.
+            recent_path (str): JSON file keeping the most recently used languages.
+        """
+        self.transcriber = transcriber
+        self.language_configs = language_configs
+        self.clip_s = clip_s
+        self.threads = threads
+        self.read_mb_s = read_mb_s
+        self.resume_gap_s = resume_gap_s
+        self.check_interval_s = check_interval_s
+        self.inference = inference
+        self.busy = busy
+        self.recent_path = os.path.expanduser(recent_path)
+        self.recent_languages = _load_recent(self.recent_path)
+        self.last_report = {}
+        self._recent_dirty = False
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @staticmethod
+    def from_config(transcriber, language_configs: list[LanguageConfig], config: dict, busy=None) -> "Warmup":
+        return Warmup(transcriber, language_configs, config.get("clip_s", 1.0), config.get("threads", 1),
+                      config.get("read_mb_s", 200.0), config.get("resume_gap_s", 60.0),
+                      config.get("check_interval_s", 15.0), config.get("inference", False), busy,
+                      config.get("recent_path", "~/.cache/osx_echo/recent_languages.json"))
+
+    def start(self):
+        """
+        Warm up now and again after every wake from sleep, on a daemon thread.
+        """
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def record_use(self, language_config: LanguageConfig):
+        """
+        Move a language to the front of the recently used ones.
+
+        Cheap enough to call from the key listener hook thread; the file is written by the warm-up thread.
+        """
+        if self.recent_languages and self.recent_languages[0] == language_config.language:
+            return
+        self.recent_languages = [language_config.language] + [
+            language for language in self.recent_languages if language != language_config.language]
+        self._recent_dirty = True
+
+    def selected(self) -> list[LanguageConfig]:
+        """
+        Return the languages to warm up, most recently used first.
+
+        With a model pool, languages are taken in that order as long as their models
+        fit into the memory budget together.
+        """
+        rank = {language: i for i, language in enumerate(self.recent_languages)}
+        ordered = sorted(self.language_configs, key=lambda lc: rank.get(lc.language, len(rank)))
+        model_pool = self.transcriber.model_pool
+        if model_pool is None or model_pool.memory_budget_mb is None:
+            return ordered
+        selected, sizes = [], {}
+        for language_config in ordered:
+            path = language_config.whisper_model_path
+            size_mb = sizes.get(path, model_pool.estimate_mb(path))
+            if sum(sizes.values()) - sizes.get(path, 0) + size_mb <= model_pool.memory_budget_mb:
+                sizes[path] = size_mb
+                selected.append(language_config)
+        return selected
+
+    def warm_up(self):
+        """
+        Read the model files and, if enabled, run the silent inferences of the selected languages.
+
+        The least recently used of them is warmed first, so the most recent one ends up most recently used in the
+        model pool. Stops early when a dictation starts.
+        """
+        silence = bytes(int(self.clip_s * SAMPLE_RATE) * SAMPLE_WIDTH)
+        resident = self.transcriber.in_process is not None or self.transcriber.server_pool is not None
+        for language_config in reversed(self.selected()):
+            if self._busy():
+                return
+            try:
+                read_s = sum(self._read_ahead(path) for path in _model_paths(language_config))
+                if not self.inference or not resident or self._busy():
+                    print(f"Warmed up {language_config.language}: read models in {read_s:.2f} s")
+                    continue
+                cold_s = self._time_inference(silence, language_config)
+                warm_s = self._time_inference(silence, language_config)
+            except Exception as e:
+                print(f"Warm-up of {language_config.language} failed: {e}")
+                continue
+            self.last_report[language_config.language] = {"read_s": read_s, "cold_s": cold_s, "warm_s": warm_s}
+            print(f"Warmed up {language_config.language}: read models in {read_s:.2f} s, first run {cold_s:.2f} s, "
+                  f"second run {warm_s:.2f} s, about {max(0.0, cold_s - warm_s):.2f} s saved on the first dictation")
+
+    def _busy(self):
+        if self.busy is not None and self.busy():
+            print("Warm-up stopped for a dictation")
+            return True
+        return False
+
+    def _run(self):
+        self.warm_up()
+        wall, monotonic = time.time(), time.monotonic()
+        while not self._stopped.wait(self.check_interval_s):
+            if self._recent_dirty:
+                self._recent_dirty = False
+                _save_recent(self.recent_path, self.recent_languages)
+            new_wall, new_monotonic = time.time(), time.monotonic()
+            slept_s = (new_wall - wall) - (new_monotonic - monotonic)
+            wall, monotonic = new_wall, new_monotonic
+            if slept_s >= self.resume_gap_s:
+                print(f"Woke up after {slept_s:.0f} s of sleep, warming up again")
+                self.warm_up()
+                wall, monotonic = time.time(), time.monotonic()
+
+    def _time_inference(self, silence, language_config):
+        t_start = time.perf_counter()
+        self.transcriber.transcribe_text(silence, language_config, model_path=language_config.whisper_model_path,
+                                         threads=self.threads)
+        return time.perf_counter() - t_start
+
+    def _read_ahead(self, path):
+        # reading the file pulls it into the page cache, sleeping keeps the rate below read_mb_s
+        t_start = time.perf_counter()
+        buffer = bytearray(_READ_CHUNK)
+        total = 0
+        try:
+            with open(path, "rb", buffering=0) as f:
+                while self.busy is None or not self.busy():
+                    count = f.readinto(buffer)
+                    if not count:
+                        break
+                    total += count
+                    if self.read_mb_s is not None:
+                        ahead_s = total / (self.read_mb_s * 1024 * 1024) - (time.perf_counter() - t_start)
+                        if ahead_s > 0:
+                            time.sleep(ahead_s)
+        except OSError as e:
+            print(f"Could not read {path}: {e}")
+        return time.perf_counter() - t_start
+
+
+def _model_paths(language_config):
+    paths = [language_config.whisper_model_path]
+    paths.extend(language_config.model_variants or [])
+    if language_config.refine_model_path is not None:
+        paths.append(language_config.refine_model_path)
+    return list(dict.fromkeys(paths))
+
+
+def _load_recent(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return list(json.load(f))
+    except (OSError, ValueError, TypeError):
+        return []
+
+
+def _save_recent(path, languages):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(languages, f)
+    except OSError as e:
+        print(f"Could not write {path}: {e}")
@@ -0,0 +1,243 @@
+"""
+This module parses the output of the whisper.cpp `main` executable and server.
+
+`main` is asked for its full JSON output, which has every segment with its
+offsets and the probability of every token, and for timestamped segments on
+stdout. whisper.cpp appends ".json" to the output path, so the JSON cannot go to
+stdout and is written to a private temporary directory instead; if it is missing,
+e.g. with an older whisper.cpp, the segments are parsed from stdout without
+probabilities. The timing breakdown whisper.cpp prints to stderr is parsed too,
+and stderr is kept so that a failed run can report why. The server is asked for
+its `verbose_json` response, which has the same segments with their offsets and
+token probabilities.
+
+The SegmentFilter drops segments whose average token log-probability is too low
+or whose text is so repetitive that it is most likely hallucinated.
+
+Classes:
+    WhisperError: Raised when the whisper.cpp process fails.
+    Segment: A transcribed stretch of audio.
+    TranscriptionResult: Segments, timings and stderr of one whisper run.
+    SegmentFilter: Drops low-confidence and hallucinated segments.
+"""
+
+import json
+import math
+import re
+import zlib
+
+_TIMESTAMPED_LINE = re.compile(r"^\[(\d+):(\d+):(\d+)[.,](\d+) --> (\d+):(\d+):(\d+)[.,](\d+)\]\s*(.*)$")
+_TIMING_LINE = re.compile(r"whisper_print_timings:\s+(\w+) time =\s+([\d.]+) ms")
+
+
+class WhisperError(RuntimeError):
+    """
+    Raised when the whisper.cpp process exits with an error, carrying the end of its stderr.
+    """
+
+    def __init__(self, returncode: int, stderr: str):
+        self.returncode = returncode
+        self.stderr = stderr
+        tail = "\n".join(stderr.strip().splitlines()[-10:])
+        super().__init__(f"whisper.cpp exited with status {returncode}:\n{tail}")
+
+
+class Segment:
+    """
+    Segment is a stretch of audio and its transcript.
+
+    Attributes:
+        start_s (float): Start within the clip, None if unknown.
+        end_s (float): End within the clip, None if unknown.
+        text (str): The transcript of the segment.
+        avg_logprob (float): Mean log-probability of its text tokens, None if unknown.
+    """
+
+    def __init__(self, text: str, start_s: float | None = None, end_s: float | None = None,
+                 avg_logprob: float | None = None):
+        self.text = text
+        self.start_s = start_s
+        self.end_s = end_s
+        self.avg_logprob = avg_logprob
+
+    def to_dict(self) -> dict:
+        return {"start_s": self.start_s, "end_s": self.end_s, "text": self.text, "avg_logprob": self.avg_logprob}
+
+
+class TranscriptionResult:
+    """
+    TranscriptionResult holds everything one whisper run produced.
+
+    Attributes:
+        segments (list[Segment]): The transcribed segments in order.
+        timings_s (dict): whisper.cpp's own timing breakdown, e.g. `load`, `mel`, `encode` and `decode`, in seconds.
+        stderr (str): The diagnostic output of the process.
+    """
+
+    def __init__(self, segments: list[Segment], timings_s: dict | None = None, stderr: str = ""):
+        self.segments = segments
+        self.timings_s = timings_s if timings_s is not None else {}
+        self.stderr = stderr
+
+    @staticmethod
+    def from_text(text: str) -> "TranscriptionResult":
+        return TranscriptionResult([Segment(text)])
+
+    @property
+    def text(self) -> str:
+        return "".join(segment.text for segment in self.segments)
+
+    @property
+    def avg_logprob(self) -> float | None:
+        """
+        Mean of the segments' average log-probabilities, None if none is known.
+        """
+        known = [segment.avg_logprob for segment in self.segments if segment.avg_logprob is not None]
+        return sum(known) / len(known) if known else None
+
+
+class SegmentFilter:
+    """
+    SegmentFilter removes segments that should not be typed.
+
+    A segment is dropped if its average token log-probability is below
+    `min_avg_logprob`, or if its text compresses by more than
+    `max_compression_ratio` with zlib, which is typical for whisper repeating a
+    phrase over and over. The compression ratio is only checked on segments with
+    timestamps: a segment without them may be the whole transcript, and long
+    ordinary prose compresses about as well as a repetitive segment.
+
+    Attributes:
+        last_dropped (list[Segment]): Segments dropped from the last result.
+    """
+
+    def __init__(self, min_avg_logprob: float | None = -1.0, max_compression_ratio: float | None = 2.4):
+        """
+        Initialize the SegmentFilter.
+
+        Args:
+            min_avg_logprob (float): Lowest accepted average log-probability, None to keep all.
+            max_compression_ratio (float): Highest accepted zlib compression ratio, None to keep all.
+        """
+        self.min_avg_logprob = min_avg_logprob
+        self.max_compression_ratio = max_compression_ratio
+        self.last_dropped = []
+
+    @staticmethod
+    def from_config(config: dict) -> "SegmentFilter":
+        return SegmentFilter(config.get("min_avg_logprob", -1.0), config.get("max_compression_ratio", 2.4))
+
+    def apply(self, result: TranscriptionResult) -> str:
+        """
+        Filter the segments of a result.
+
+        Args:
+            result (TranscriptionResult): The result of a whisper run.
+
+        Returns:
+            str: The text of the kept segments.
+        """
+        kept, self.last_dropped = [], []
+        for segment in result.segments:
+            (kept if self._keep(segment) else self.last_dropped).append(segment)
+        for segment in self.last_dropped:
+            print(f"Dropped segment with avg log-probability {segment.avg_logprob}: {segment.text.strip()!r}")
+        return "".join(segment.text for segment in kept)
+
+    def _keep(self, segment):
+        if (self.min_avg_logprob is not None and segment.avg_logprob is not None
+                and segment.avg_logprob < self.min_avg_logprob):
+            return False
+        if (self.max_compression_ratio is not None and segment.start_s is not None
+                and compression_ratio(segment.text) > self.max_compression_ratio):
+            return False
+        return True
+
+
+def compression_ratio(text: str) -> float:
+    """
+    Ratio of the UTF-8 length of a text to its zlib-compressed length.
+    """
+    data = text.strip().encode("utf-8")
+    return len(data) / len(zlib.compress(data)) if data else 0.0
+
+
+def parse_output(stdout: str, stderr: str, json_text: str | None = None) -> TranscriptionResult:
+    """
+    Build the result of a whisper.cpp `main` run from its output.
+
+    Args:
+        stdout (str): The process's stdout with timestamped segments.
+        stderr (str): The process's stderr with the timing breakdown.
+        json_text (str): Contents of the full JSON output file, None if it was not written.
+
+    Returns:
+        TranscriptionResult: The parsed result.
+    """
+    if json_text is not None:
+        segments = _parse_json(json_text)
+    else:
+        segments = _parse_stdout(stdout)
+    timings_s = {name: float(ms) / 1000 for name, ms in _TIMING_LINE.findall(stderr)}
+    return TranscriptionResult(segments, timings_s, stderr)
+
+
+def parse_server_response(body: str) -> TranscriptionResult:
+    """
+    Build the result of a whisper.cpp server request from its `verbose_json` response.
+
+    A response that is not JSON, e.g. from a stand-in server, becomes a single
+    segment without timestamps.
+
+    Args:
+        body (str): The response body.
+
+    Returns:
+        TranscriptionResult: The parsed result.
+    """
+    try:
+        response = json.loads(body)
+    except ValueError:
+        return TranscriptionResult.from_text(body)
+    if not isinstance(response, dict) or "segments" not in response:
+        return TranscriptionResult.from_text(response.get("text", "") if isinstance(response, dict) else body)
+    segments = []
+    for item in response["segments"]:
+        avg_logprob = item.get("avg_logprob")
+        if avg_logprob is None:
+            logprobs = [math.log(max(word["probability"], 1e-10)) for word in item.get("words", [])
+                        if "probability" in word]
+            avg_logprob = sum(logprobs) / len(logprobs) if logprobs else None
+        segments.append(Segment(item.get("text", ""), item.get("start"), item.get("end"), avg_logprob))
+    return TranscriptionResult(segments)
+
+
+def _parse_json(json_text):
+    segments = []
+    for item in json.loads(json_text).get("transcription", []):
+        offsets = item.get("offsets", {})
+        logprobs = [math.log(max(token["p"], 1e-10)) for token in item.get("tokens", [])
+                    if "p" in token and not token.get("text", "").startswith("[_")]
+        segments.append(Segment(item.get("text", ""),
+                                offsets["from"] / 1000 if "from" in offsets else None,
+                                offsets["to"] / 1000 if "to" in offsets else None,
+                                sum(logprobs) / len(logprobs) if logprobs else None))
+    return segments
+
+
+def _parse_stdout(stdout):
+    segments = []
+    for line in stdout.splitlines():
+        match = _TIMESTAMPED_LINE.match(line.strip())
+        if match is None:
+            continue
+        h1, m1, s1, f1, h2, m2, s2, f2, text = match.groups()
+        segments.append(Segment(" " + text, _seconds(h1, m1, s1, f1), _seconds(h2, m2, s2, f2)))
+    if not segments and stdout.strip():
+        # output without timestamps, e.g. from a stand-in executable
+        segments.append(Segment(stdout))
+    return segments
+
+
+def _seconds(hours, minutes, seconds, fraction):
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(fraction) / 10 ** len(fraction)
@@ -0,0 +1,299 @@
+"""
+This module manages long-lived whisper.cpp server processes.
+
+Running the whisper.cpp `main` executable for every dictation means the ggml model
+is loaded from disk and initialized again each time. The `server` example shipped
+with whisper.cpp keeps the model resident and accepts audio over HTTP, so this
+module starts one server per model on localhost and reuses it across dictations.
+
+Any executable that accepts `-m <model> --host <host> --port <port>` and answers
+`POST /inference` with a multipart `file` field can stand in for the real server,
+which keeps the module usable with a small local stub when whisper.cpp is not built;
+`python -m osx_echo.benchmark server` runs one to check start, restart and retry.
+Requests ask for the `verbose_json` response with timestamped segments; a plain
+text answer is taken as a single segment.
+
+Classes:
+    WhisperServer: A single server process bound to one model.
+    WhisperServerPool: Lazily started servers keyed by model path.
+"""
+
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from .constants import WHISPER_SERVER_HOST, WHISPER_SERVER_STARTUP_TIMEOUT_S
+from .whisper_output import TranscriptionResult, parse_server_response
+
+
+class WhisperServerError(RuntimeError):
+    """
+    Raised when the whisper.cpp server cannot be started or does not answer a request.
+    """
+
+
+class WhisperServer:
+    """
+    WhisperServer owns one whisper.cpp server process serving a single model.
+
+    The process is started lazily on the first request and restarted whenever it
+    is found dead, so a crash costs one cold start instead of breaking dictation.
+
+    Attributes:
+        cold_start_s (float): Seconds the last (re)start took until the port accepted connections.
+        last_request_s (float): Seconds the last inference request took end to end.
+    """
+
+    def __init__(self, server_path: str, model_path: str, threads: int = 4, host: str = WHISPER_SERVER_HOST,
+                 governor=None, beam_size: int | None = None, best_of: int | None = None):
+        """
+        Initialize the WhisperServer without starting the process.
+
+        Args:
+            server_path (str): Path to the whisper.cpp `server` executable.
+            model_path (str): Path to the ggml model the server should load.
+            threads (int): Number of inference threads passed to the server.
+            host (str): Interface the server binds to.
+            governor (Governor): Runs the process at a lower priority and on the inference cores, may be None.
+            beam_size (int): Beams of beam search, None for the server's default.
+            best_of (int): Candidates sampled at a fallback temperature, None for the server's default.
+        """
+        self.server_path = server_path
+        self.model_path = model_path
+        self.threads = threads
+        self.host = host
+        self.governor = governor
+        self.beam_size = beam_size
+        self.best_of = best_of
+        self.port = None
+        self.cold_start_s = None
+        self.last_request_s = None
+        self._process = None
+        self._lock = threading.Lock()
+
+    def is_alive(self) -> bool:
+        """
+        Check whether the server process is running.
+
+        Returns:
+            bool: True if the process was started and has not exited.
+        """
+        return self._process is not None and self._process.poll() is None
+
+    def ensure_running(self):
+        """
+        Start the server process if it is not running, restarting it after a crash.
+
+        Raises:
+            WhisperServerError: If the server does not accept connections in time.
+        """
+        with self._lock:
+            if self.is_alive():
+                return
+            if self._process is not None:
+                print(f"whisper server for {self.model_path} exited with {self._process.returncode}, restarting")
+            self._start()
+
+    def inference(self, audio_data: bytes, language: str, file_name: str = "audio.wav") -> TranscriptionResult:
+        """
+        Transcribe WAV audio using the resident model.
+
+        A failed request restarts the server once and retries before giving up.
+
+        Args:
+            audio_data (bytes): Complete WAV file contents (16 kHz mono 16-bit PCM).
+            language (str): Whisper language code.
+            file_name (str): Name reported for the uploaded file, unique per job.
+
+        Returns:
+            TranscriptionResult: The segments with timestamps and confidences.
+
+        Raises:
+            WhisperServerError: If the server cannot be reached even after a restart.
+        """
+        for attempt in range(2):
+            self.ensure_running()
+            try:
+                return self._post_inference(audio_data, language, file_name)
+            except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+                if attempt == 1:
+                    raise WhisperServerError(f"whisper server request failed: {e}") from e
+                self.stop()
+
+    def stop(self):
+        """
+        Terminate the server process if it is running.
+        """
+        with self._lock:
+            if self._process is None:
+                return
+            if self._process.poll() is None:
+                self._process.terminate()
+                try:
+                    self._process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+                    self._process.wait()
+            self._process = None
+
+    def _start(self):
+        self.port = _find_free_port(self.host)
+        t_start = time.perf_counter()
+        args = [
+            self.server_path,
+            "-m",
+            self.model_path,
+            "-t",
+            str(self.threads),
+            "--host",
+            self.host,
+            "--port",
+            str(self.port),
+        ]
+        if self.beam_size is not None:
+            args += ["-bs", str(self.beam_size)]
+        if self.best_of is not None:
+            args += ["-bo", str(self.best_of)]
+        if self.governor is not None:
+            args = self.governor.command(args)
+        self._process = subprocess.Popen(
+            args,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        deadline = t_start + WHISPER_SERVER_STARTUP_TIMEOUT_S
+        while time.perf_counter() < deadline:
+            if self._process.poll() is not None:
+                raise WhisperServerError(
+                    f"whisper server exited with {self._process.returncode} during startup")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=0.1):
+                    break
+            except OSError:
+                time.sleep(0.02)
+        else:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+            raise WhisperServerError(f"whisper server did not start within {WHISPER_SERVER_STARTUP_TIMEOUT_S} s")
+
+        self.cold_start_s = time.perf_counter() - t_start
+        print(f"whisper server for {self.model_path} ready on port {self.port}, "
+              f"cold start {self.cold_start_s * 1000:.0f} ms")
+
+    def _post_inference(self, audio_data: bytes, language: str, file_name: str) -> TranscriptionResult:
+        boundary = uuid.uuid4().hex
+        body = _encode_multipart(boundary, {"language": language, "response_format": "verbose_json"},
+                                 "file", file_name, audio_data)
+        request = urllib.request.Request(
+            f"http://{self.host}:{self.port}/inference",
+            data=body,
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            method="POST",
+        )
+
+        t_start = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=120) as response:
+            text = response.read().decode("utf-8")
+        self.last_request_s = time.perf_counter() - t_start
+        print(f"whisper server request took {self.last_request_s * 1000:.0f} ms")
+        return parse_server_response(text)
+
+
+class WhisperServerPool:
+    """
+    WhisperServerPool keeps one WhisperServer per model path.
+
+    Servers are created on first use, so languages that are never dictated do not
+    cost any memory. With a governor, servers run at its priority and with at most
+    its `max_threads` threads, since a server always uses the threads it was started with.
+    """
+
+    def __init__(self, server_path: str, threads: int = 4, governor=None, beam_size: int | None = None,
+                 best_of: int | None = None):
+        """
+        Initialize the pool.
+
+        Args:
+            server_path (str): Path to the whisper.cpp `server` executable.
+            threads (int): Number of inference threads for each server.
+            governor (Governor): Priority, affinity and thread cap of the servers, may be None.
+            beam_size (int): Beams of beam search, None for the server's default.
+            best_of (int): Candidates sampled at a fallback temperature, None for the server's default.
+        """
+        self.server_path = server_path
+        self.threads = max(1, min(threads, governor.max_threads)) if governor is not None else threads
+        self.governor = governor
+        self.beam_size = beam_size
+        self.best_of = best_of
+        self._servers = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_path: str) -> WhisperServer:
+        """
+        Retrieve the server for a model, creating it if needed.
+
+        Args:
+            model_path (str): Path to the ggml model.
+
+        Returns:
+            WhisperServer: The server bound to `model_path`.
+        """
+        with self._lock:
+            server = self._servers.get(model_path)
+            if server is None:
+                server = WhisperServer(self.server_path, model_path, self.threads, governor=self.governor,
+                                       beam_size=self.beam_size, best_of=self.best_of)
+                self._servers[model_path] = server
+            return server
+
+    def load(self, model_path: str):
+        """
+        Start the server for a model so that the model is loaded before the first request.
+
+        Raises:
+            WhisperServerError: If the server cannot be started.
+        """
+        self.get(model_path).ensure_running()
+
+    def unload(self, model_path: str):
+        """
+        Terminate the server for a model, freeing its memory.
+        """
+        with self._lock:
+            server = self._servers.pop(model_path, None)
+        if server is not None:
+            server.stop()
+
+    def stop_all(self):
+        """
+        Terminate every server in the pool.
+        """
+        with self._lock:
+            servers = list(self._servers.values())
+        for server in servers:
+            server.stop()
+
+
+def _find_free_port(host):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def _encode_multipart(boundary, fields, file_field, file_name, file_data):
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode("utf-8"))
+    parts.append(
+        (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{file_field}\"; filename=\"{file_name}\"\r\n"
+         "Content-Type: audio/wav\r\n\r\n").encode("utf-8"))
+    parts.append(file_data)
+    parts.append(f"\r\n--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(parts)